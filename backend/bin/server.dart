@@ -1476,14 +1476,10 @@ Future<void> main(List<String> args) async {
         if ((name == null || name.isEmpty) && (id == null || id.isEmpty)) {
           throw ApiException(400, '請提供景點名稱或 id');
         }
-        final file = File(p.join(_dataDir, 'places_with_reviews.json'));
-        if (!file.existsSync()) {
+        final raw = await _readPlaceReviewItems();
+        if (raw == null) {
           throw ApiException(404, '尚未產生評論資料');
         }
-        final raw = jsonDecode(await file.readAsString());
-        if (raw is! List) {
-          throw ApiException(500, '評論資料格式錯誤');
-        }
         final normalizedName = _normalizeText(name ?? '');
         final normalizedId = (id ?? '').trim();
         Map<String, dynamic>? match;
@@ -2748,6 +2744,59 @@ Future<void> _writeTrainingWeightVersions(Map<String, dynamic> payload) async {
   await _writeAppState(appState);
 }
 
+/// Live review items written by the Python fetchers. places_with_reviews.jsonl
+/// holds one item per line and a later line for the same place_id or
+/// source_name supersedes earlier ones; the legacy places_with_reviews.json
+/// array is still read when no .jsonl exists. Returns null when neither does.
+Future<List<Map<String, dynamic>>?> _readPlaceReviewItems() async {
+  final jsonlFile = File(p.join(_dataDir, 'places_with_reviews.jsonl'));
+  if (jsonlFile.existsSync()) {
+    final items = <Map<String, dynamic>>[];
+    final liveById = <String, int>{};
+    final liveByName = <String, int>{};
+    final lines = jsonlFile
+        .openRead()
+        .transform(utf8.decoder)
+        .transform(const LineSplitter());
+    await for (final line in lines) {
+      if (line.trim().isEmpty) continue;
+      Object? decoded;
+      try {
+        decoded = jsonDecode(line);
+      } on FormatException {
+        // A line still being appended, or one cut short by a killed fetcher
+        // (the next Python run truncates it before appending).
+        continue;
+      }
+      if (decoded is! Map) continue;
+      final item = Map<String, dynamic>.from(decoded);
+      final index = items.length;
+      items.add(item);
+      final placeId = item['place_id']?.toString().trim() ?? '';
+      final sourceName = item['source_name']?.toString().trim() ?? '';
+      final name = sourceName.isNotEmpty
+          ? sourceName
+          : (item['name']?.toString().trim() ?? '');
+      liveByName[name] = index;
+      if (placeId.isNotEmpty) {
+        liveById[placeId] = index;
+      }
+    }
+    final live = {...liveById.values, ...liveByName.values}.toList()..sort();
+    return [for (final index in live) items[index]];
+  }
+  final legacyFile = File(p.join(_dataDir, 'places_with_reviews.json'));
+  if (!legacyFile.existsSync()) return null;
+  final raw = jsonDecode(await legacyFile.readAsString());
+  if (raw is! List) {
+    throw ApiException(500, '評論資料格式錯誤');
+  }
+  return raw
+      .whereType<Map>()
+      .map((entry) => Map<String, dynamic>.from(entry))
+      .toList();
+}
+
 Future<List<Map<String, dynamic>>> _readFormalPlanReviews() async {
   final appState = await _readAppState();
   final raw = appState[_formalPlanReviewsStateKey];
@@ -0,0 +1,348 @@
+"""
+Address canonicalization for the Google Places crawler.
+
+Cleaning a display address (Taiwan character variants, postal codes,
+whitespace) and scoring its quality used to run several regex passes every
+time, and the same strings are cleaned and scored again and again during one
+crawl. Here the patterns are compiled once and results are memoized in a
+bounded LRU cache.
+
+Each place also carries its canonical address so later runs can skip
+re-cleaning it:
+  "canonicalAddress": {"text": "台中市西區民生路1號", "score": 85, "key": "<crc of address>"}
+The `key` ties the entry to the exact `address` string (and ADDRESS_CANON_VERSION),
+so an address edited elsewhere is simply cleaned again.
+
+Optional env:
+  ADDRESS_CACHE_SIZE=65536   # LRU 快取筆數上限
+"""
+from __future__ import annotations
+
+import os
+import re
+import zlib
+from functools import lru_cache
+from typing import Any, Dict
+
+ADDRESS_CACHE_SIZE = max(1, int(os.environ.get("ADDRESS_CACHE_SIZE", "65536") or 65536))
+# Bump when cleaning or scoring rules change so stored canonical addresses are recomputed.
+ADDRESS_CANON_VERSION = 1
+
+CITY_HINTS = [
+    "臺北市",
+    "台北市",
+    "新北市",
+    "新北市",
+    "基隆市",
+    "桃園市",
+    "新竹市",
+    "新竹市",
+    "新竹縣",
+    "苗栗縣",
+    "臺中市",
+    "台中市",
+    "彰化縣",
+    "南投縣",
+    "雲林縣",
+    "嘉義市",
+    "嘉義縣",
+    "臺南市",
+    "台南市",
+    "高雄市",
+    "高雄市",
+    "屏東縣",
+    "宜蘭縣",
+    "花蓮縣",
+    "台東縣",
+    "澎湖縣",
+    "金門縣",
+    "連江縣",
+]
+
+CITY_CANONICAL_MAP = {
+    "台北市": "臺北市",
+    "臺北市": "臺北市",
+    "新北市": "新北市",
+    "基隆市": "基隆市",
+    "桃園市": "桃園市",
+    "新竹市": "新竹市",
+    "新竹縣": "新竹縣",
+    "苗栗縣": "苗栗縣",
+    "台中市": "臺中市",
+    "臺中市": "臺中市",
+    "彰化縣": "彰化縣",
+    "南投縣": "南投縣",
+    "雲林縣": "雲林縣",
+    "嘉義市": "嘉義市",
+    "嘉義縣": "嘉義縣",
+    "台南市": "臺南市",
+    "臺南市": "臺南市",
+    "高雄市": "高雄市",
+    "屏東縣": "屏東縣",
+    "宜蘭縣": "宜蘭縣",
+    "花蓮縣": "花蓮縣",
+    "台東縣": "臺東縣",
+    "臺東縣": "臺東縣",
+    "澎湖縣": "澎湖縣",
+    "金門縣": "金門縣",
+    "連江縣": "連江縣",
+    "馬祖": "連江縣",
+}
+
+# Counties sharing a land border (canonical names); the outlying islands have none.
+COUNTY_NEIGHBOURS: Dict[str, tuple[str, ...]] = {
+    "臺北市": ("新北市",),
+    "新北市": ("臺北市", "基隆市", "桃園市", "宜蘭縣"),
+    "基隆市": ("新北市",),
+    "桃園市": ("新北市", "新竹縣", "宜蘭縣"),
+    "新竹市": ("新竹縣", "苗栗縣"),
+    "新竹縣": ("新竹市", "桃園市", "苗栗縣", "臺中市", "宜蘭縣"),
+    "苗栗縣": ("新竹市", "新竹縣", "臺中市"),
+    "臺中市": ("苗栗縣", "新竹縣", "彰化縣", "南投縣", "宜蘭縣", "花蓮縣"),
+    "彰化縣": ("臺中市", "南投縣", "雲林縣"),
+    "南投縣": ("臺中市", "彰化縣", "雲林縣", "嘉義縣", "高雄市", "花蓮縣"),
+    "雲林縣": ("彰化縣", "南投縣", "嘉義縣"),
+    "嘉義市": ("嘉義縣",),
+    "嘉義縣": ("嘉義市", "雲林縣", "南投縣", "臺南市", "高雄市"),
+    "臺南市": ("嘉義縣", "高雄市"),
+    "高雄市": ("臺南市", "嘉義縣", "南投縣", "花蓮縣", "臺東縣", "屏東縣"),
+    "屏東縣": ("高雄市", "臺東縣"),
+    "宜蘭縣": ("新北市", "桃園市", "新竹縣", "臺中市", "花蓮縣"),
+    "花蓮縣": ("宜蘭縣", "臺中市", "南投縣", "高雄市", "臺東縣"),
+    "臺東縣": ("花蓮縣", "高雄市", "屏東縣"),
+    "澎湖縣": (),
+    "金門縣": (),
+    "連江縣": (),
+}
+
+TW_TEXT_VARIANT_MAP = str.maketrans({
+    "臺": "台",
+    "云": "雲",
+    "县": "縣",
+    "市": "市",
+    "区": "區",
+    "镇": "鎮",
+    "乡": "鄉",
+    "村": "村",
+    "里": "里",
+    "东": "東",
+    "西": "西",
+    "南": "南",
+    "北": "北",
+    "兰": "蘭",
+    "门": "門",
+    "连": "連",
+    "江": "江",
+    "台": "台",
+    "号": "號",
+    "段": "段",
+    "路": "路",
+    "街": "街",
+    "巷": "巷",
+    "弄": "弄",
+})
+
+
+_CITY_ALTERNATION = "|".join(
+    sorted({city.translate(TW_TEXT_VARIANT_MAP) for city in CITY_HINTS}, key=len, reverse=True)
+)
+_POSTAL_NOTE_RE = re.compile(r"[，,、]?\s*郵政編碼[:：]?\s*\d{3,6}")
+_WHITESPACE_RE = re.compile(r"\s+")
+_LEADING_POSTAL_RE = re.compile(rf"^(?P<postal>\d{{3,6}})(?=({_CITY_ALTERNATION}))")
+# "台中市台中市西區…": an older crawl prepended the city to addresses that already had it.
+_REPEATED_CITY_RE = re.compile(rf"^({_CITY_ALTERNATION})\1+")
+_DISTRICT_RE = re.compile(r"[鄉鎮市區村里]")
+_STREET_RE = re.compile(r"[路街道段巷弄號]")
+_POSTAL_ONLY_RE = re.compile(r"\d{3,6}")
+
+_COMPONENT_ORDER = (
+    "administrative_area_level_1",
+    "administrative_area_level_2",
+    "administrative_area_level_3",
+    "administrative_area_level_4",
+    "locality",
+    "sublocality_level_1",
+    "sublocality_level_2",
+    "sublocality_level_3",
+    "route",
+    "street_number",
+    "premise",
+    "subpremise",
+)
+
+
+@lru_cache(maxsize=ADDRESS_CACHE_SIZE)
+def normalize_tw_text(value: str) -> str:
+    if not value:
+        return ""
+    text = str(value).strip().translate(TW_TEXT_VARIANT_MAP)
+    text = text.replace("邮政编码", "郵政編碼").replace("郵遞區號", "郵政編碼")
+    return text
+
+
+def extract_city(address: str) -> str:
+    if not address:
+        return ""
+    address = normalize_tw_text(address)
+    for hint in CITY_HINTS:
+        if hint in address:
+            return hint
+    return ""
+
+
+def extract_city_from_components(components: list[dict]) -> str:
+    # Prefer admin_area_level_1 (city/county), then locality.
+    for level in ("administrative_area_level_1", "locality"):
+        for comp in components:
+            types = comp.get("types") or []
+            if level in types:
+                name = normalize_tw_text(comp.get("long_name") or "")
+                return name
+    return ""
+
+
+def normalize_city_name(value: str) -> str:
+    if not value:
+        return ""
+    normalized = normalize_tw_text(value)
+    return CITY_CANONICAL_MAP.get(normalized, value.strip())
+
+
+def neighbouring_counties(city: str) -> tuple[str, ...]:
+    return COUNTY_NEIGHBOURS.get(normalize_city_name(city), ())
+
+
+@lru_cache(maxsize=ADDRESS_CACHE_SIZE)
+def clean_display_address(value: str) -> str:
+    if not value:
+        return ""
+    text = normalize_tw_text(value)
+    text = _POSTAL_NOTE_RE.sub("", text)
+    text = _WHITESPACE_RE.sub("", text)
+    text = _LEADING_POSTAL_RE.sub("", text)
+    text = _REPEATED_CITY_RE.sub(r"\1", text)
+    return text.strip(" ,，、")
+
+
+@lru_cache(maxsize=ADDRESS_CACHE_SIZE)
+def address_quality_score(value: str) -> int:
+    text = clean_display_address(value)
+    if not text:
+        return -100
+    score = len(text)
+    if extract_city(text):
+        score += 30
+    if _DISTRICT_RE.search(text):
+        score += 20
+    if _STREET_RE.search(text):
+        score += 20
+    if _POSTAL_ONLY_RE.fullmatch(text):
+        score -= 120
+    if "郵政編碼" in text:
+        score -= 80
+    return score
+
+
+def build_address_from_components(components: list[dict], fallback: str = "") -> str:
+    cleaned_fallback = clean_display_address(fallback)
+    if not components:
+        return cleaned_fallback
+
+    parts: list[str] = []
+    seen: set[str] = set()
+    for type_name in _COMPONENT_ORDER:
+        for comp in components:
+            types = comp.get("types") or []
+            if type_name not in types:
+                continue
+            name = clean_display_address(comp.get("long_name") or "")
+            if type_name == "street_number" and name.isdigit():
+                name = f"{name}號"
+            if not name or name in seen:
+                continue
+            seen.add(name)
+            parts.append(name)
+
+    rebuilt = clean_display_address("".join(parts))
+    if address_quality_score(cleaned_fallback) > address_quality_score(rebuilt):
+        return cleaned_fallback
+    return rebuilt or cleaned_fallback
+
+
+def pick_best_address(*candidates: str) -> str:
+    best = ""
+    best_score = -10**9
+    best_len = -1
+    for candidate in candidates:
+        cleaned = clean_display_address(candidate)
+        if not cleaned:
+            continue
+        score = address_quality_score(cleaned)
+        if score > best_score or (score == best_score and len(cleaned) > best_len):
+            best = cleaned
+            best_score = score
+            best_len = len(cleaned)
+    return best
+
+
+def ensure_address_with_city(address: str, city: str) -> str:
+    cleaned = clean_display_address(address)
+    normalized_city = normalize_city_name(city)
+    if not cleaned or not normalized_city:
+        return cleaned
+    # Cleaned text uses 台 while canonical city names use 臺; compare in the cleaned form.
+    if normalize_tw_text(normalized_city) in cleaned:
+        return cleaned
+    candidate = clean_display_address(f"{normalized_city}{cleaned}")
+    if address_quality_score(candidate) >= address_quality_score(cleaned):
+        return candidate
+    return cleaned
+
+
+def _canonical_key(address: str) -> str:
+    return f"{ADDRESS_CANON_VERSION}:{zlib.crc32(address.encode('utf-8')):08x}"
+
+
+def canonical_address(place: Dict[str, Any]) -> tuple[str, int]:
+    """(cleaned address, quality score) for a place, from its stored canonical form when still valid."""
+    address = str(place.get("address") or "")
+    stored = place.get("canonicalAddress")
+    if isinstance(stored, dict) and stored.get("key") == _canonical_key(address):
+        try:
+            return str(stored.get("text") or ""), int(stored.get("score"))
+        except (TypeError, ValueError):
+            pass
+    return clean_display_address(address), address_quality_score(address)
+
+
+def canonical_entry(address: str) -> Dict[str, Any] | None:
+    """The `canonicalAddress` value for `address` (None for an empty address)."""
+    address = str(address or "")
+    if not address:
+        return None
+    return {
+        "text": clean_display_address(address),
+        "score": address_quality_score(address),
+        "key": _canonical_key(address),
+    }
+
+
+def stamp_canonical_address(place: Dict[str, Any]) -> bool:
+    """Store the canonical form of `place["address"]`; returns True if the place changed."""
+    entry = canonical_entry(place.get("address") or "")
+    if entry is None:
+        return place.pop("canonicalAddress", None) is not None
+    if place.get("canonicalAddress") == entry:
+        return False
+    place["canonicalAddress"] = entry
+    return True
+
+
+def cache_summary() -> str:
+    parts = []
+    for label, fn in (("清理", clean_display_address), ("評分", address_quality_score)):
+        info = fn.cache_info()
+        lookups = info.hits + info.misses
+        rate = info.hits / lookups * 100 if lookups else 0.0
+        parts.append(f"{label} {info.currsize} 筆、命中 {rate:.0f}%")
+    return "地址快取：" + "，".join(parts)
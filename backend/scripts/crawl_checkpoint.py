@@ -0,0 +1,84 @@
+"""
+Crawl checkpoints for fetch_places_from_google.py.
+
+The crawler periodically writes its progress (per-query page frontier, seen
+set, staged places, request count, per-phase progress) to a JSON file. After
+a timeout, OVER_QUERY_LIMIT or Ctrl-C, `--resume` picks up from that file
+instead of starting over. The file is removed when a crawl finishes normally.
+
+A checkpoint records the run configuration (profile, scope, city, queries);
+resuming with a different configuration is refused.
+
+Optional env:
+  CRAWL_CHECKPOINT_PATH=backend/data/crawl_checkpoint.json
+  CRAWL_CHECKPOINT_SECONDS=30   # 最短寫入間隔
+"""
+from __future__ import annotations
+
+import json
+import os
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Dict
+
+ROOT = Path(__file__).resolve().parents[1]
+CHECKPOINT_PATH = Path(
+    os.environ.get("CRAWL_CHECKPOINT_PATH", str(ROOT / "data" / "crawl_checkpoint.json"))
+)
+CHECKPOINT_SECONDS = float(os.environ.get("CRAWL_CHECKPOINT_SECONDS", "30"))
+CHECKPOINT_VERSION = 1
+
+
+class CheckpointMismatch(RuntimeError):
+    """The checkpoint on disk was written by a crawl with different settings."""
+
+
+class CrawlCheckpoint:
+    def __init__(
+        self,
+        fingerprint: Dict[str, Any],
+        path: Path = CHECKPOINT_PATH,
+        *,
+        interval: float = CHECKPOINT_SECONDS,
+    ) -> None:
+        self.path = Path(path)
+        self.fingerprint = fingerprint
+        self.interval = interval
+        self.saves = 0
+        self._last_save = time.monotonic()
+
+    def exists(self) -> bool:
+        return self.path.exists()
+
+    def load(self) -> Dict[str, Any] | None:
+        if not self.path.exists():
+            return None
+        data = json.loads(self.path.read_text(encoding="utf-8"))
+        if data.get("version") != CHECKPOINT_VERSION:
+            raise CheckpointMismatch(f"檢查點版本不符：{data.get('version')}")
+        if data.get("fingerprint") != self.fingerprint:
+            raise CheckpointMismatch("檢查點的抓取設定與本次不同（profile/scope/city/queries）")
+        state = data.get("state")
+        return state if isinstance(state, dict) else None
+
+    def due(self) -> bool:
+        return time.monotonic() - self._last_save >= self.interval
+
+    def save(self, state: Dict[str, Any]) -> None:
+        payload = {
+            "version": CHECKPOINT_VERSION,
+            "savedAt": datetime.now(timezone.utc).replace(microsecond=0).isoformat(),
+            "fingerprint": self.fingerprint,
+            "state": state,
+        }
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.path.with_name(self.path.name + ".tmp")
+        tmp_path.write_text(json.dumps(payload, ensure_ascii=False), encoding="utf-8")
+        os.replace(tmp_path, self.path)
+        self.saves += 1
+        self._last_save = time.monotonic()
+
+    def clear(self) -> None:
+        if self.path.exists():
+            self.path.unlink()
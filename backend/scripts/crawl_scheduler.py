@@ -0,0 +1,215 @@
+"""
+Quota-aware scheduling for fetch_places_from_google.py.
+
+Two pieces:
+  - `EnrichmentQueue`: a priority queue over enrichment candidates. A place
+    scores higher the more fields it is missing, the more Google reviews it
+    has (userRatingsTotal), the more often it appears in historical
+    itineraries, and the older its `updatedAt` is.
+  - `allocate_budget()`: splits MAX_REQUESTS across the crawl phases
+    (backfill / search / city) by estimated demand and phase weight,
+    replacing the fixed "reserve N requests for search" heuristic.
+
+Optional env:
+  HISTORICAL_ITINERARIES_PATHS=backend/data/historical_itineraries.json,backend/data/historical_itineraries.imported.json
+  CRAWL_PRIORITY_WEIGHTS="gaps=1,popularity=0.6,itinerary=3,staleness=0.5"
+  CRAWL_PHASE_WEIGHTS="backfill=1,search=1,city=1"
+"""
+from __future__ import annotations
+
+import heapq
+import json
+import math
+import os
+from collections import Counter
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, Iterator, List
+
+ROOT = Path(__file__).resolve().parents[1]
+HISTORICAL_ITINERARIES_PATHS = [
+    Path(part.strip())
+    for part in os.environ.get(
+        "HISTORICAL_ITINERARIES_PATHS",
+        ",".join(
+            [
+                str(ROOT / "data" / "historical_itineraries.json"),
+                str(ROOT / "data" / "historical_itineraries.imported.json"),
+            ]
+        ),
+    ).split(",")
+    if part.strip()
+]
+
+# Staleness is counted in months and capped so very old records do not drown out other signals.
+MAX_STALE_MONTHS = 12.0
+MAX_ITINERARY_HITS = 5.0
+
+
+def _parse_weights(raw: str, defaults: Dict[str, float]) -> Dict[str, float]:
+    weights = dict(defaults)
+    for part in (raw or "").split(","):
+        name, sep, value = part.partition("=")
+        if not sep or name.strip() not in weights:
+            continue
+        try:
+            weights[name.strip()] = float(value)
+        except ValueError:
+            continue
+    return weights
+
+
+PRIORITY_WEIGHTS = _parse_weights(
+    os.environ.get("CRAWL_PRIORITY_WEIGHTS", ""),
+    {"gaps": 1.0, "popularity": 0.6, "itinerary": 3.0, "staleness": 0.5},
+)
+PHASE_WEIGHTS = _parse_weights(
+    os.environ.get("CRAWL_PHASE_WEIGHTS", ""),
+    {"backfill": 1.0, "search": 1.0, "city": 1.0},
+)
+
+
+def load_itinerary_place_counts(paths: Iterable[Path] = HISTORICAL_ITINERARIES_PATHS) -> Counter:
+    """Weighted count of how often each placeId appears in historical itinerary samples."""
+    counts: Counter = Counter()
+    for path in paths:
+        path = Path(path)
+        if not path.exists():
+            continue
+        try:
+            raw = json.loads(path.read_text(encoding="utf-8"))
+        except (OSError, json.JSONDecodeError):
+            continue
+        samples = raw.get("samples") if isinstance(raw, dict) else None
+        for sample in samples if isinstance(samples, list) else []:
+            if not isinstance(sample, dict):
+                continue
+            try:
+                weight = float(sample.get("weight") or 1.0)
+            except (TypeError, ValueError):
+                weight = 1.0
+            for day in sample.get("days") or []:
+                for item in (day.get("items") or []) if isinstance(day, dict) else []:
+                    if not isinstance(item, dict):
+                        continue
+                    place_id = str(item.get("placeId") or item.get("place_id") or item.get("id") or "").strip()
+                    if place_id:
+                        counts[place_id] += weight
+    return counts
+
+
+def _months_since(value: Any, now: datetime) -> float:
+    text = str(value or "").strip()
+    if not text:
+        return MAX_STALE_MONTHS
+    try:
+        stamp = datetime.fromisoformat(text.replace("Z", "+00:00"))
+    except ValueError:
+        return MAX_STALE_MONTHS
+    if stamp.tzinfo is None:
+        stamp = stamp.replace(tzinfo=timezone.utc)
+    return min(MAX_STALE_MONTHS, max(0.0, (now - stamp).total_seconds() / (30 * 86400)))
+
+
+def priority_score(
+    place: Dict[str, Any],
+    gap_count: int,
+    itinerary_hits: float,
+    *,
+    now: datetime,
+    weights: Dict[str, float] = PRIORITY_WEIGHTS,
+) -> float:
+    try:
+        ratings_total = max(0, int(place.get("userRatingsTotal") or 0))
+    except (TypeError, ValueError):
+        ratings_total = 0
+    return (
+        weights["gaps"] * gap_count
+        + weights["popularity"] * math.log1p(ratings_total)
+        + weights["itinerary"] * min(itinerary_hits, MAX_ITINERARY_HITS)
+        + weights["staleness"] * _months_since(place.get("updatedAt"), now)
+    )
+
+
+class EnrichmentQueue:
+    """Max-priority queue of places; iteration pops the best remaining candidate.
+
+    Ties keep input order, so with all-equal scores the crawl behaves as before.
+    """
+
+    def __init__(
+        self,
+        places: Iterable[Dict[str, Any]],
+        *,
+        gap_count: Callable[[Dict[str, Any]], int],
+        itinerary_counts: Counter,
+        now: datetime | None = None,
+    ) -> None:
+        now = now or datetime.now(timezone.utc)
+        self._heap: List[tuple[float, int, Dict[str, Any]]] = []
+        for order, place in enumerate(places):
+            place_id = str(place.get("id") or "").strip()
+            score = priority_score(place, gap_count(place), itinerary_counts.get(place_id, 0.0), now=now)
+            self._heap.append((-score, order, place))
+        heapq.heapify(self._heap)
+        self.in_itineraries = sum(
+            1 for _, _, place in self._heap if itinerary_counts.get(str(place.get("id") or "").strip())
+        )
+
+    def __len__(self) -> int:
+        return len(self._heap)
+
+    def __iter__(self) -> Iterator[Dict[str, Any]]:
+        while self._heap:
+            yield heapq.heappop(self._heap)[2]
+
+    def top_score(self) -> float:
+        return -self._heap[0][0] if self._heap else 0.0
+
+
+def allocate_budget(
+    total: int,
+    demands: Dict[str, int],
+    *,
+    floors: Dict[str, int] | None = None,
+    weights: Dict[str, float] = PHASE_WEIGHTS,
+) -> Dict[str, int]:
+    """Split `total` requests across phases.
+
+    Each phase first gets its floor (e.g. first result pages for every
+    query), then the rest is shared in proportion to weight x demand,
+    never exceeding a phase's demand; capacity a phase cannot use is handed
+    to the others (water-filling).
+    """
+    total = max(0, int(total))
+    demands = {name: max(0, int(value)) for name, value in demands.items()}
+    alloc = {name: 0 for name in demands}
+    remaining = total
+    for name, floor in (floors or {}).items():
+        if name not in alloc:
+            continue
+        take = min(max(0, int(floor)), demands[name], remaining)
+        alloc[name] += take
+        remaining -= take
+
+    while remaining > 0:
+        open_phases = [
+            name for name in demands
+            if alloc[name] < demands[name] and weights.get(name, 1.0) > 0
+        ]
+        if not open_phases:
+            break
+        mass = sum(weights.get(name, 1.0) * demands[name] for name in open_phases)
+        handed = 0
+        for name in open_phases:
+            share = int(remaining * weights.get(name, 1.0) * demands[name] / mass) if mass else 0
+            take = min(share, demands[name] - alloc[name])
+            alloc[name] += take
+            handed += take
+        if handed == 0:
+            # Rounding left a few requests; give them out one at a time by weight.
+            name = max(open_phases, key=lambda item: weights.get(item, 1.0))
+            alloc[name] += 1
+            handed = 1
+        remaining -= handed
+    return alloc
@@ -0,0 +1,342 @@
+"""
+Whole-island crawl split into per-city shards that run in parallel processes.
+
+Each shard is one fetch_places_from_google.py run with GOOGLE_PLACE_CITY set,
+in its own process and its own staging directory (a copy of db.json and
+places_with_reviews.jsonl, its own checkpoint, Details archive and log). All
+shards draw from one MAX_REQUESTS budget and one GOOGLE_QPS token bucket in
+shared memory, so the quota and rate limit hold for the run as a whole.
+
+When the shards are done, the places and review items each shard changed
+(compared with the snapshot it started from) are merged into the real
+db.json with `_merge_places`, one shard at a time in TAIWAN_CITIES order,
+so the result does not depend on which process finished first. Shard
+Details archives are copied into the main archive in the same order.
+
+Usage:
+  GOOGLE_MAPS_API_KEY=your_key python3 backend/scripts/crawl_shards.py
+  GOOGLE_MAPS_API_KEY=your_key python3 backend/scripts/crawl_shards.py --cities 臺北市,新北市 --workers 2
+  GOOGLE_MAPS_API_KEY=your_key python3 backend/scripts/crawl_shards.py --resume   # 接續未完成的分片
+  python3 backend/scripts/crawl_shards.py --merge-only                           # 只合併已完成的分片
+
+Optional env:
+  CRAWL_SHARD_DIR=backend/data/crawl_shards
+  CRAWL_SHARD_WORKERS=4   # 同時執行的分片數（預設 CPU 數）
+  MAX_REQUESTS / GOOGLE_QPS 為所有分片共用的總量與速率；
+  GOOGLE_CRAWL_PROFILE 僅支援 balanced / fast_bulk / tiles，其餘設定照常傳給每個分片。
+"""
+from __future__ import annotations
+
+import argparse
+import hashlib
+import json
+import multiprocessing
+import os
+import queue
+import shutil
+import sys
+import time
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, List
+
+import fetch_places_from_google as crawler
+from details_archive import ARCHIVE_PATH, DetailsArchive, iter_records
+from google_places_client import QPS, SharedRequestBudget, SharedTokenBucket
+from place_diff import ChangeLog, place_fingerprint
+from place_store import PlaceStore, iter_review_items, open_place_store
+from review_store import read_review_items, write_review_items
+
+ROOT = Path(__file__).resolve().parents[1]
+SHARD_DIR = Path(os.environ.get("CRAWL_SHARD_DIR", str(ROOT / "data" / "crawl_shards")))
+SHARD_WORKERS = int(os.environ.get("CRAWL_SHARD_WORKERS", "0") or 0) or (os.cpu_count() or 1)
+SHARDABLE_PROFILES = {"balanced", "fast_bulk", "tiles"}
+SHARD_REVIEWS_NAME = "places_with_reviews.jsonl"
+
+
+def _review_digest(item: Dict[str, Any]) -> str:
+    payload = json.dumps(item, ensure_ascii=False, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha1(payload.encode("utf-8")).hexdigest()[:16]
+
+
+def _place_key(place: Dict[str, Any]) -> str:
+    place_id = str(place.get("id") or "").strip()
+    return place_id or "|".join(crawler._place_record_merge_key(place))
+
+
+class ShardRun:
+    """Staging directories, manifest and start snapshot of one sharded crawl."""
+
+    def __init__(self, root: Path = SHARD_DIR) -> None:
+        self.root = Path(root)
+        self.manifest_path = self.root / "manifest.json"
+        self.seed_path = self.root / "seed.json"
+        self.manifest: Dict[str, Any] = {"requestCount": 0, "shards": {}}
+        if self.manifest_path.exists():
+            self.manifest = json.loads(self.manifest_path.read_text(encoding="utf-8"))
+
+    def shard_dir(self, city: str) -> Path:
+        return self.root / city
+
+    def shard(self, city: str) -> Dict[str, Any]:
+        return self.manifest["shards"].setdefault(city, {"status": "pending", "requests": 0})
+
+    def save_manifest(self) -> None:
+        self.root.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.manifest_path.with_name(self.manifest_path.name + ".tmp")
+        tmp_path.write_text(json.dumps(self.manifest, ensure_ascii=False, indent=2), encoding="utf-8")
+        os.replace(tmp_path, self.manifest_path)
+
+    def seed(self, cities: List[str]) -> None:
+        """Start fresh: copy the current places / reviews into every shard and remember what they were."""
+        store = open_place_store(crawler.DB_PATH, merge_key=crawler._place_record_merge_key)
+        if self.root.exists():
+            shutil.rmtree(self.root)
+        self.root.mkdir(parents=True)
+        # Shards only need the places (works for the SQLite backend too); render once, copy the rest.
+        snapshot = self.root / "seed_db.json"
+        PlaceStore(snapshot, {"places": store.places}).save(force=True)
+        review_digests: set[str] = set()
+
+        def _digested(items: Iterable[Dict[str, Any]]) -> Iterator[Dict[str, Any]]:
+            for item in items:
+                review_digests.add(_review_digest(item))
+                yield item
+
+        reviews_snapshot = self.root / "seed_reviews.jsonl"
+        write_review_items(reviews_snapshot, _digested(iter_review_items(crawler.REVIEWS_PATH)))
+        seed = {
+            "places": {_place_key(place): place_fingerprint(place) for place in store.places if isinstance(place, dict)},
+            "reviews": sorted(review_digests),
+        }
+        self.seed_path.write_text(json.dumps(seed, ensure_ascii=False), encoding="utf-8")
+        for city in cities:
+            shard_dir = self.shard_dir(city)
+            shard_dir.mkdir()
+            shutil.copyfile(snapshot, shard_dir / "db.json")
+            shutil.copyfile(reviews_snapshot, shard_dir / SHARD_REVIEWS_NAME)
+        snapshot.unlink()
+        reviews_snapshot.unlink()
+        reviews_snapshot.with_suffix(".idx.json").unlink(missing_ok=True)
+        self.manifest = {"requestCount": 0, "shards": {city: {"status": "pending", "requests": 0} for city in cities}}
+        self.save_manifest()
+
+    def load_seed(self) -> Dict[str, Any]:
+        return json.loads(self.seed_path.read_text(encoding="utf-8"))
+
+
+def _shard_env(city: str, shard_dir: Path) -> Dict[str, str]:
+    return {
+        "GOOGLE_PLACE_CITY": city,
+        "PLACES_DB_PATH": str(shard_dir / "db.json"),
+        "PLACES_REVIEWS_PATH": str(shard_dir / SHARD_REVIEWS_NAME),
+        "PLACE_STORE_BACKEND": "json",
+        "CRAWL_CHECKPOINT_PATH": str(shard_dir / "checkpoint.json"),
+        "PLACES_DETAILS_ARCHIVE": str(shard_dir / "details_archive.jsonl.gz"),
+        # The merge step writes the changelog for the real db.json.
+        "PLACE_CHANGELOG_PATH": "",
+        "GOOGLE_QUOTA_SCRIPT": "crawl_shards",
+    }
+
+
+def _run_shard(
+    city: str,
+    shard_dir: str,
+    resume: bool,
+    budget: SharedRequestBudget,
+    limiter: SharedTokenBucket,
+    results: Any,
+) -> None:
+    """Worker process: one city crawl writing only to its staging directory; output goes to crawl.log."""
+    started = time.monotonic()
+    with (Path(shard_dir) / "crawl.log").open("a", encoding="utf-8", buffering=1) as log:
+        sys.stdout = sys.stderr = log
+        try:
+            crawler.main(["--resume"] if resume else [], shared_budget=budget, shared_limiter=limiter)
+            status, error = "done", ""
+        except BaseException as exc:  # SystemExit, OVER_QUERY_LIMIT, Ctrl-C ...
+            status, error = "failed", f"{type(exc).__name__}: {exc}"
+            print(f"分片失敗：{error}")
+    results.put(
+        {
+            "city": city,
+            "status": status,
+            "error": error,
+            "requests": budget.local_used,
+            "seconds": round(time.monotonic() - started, 1),
+        }
+    )
+
+
+def _start_shard(ctx: Any, run: ShardRun, city: str, resume: bool, *shared: Any) -> Any:
+    # A spawned child imports the crawler modules afresh and they read their settings from the
+    # environment at import time, so the shard's environment must be in place when it starts.
+    env = _shard_env(city, run.shard_dir(city))
+    saved = {key: os.environ.get(key) for key in env}
+    os.environ.update(env)
+    try:
+        process = ctx.Process(
+            target=_run_shard,
+            args=(city, str(run.shard_dir(city)), resume, *shared),
+            name=f"shard-{city}",
+        )
+        process.start()
+    finally:
+        for key, value in saved.items():
+            if value is None:
+                os.environ.pop(key, None)
+            else:
+                os.environ[key] = value
+    return process
+
+
+def run_shards(run: ShardRun, cities: List[str], workers: int, *, resume: bool) -> None:
+    ctx = multiprocessing.get_context("spawn")
+    budget = SharedRequestBudget(crawler.MAX_REQUESTS, used=int(run.manifest.get("requestCount") or 0), ctx=ctx)
+    limiter = SharedTokenBucket(QPS, burst=max(1.0, min(QPS, float(workers))), ctx=ctx)
+    results = ctx.Queue()
+    pending = [city for city in cities if run.shard(city)["status"] not in {"done", "merged"}]
+    running: Dict[str, Any] = {}
+    print(f"分片抓取：{len(pending)}/{len(cities)} 個縣市，{workers} 個行程，共用配額 {budget.remaining()}/{crawler.MAX_REQUESTS}")
+    started = time.monotonic()
+
+    def _record(result: Dict[str, Any]) -> None:
+        shard = run.shard(result["city"])
+        shard.update(
+            status=result["status"],
+            error=result["error"],
+            requests=int(shard.get("requests") or 0) + result["requests"],
+        )
+        run.manifest["requestCount"] = budget.used
+        run.save_manifest()
+        process = running.pop(result["city"], None)
+        if process is not None:
+            process.join()
+        print(
+            f"  {result['city']}: {result['status']}，請求 {result['requests']} 次，"
+            f"{result['seconds']}s{'，' + result['error'] if result['error'] else ''}"
+        )
+
+    try:
+        while pending or running:
+            while pending and len(running) < workers:
+                city = pending.pop(0)
+                running[city] = _start_shard(ctx, run, city, resume, budget, limiter, results)
+            try:
+                _record(results.get(timeout=1.0))
+            except queue.Empty:
+                # A shard reports even when its crawl fails; a non-zero exit means it was killed.
+                for city, process in list(running.items()):
+                    if process.exitcode not in (None, 0):
+                        _record(
+                            {"city": city, "status": "failed", "error": f"exit {process.exitcode}", "requests": 0, "seconds": 0}
+                        )
+    finally:
+        for process in running.values():
+            process.join()
+        while True:
+            try:
+                _record(results.get_nowait())
+            except queue.Empty:
+                break
+        run.manifest["requestCount"] = budget.used
+        run.save_manifest()
+    print(f"分片完成，耗時 {time.monotonic() - started:.1f}s，API 請求 {budget.used}/{crawler.MAX_REQUESTS}")
+
+
+def merge_shards(run: ShardRun, cities: List[str]) -> None:
+    """Fold every finished shard into db.json / places_with_reviews.jsonl in TAIWAN_CITIES order."""
+    seed = run.load_seed()
+    seed_places: Dict[str, str] = seed["places"]
+    seed_reviews = set(seed["reviews"])
+    store = open_place_store(crawler.DB_PATH, merge_key=crawler._place_record_merge_key)
+    changelog = ChangeLog()
+    archive = DetailsArchive(ARCHIVE_PATH)
+    totals = {"added": 0, "updated": 0, "unchanged": 0}
+    merged_reviews = 0
+    try:
+        for city in cities:
+            shard = run.shard(city)
+            if shard["status"] != "done":
+                continue
+            shard_dir = run.shard_dir(city)
+            # Only what this shard changed: its untouched copies of other cities' places are stale.
+            fresh = [
+                place
+                for place in PlaceStore.load(shard_dir / "db.json").places
+                if isinstance(place, dict)
+                and seed_places.get(_place_key(place)) != place_fingerprint(place)
+            ]
+            _, stats = crawler._merge_places(store, fresh, changelog)
+            review_items = [
+                item
+                for item in read_review_items(shard_dir / SHARD_REVIEWS_NAME)
+                if _review_digest(item) not in seed_reviews
+            ]
+            merged_reviews += crawler._append_review_items(crawler.REVIEWS_PATH, review_items)
+            for record in iter_records(shard_dir / "details_archive.jsonl.gz"):
+                archive.append_record(record)
+            for name, count in stats.items():
+                totals[name] += count
+            shard["status"] = "merged"
+            print(
+                f"  合併 {city}：新增 {stats['added']}／更新 {stats['updated']}／未變更 {stats['unchanged']}，"
+                f"評論 {len(review_items)} 筆"
+            )
+        store.save()
+        changelog.flush()
+        run.save_manifest()
+    finally:
+        archive.close()
+    print(
+        f"合併完成，寫入 {store.path}，新增 {totals['added']}／更新 {totals['updated']}／未變更 {totals['unchanged']}，"
+        f"評論 {merged_reviews} 筆，Details 封存新增 {archive.appended} 筆"
+    )
+    print(changelog.summary())
+    pending = [city for city in cities if run.shard(city)["status"] not in {"merged"}]
+    if pending:
+        print(f"尚未完成的分片（可加 --resume 接續）：{'、'.join(pending)}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="依縣市分片、多行程平行抓取 Google Places，完成後依序合併")
+    parser.add_argument("--cities", default="", help="以逗號分隔的縣市（預設全部 22 縣市）")
+    parser.add_argument("--workers", type=int, default=SHARD_WORKERS)
+    parser.add_argument("--resume", action="store_true", help="接續上次的分片（已完成的分片不重抓）")
+    parser.add_argument("--merge-only", action="store_true", help="不抓取，只合併已完成的分片")
+    args = parser.parse_args()
+
+    requested = [crawler.normalize_city_name(part.strip()) for part in args.cities.split(",") if part.strip()]
+    unknown = [city for city in requested if city not in crawler.TAIWAN_CITIES]
+    if unknown:
+        sys.exit(f"未知縣市：{'、'.join(unknown)}")
+    # TAIWAN_CITIES order is the merge order, whatever order the cities were given in.
+    cities = [city for city in crawler.TAIWAN_CITIES if not requested or city in requested]
+
+    run = ShardRun()
+    if args.merge_only:
+        if not run.seed_path.exists():
+            sys.exit(f"找不到分片資料 {run.root}")
+        merge_shards(run, cities)
+        return
+    if not crawler.API_KEY:
+        sys.exit("請先在環境變數設定 GOOGLE_MAPS_API_KEY")
+    if crawler.CRAWL_PROFILE not in SHARDABLE_PROFILES:
+        sys.exit(f"分片抓取僅支援 GOOGLE_CRAWL_PROFILE={'/'.join(sorted(SHARDABLE_PROFILES))}")
+    if crawler.MERGE_MODE == "replace":
+        sys.exit("分片抓取不支援 MERGE_MODE=replace")
+    if not crawler.DB_PATH.exists():
+        sys.exit(f"找不到 {crawler.DB_PATH}")
+
+    if args.resume and run.seed_path.exists():
+        missing = [city for city in cities if city not in run.manifest["shards"]]
+        if missing:
+            sys.exit(f"上次的分片不包含：{'、'.join(missing)}（請勿加 --resume 重新開始）")
+        print(f"接續分片 {run.root}，已用請求 {run.manifest.get('requestCount', 0)}")
+    else:
+        run.seed(cities)
+    run_shards(run, cities, max(1, args.workers), resume=args.resume)
+    merge_shards(run, cities)
+
+
+if __name__ == "__main__":
+    main()
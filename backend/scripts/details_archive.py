@@ -0,0 +1,205 @@
+"""
+Append-only archive of raw Google Place Details responses.
+
+Every Details `result` fetched by the crawler is appended as one JSON line to
+a gzip file (one gzip member per crawl run). Nothing is rewritten in place;
+later records for a place_id are layered over earlier ones on read. This is
+what `GOOGLE_CRAWL_PROFILE=rederive` replays to recompute tags / price /
+opening hours without calling the API again.
+
+A run killed mid-write leaves its gzip member unfinished. Readers keep the
+complete lines of such a member and resume at the next member header, so
+records appended by later runs stay readable; the next writer cuts an
+unfinished last member off before appending its own.
+
+Record format:
+  {"place_id": "ChIJ...", "ref": "<db place id if different>", "fetchedAt": "...",
+   "digest": "<sha1 of result>", "result": {...}}
+
+Optional env:
+  PLACES_DETAILS_ARCHIVE=backend/data/places_details_archive.jsonl.gz
+"""
+from __future__ import annotations
+
+import gzip
+import hashlib
+import json
+import os
+import threading
+import zlib
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, BinaryIO, Dict, Iterator, List
+
+ROOT = Path(__file__).resolve().parents[1]
+ARCHIVE_PATH = Path(
+    os.environ.get("PLACES_DETAILS_ARCHIVE", str(ROOT / "data" / "places_details_archive.jsonl.gz"))
+)
+
+
+def _digest(result: Dict[str, Any]) -> str:
+    payload = json.dumps(result, ensure_ascii=False, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha1(payload.encode("utf-8")).hexdigest()
+
+
+_GZIP_MAGIC = b"\x1f\x8b\x08"
+_CHUNK = 1 << 16
+
+
+def _next_member(fh: BinaryIO, offset: int) -> int | None:
+    """Offset of the first gzip member header at or after `offset`."""
+    fh.seek(offset)
+    carry = b""
+    while True:
+        chunk = fh.read(_CHUNK)
+        if not chunk:
+            return None
+        found = (carry + chunk).find(_GZIP_MAGIC)
+        if found >= 0:
+            return offset - len(carry) + found
+        carry = (carry + chunk)[-(len(_GZIP_MAGIC) - 1) :]
+        offset += len(chunk)
+
+
+def _iter_lines(path: Path, ends: List[int] | None = None) -> Iterator[bytes]:
+    """Lines of every gzip member in the file, member by member.
+
+    An unfinished or corrupt member contributes the complete lines decoded
+    before the damage, and reading resumes at the next member header. The end
+    offset of every intact member is appended to `ends`.
+    """
+    with path.open("rb") as fh:
+        size = fh.seek(0, os.SEEK_END)
+        start: int | None = 0
+        while start is not None:
+            fh.seek(start)
+            decoder = zlib.decompressobj(16 + zlib.MAX_WBITS)
+            position, pending, end = start, b"", None
+            try:
+                while end is None:
+                    chunk = fh.read(_CHUNK)
+                    if not chunk:
+                        break
+                    *lines, pending = (pending + decoder.decompress(chunk)).split(b"\n")
+                    yield from lines
+                    position += len(chunk)
+                    if decoder.eof:
+                        end = position - len(decoder.unused_data)
+            except zlib.error:
+                pass
+            if end is None:
+                start = _next_member(fh, start + 1)
+                continue
+            if pending:
+                yield pending
+            if ends is not None:
+                ends.append(end)
+            start = end if end < size else None
+
+
+def iter_records(path: Path = ARCHIVE_PATH, ends: List[int] | None = None) -> Iterator[Dict[str, Any]]:
+    """Yield archive records in append order, skipping what crashed runs left unfinished."""
+    path = Path(path)
+    if not path.exists():
+        return
+    for line in _iter_lines(path, ends):
+        if not line.strip():
+            continue
+        try:
+            record = json.loads(line)
+        except ValueError:
+            continue
+        if isinstance(record, dict) and record.get("place_id"):
+            yield record
+
+
+def load_latest(path: Path = ARCHIVE_PATH) -> Dict[str, Dict[str, Any]]:
+    """Latest record per key; records are reachable by Google place_id and by `ref`.
+
+    Requests may use a trimmed field mask (details_fields.py), so a newer record
+    is layered over the older result for the same place instead of replacing it.
+    """
+    latest: Dict[str, Dict[str, Any]] = {}
+    for record in iter_records(path):
+        previous = latest.get(record["place_id"])
+        if previous is not None:
+            record = {**record, "result": {**(previous.get("result") or {}), **(record.get("result") or {})}}
+        latest[record["place_id"]] = record
+        ref = record.get("ref")
+        if ref:
+            latest[ref] = record
+    return latest
+
+
+class DetailsArchive:
+    """Thread-safe appender; identical payloads for a place are not written twice."""
+
+    def __init__(self, path: Path = ARCHIVE_PATH) -> None:
+        self.path = Path(path)
+        self.appended = 0
+        self._lock = threading.Lock()
+        self._fh: Any = None
+        self._digests: Dict[str, str] | None = None
+
+    def _known_digests(self) -> Dict[str, str]:
+        if self._digests is None:
+            ends: List[int] = []
+            self._digests = self._read_digests(ends)
+            if self._drop_unfinished_tail(ends[-1] if ends else 0):
+                # Records from the dropped member are gone and must be appended again.
+                self._digests = self._read_digests()
+        return self._digests
+
+    def _read_digests(self, ends: List[int] | None = None) -> Dict[str, str]:
+        return {_record_key(record): record.get("digest") or "" for record in iter_records(self.path, ends)}
+
+    def _drop_unfinished_tail(self, end: int) -> bool:
+        """Cut off what follows the last intact member, so this run's member starts on a clean boundary."""
+        if not self.path.exists():
+            return False
+        size = self.path.stat().st_size
+        if size <= end:
+            return False
+        with self.path.open("r+b") as fh:
+            fh.truncate(end)
+        print(f"{self.path}：移除未寫完的 gzip 區塊（{size - end} bytes）")
+        return True
+
+    def append(self, place_id: str, result: Dict[str, Any], *, ref: str = "") -> bool:
+        place_id = (place_id or "").strip()
+        if not place_id or not result:
+            return False
+        ref = (ref or "").strip()
+        record: Dict[str, Any] = {"place_id": place_id}
+        if ref and ref != place_id:
+            record["ref"] = ref
+        record["fetchedAt"] = datetime.now(timezone.utc).replace(microsecond=0).isoformat()
+        record["digest"] = _digest(result)
+        record["result"] = result
+        return self.append_record(record)
+
+    def append_record(self, record: Dict[str, Any]) -> bool:
+        """Append a complete record (e.g. copied from another archive), keeping its fetchedAt."""
+        digest = record.get("digest") or _digest(record.get("result") or {})
+        key = _record_key(record)
+        with self._lock:
+            digests = self._known_digests()
+            if digests.get(key) == digest:
+                return False
+            if self._fh is None:
+                self.path.parent.mkdir(parents=True, exist_ok=True)
+                self._fh = gzip.open(self.path, "at", encoding="utf-8")
+            self._fh.write(json.dumps({**record, "digest": digest}, ensure_ascii=False, separators=(",", ":")) + "\n")
+            digests[key] = digest
+            self.appended += 1
+        return True
+
+    def close(self) -> None:
+        with self._lock:
+            if self._fh is not None:
+                self._fh.close()
+                self._fh = None
+
+
+def _record_key(record: Dict[str, Any]) -> str:
+    return f"{record.get('place_id')}|{record.get('ref') or ''}"
@@ -0,0 +1,211 @@
+"""
+Field-mask planning for Google Place Details requests.
+
+Details billing and payload size depend on the requested `fields`: Basic
+fields are included in the base Details price, Contact fields (opening_hours)
+and Atmosphere fields (rating, reviews, price_level, editorial_summary, ...)
+are billed on top, and reviews / photos make up most of the response size.
+`plan_fields()` maps the gaps a place actually has to the smallest field list
+that can fill them, and `FieldMaskStats` reports what that saved in a run.
+
+Latency and payload savings are measured against the average full-mask
+request. A backfill run usually trims every request, so full-mask averages are
+kept across runs in details_field_baseline.json (roughly the latest 500
+full-mask requests), or can be set explicitly.
+
+Gap names (see `_enrich_gaps` in fetch_places_from_google.py):
+  image, rating, price, address, city, opening_hours, location, reviews
+
+Prices are USD per 1000 requests (legacy Places API SKUs); override with
+  DETAILS_PRICE_BASE=17 DETAILS_PRICE_CONTACT=3 DETAILS_PRICE_ATMOSPHERE=5
+
+Optional env:
+  DETAILS_FIELD_BASELINE_PATH=backend/data/details_field_baseline.json
+  DETAILS_FULL_LATENCY_MS=350  # 指定全欄位請求的平均延遲，取代歷次量測值
+  DETAILS_FULL_KB=12           # 指定全欄位回應的平均大小
+"""
+from __future__ import annotations
+
+import json
+import os
+import threading
+from pathlib import Path
+from typing import Any, Dict, Iterable, Tuple
+
+FULL_FIELDS: Tuple[str, ...] = (
+    "place_id",
+    "name",
+    "formatted_address",
+    "geometry",
+    "editorial_summary",
+    "reviews",
+    "rating",
+    "user_ratings_total",
+    "price_level",
+    "types",
+    "address_components",
+    "photos",
+    "opening_hours",
+)
+
+# Always requested: identifiers plus `types`, which tag / price / hours inference reads.
+_BASE_FIELDS = ("place_id", "name", "types")
+
+GAP_FIELDS: Dict[str, Tuple[str, ...]] = {
+    "image": ("photos",),
+    "rating": ("rating", "user_ratings_total"),
+    "price": ("price_level", "editorial_summary"),
+    "address": ("formatted_address", "address_components"),
+    "city": ("formatted_address", "address_components"),
+    "opening_hours": ("opening_hours",),
+    "location": ("geometry",),
+    "reviews": ("reviews", "editorial_summary"),
+}
+
+CONTACT_FIELDS = frozenset({"opening_hours"})
+ATMOSPHERE_FIELDS = frozenset(
+    {"editorial_summary", "reviews", "rating", "user_ratings_total", "price_level"}
+)
+
+PRICE_BASE = float(os.environ.get("DETAILS_PRICE_BASE", "17"))
+PRICE_CONTACT = float(os.environ.get("DETAILS_PRICE_CONTACT", "3"))
+PRICE_ATMOSPHERE = float(os.environ.get("DETAILS_PRICE_ATMOSPHERE", "5"))
+
+ROOT = Path(__file__).resolve().parents[1]
+BASELINE_PATH = Path(
+    os.environ.get("DETAILS_FIELD_BASELINE_PATH", str(ROOT / "data" / "details_field_baseline.json"))
+)
+FULL_LATENCY_MS = float(os.environ.get("DETAILS_FULL_LATENCY_MS", "0") or 0)
+FULL_KB = float(os.environ.get("DETAILS_FULL_KB", "0") or 0)
+# Stored full-mask totals are scaled down past this many requests, so recent runs dominate.
+_BASELINE_MAX_SAMPLES = 500
+
+
+def plan_fields(gaps: Iterable[str]) -> Tuple[str, ...]:
+    """Minimal Details field list for `gaps`, in FULL_FIELDS order; no gaps means full."""
+    wanted = set(_BASE_FIELDS)
+    any_gap = False
+    for gap in gaps:
+        fields = GAP_FIELDS.get(gap)
+        if fields is None:
+            return FULL_FIELDS
+        wanted.update(fields)
+        any_gap = True
+    if not any_gap:
+        return FULL_FIELDS
+    return tuple(field for field in FULL_FIELDS if field in wanted)
+
+
+def request_cost(fields: Iterable[str]) -> float:
+    """Estimated USD cost of one Details request with `fields`."""
+    fields = set(fields)
+    cost = PRICE_BASE
+    if fields & CONTACT_FIELDS:
+        cost += PRICE_CONTACT
+    if fields & ATMOSPHERE_FIELDS:
+        cost += PRICE_ATMOSPHERE
+    return cost / 1000
+
+
+class FieldMaskStats:
+    """Per-run tally of Details requests by field mask (thread-safe).
+
+    Savings are measured against the full-mask averages: DETAILS_FULL_LATENCY_MS /
+    DETAILS_FULL_KB when set, else the stored baseline merged with this run's
+    full-mask requests. `save()` folds this run's full-mask requests into the store.
+    """
+
+    def __init__(self, baseline_path: Path | None = BASELINE_PATH) -> None:
+        self._lock = threading.Lock()
+        self.by_mask: Dict[Tuple[str, ...], Dict[str, float]] = {}
+        self.baseline_path = Path(baseline_path) if baseline_path else None
+        self.stored = self._load_baseline()
+
+    def _load_baseline(self) -> Dict[str, float]:
+        if self.baseline_path is None or not self.baseline_path.exists():
+            return {}
+        try:
+            data: Any = json.loads(self.baseline_path.read_text(encoding="utf-8"))
+            entry = {key: float(data[key]) for key in ("count", "seconds", "bytes")}
+        except (ValueError, KeyError, TypeError):
+            return {}
+        return entry if entry["count"] > 0 else {}
+
+    def record(self, fields: Tuple[str, ...], seconds: float, payload_bytes: int) -> None:
+        with self._lock:
+            entry = self.by_mask.setdefault(fields, {"count": 0, "seconds": 0.0, "bytes": 0})
+            entry["count"] += 1
+            entry["seconds"] += seconds
+            entry["bytes"] += payload_bytes
+
+    def _full_totals(self) -> Dict[str, float]:
+        """Stored full-mask totals plus this run's, capped at _BASELINE_MAX_SAMPLES requests."""
+        with self._lock:
+            run = dict(self.by_mask.get(FULL_FIELDS) or {})
+        totals = {key: self.stored.get(key, 0.0) + run.get(key, 0.0) for key in ("count", "seconds", "bytes")}
+        if totals["count"] > _BASELINE_MAX_SAMPLES:
+            scale = _BASELINE_MAX_SAMPLES / totals["count"]
+            totals = {key: value * scale for key, value in totals.items()}
+        return totals
+
+    def full_baseline(self) -> Tuple[float, float] | None:
+        """(seconds, bytes) of an average full-mask request, or None when nothing is known."""
+        if FULL_LATENCY_MS > 0 and FULL_KB > 0:
+            return FULL_LATENCY_MS / 1000, FULL_KB * 1024
+        totals = self._full_totals()
+        if not totals["count"]:
+            return None
+        seconds, payload = totals["seconds"] / totals["count"], totals["bytes"] / totals["count"]
+        if FULL_LATENCY_MS > 0:
+            seconds = FULL_LATENCY_MS / 1000
+        if FULL_KB > 0:
+            payload = FULL_KB * 1024
+        return seconds, payload
+
+    def save(self) -> bool:
+        """Fold this run's full-mask requests into the stored baseline; False when it made none."""
+        if self.baseline_path is None or FULL_FIELDS not in self.by_mask:
+            return False
+        totals = self._full_totals()
+        self.baseline_path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.baseline_path.with_name(f"{self.baseline_path.name}.{os.getpid()}.tmp")
+        tmp_path.write_text(json.dumps(totals), encoding="utf-8")
+        os.replace(tmp_path, self.baseline_path)
+        return True
+
+    def summary(self) -> list[str]:
+        with self._lock:
+            items = sorted(self.by_mask.items(), key=lambda kv: -kv[1]["count"])
+        if not items:
+            return []
+        full = self.full_baseline()
+        lines = []
+        total = trimmed = 0
+        spent = baseline = 0.0
+        saved_seconds = saved_bytes = 0.0
+        for fields, entry in items:
+            count = int(entry["count"])
+            total += count
+            spent += request_cost(fields) * count
+            baseline += request_cost(FULL_FIELDS) * count
+            avg_ms = entry["seconds"] / count * 1000
+            avg_kb = entry["bytes"] / count / 1024
+            label = "完整" if fields == FULL_FIELDS else ",".join(f for f in fields if f not in _BASE_FIELDS)
+            lines.append(f"  [{label}] {count} 次，平均 {avg_ms:.0f} ms / {avg_kb:.1f} KB")
+            if fields != FULL_FIELDS:
+                trimmed += count
+                if full is not None:
+                    saved_seconds += full[0] * count - entry["seconds"]
+                    saved_bytes += full[1] * count - entry["bytes"]
+        head = (
+            f"Details 欄位分級：共 {total} 次，精簡 {trimmed} 次，"
+            f"估計費用 ${spent:.2f}（全欄位 ${baseline:.2f}，節省 ${baseline - spent:.2f}）"
+        )
+        if trimmed and full is not None:
+            head += (
+                f"，約省 {saved_seconds:.1f} 秒請求時間、{saved_bytes / 1024:.0f} KB 回應"
+                f"（全欄位基準 {full[0] * 1000:.0f} ms / {full[1] / 1024:.1f} KB）"
+            )
+        elif trimmed:
+            head += "，尚無全欄位請求可估算省下的時間與流量"
+        return [head, *lines]
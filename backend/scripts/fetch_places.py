@@ -15,12 +15,14 @@ from __future__ import annotations
 
 import json
 import sys
-import ssl
-import urllib.request
 from dataclasses import dataclass
 from pathlib import Path
 from typing import Dict, List, Optional
 
+from http_transport import request
+from keyword_matcher import KeywordMatcher
+from place_store import open_place_store
+
 DATA_URL = "https://media.taiwan.net.tw/XMLReleaseALL_public/scenic_spot_C_f.json"
 ROOT = Path(__file__).resolve().parents[1]
 DB_PATH = ROOT / "data" / "db.json"
@@ -28,16 +30,6 @@ REVIEWED_PATH = ROOT / "data" / "places_reviewed.json"
 MAX_ITEMS = 1200  # how many to pull from source before filtering/uniq
 KEEP_COUNT = 300  # how many valid places to save
 
-try:
-    import certifi
-
-    ssl._create_default_https_context = lambda: ssl.create_default_context(  # noqa: E731
-        cafile=certifi.where()
-    )
-except Exception:
-    pass
-
-
 # App interest categories (id -> keywords for mapping)
 INTEREST_KEYWORDS: List[tuple[str, str]] = [
     ("觀光工廠", "creative_park"),
@@ -123,6 +115,7 @@ INTEREST_KEYWORDS: List[tuple[str, str]] = [
     ("濕地", "national_park"),
     ("宗教", "temple"),
 ]
+_INTEREST_MATCHER = KeywordMatcher(INTEREST_KEYWORDS)
 
 
 @dataclass
@@ -156,39 +149,22 @@ class Place:
 def fetch_raw() -> List[Dict]:
     print(f"Downloading {DATA_URL} ...")
     try:
-        with urllib.request.urlopen(DATA_URL, timeout=30, context=_ssl_context()) as resp:
-            text = resp.read()
+        text = request("GET", DATA_URL, timeout=30).body
     except Exception as exc:
         print("SSL verify failed, retry without verification:", exc)
-        insecure = ssl.create_default_context()
-        insecure.check_hostname = False
-        insecure.verify_mode = ssl.CERT_NONE
-        with urllib.request.urlopen(DATA_URL, timeout=30, context=insecure) as resp:
-            text = resp.read()
+        text = request("GET", DATA_URL, timeout=30, verify=False).body
     data = json.loads(text.decode("utf-8-sig"))
     items = data["XML_Head"]["Infos"]["Info"]
     print("Fetched items:", len(items))
     return items
 
 
-def _ssl_context() -> ssl.SSLContext:
-    try:
-        import certifi
-
-        return ssl.create_default_context(cafile=certifi.where())
-    except Exception:
-        return ssl.create_default_context()
-
-
 def keyword_classify(txt: str) -> str:
     # temple special-case first (avoid company)
     for kw in ["廟", "寺", "宮"]:
         if kw in txt and "公司" not in txt:
             return "temple"
-    for kw, cid in INTEREST_KEYWORDS:
-        if kw in txt:
-            return cid
-    return "other"
+    return _INTEREST_MATCHER.first(txt) or "other"
 
 
 def build_places(raw: List[Dict]) -> List[Place]:
@@ -267,9 +243,7 @@ def train_and_refine(places: List[Place]) -> None:
 
 
 def write_db(places: List[Place]) -> None:
-    db = {}
-    if DB_PATH.exists():
-        db = json.loads(DB_PATH.read_text(encoding="utf-8"))
+    store = open_place_store(DB_PATH)
     # merge reviewed overrides
     overrides = {}
     if REVIEWED_PATH.exists():
@@ -294,8 +268,8 @@ def write_db(places: List[Place]) -> None:
     for p in places:
         merged_overrides.setdefault(p.name, p.tags or [p.category])
     REVIEWED_PATH.write_text(json.dumps(merged_overrides, ensure_ascii=False, indent=2), encoding="utf-8")
-    db["places"] = [p.to_dict() for p in places]
-    DB_PATH.write_text(json.dumps(db, ensure_ascii=False, indent=2), encoding="utf-8")
+    store.replace_all(p.to_dict() for p in places)
+    store.save()
     print("Wrote places to", DB_PATH)
     print("Reviewed overrides saved to", REVIEWED_PATH)
 
@@ -1,49 +1,97 @@
 """
-Seed places from Google Places Text Search, then fetch details (reviews + ratings)
-and merge into db.json + places_with_reviews.json.
+Seed places from Google Places Text Search (or Nearby Search over map tiles), then fetch details (reviews + ratings)
+and merge into db.json + places_with_reviews.jsonl (appended per checkpoint, see review_store.py).
 
 Usage:
   GOOGLE_MAPS_API_KEY=your_key python3 backend/scripts/fetch_places_from_google.py
+  GOOGLE_MAPS_API_KEY=your_key python3 backend/scripts/fetch_places_from_google.py --resume  # 從檢查點接續（見 crawl_checkpoint.py）
+
+Whole-island runs can be split per city across processes with crawl_shards.py.
 
 Optional env:
+  PLACES_DB_PATH=backend/data/db.json
+  PLACES_REVIEWS_PATH=backend/data/places_with_reviews.jsonl  # .json = 舊版整份 JSON 陣列
   GOOGLE_PLACE_QUERIES="台北 景點,台中 景點"
   GOOGLE_PLACE_CITY="宜蘭縣"  # 只抓單一縣市（優先於 GOOGLE_PLACE_QUERIES）
   MAX_REQUESTS=100
   TEXTSEARCH_MAX_PAGES=2
   GOOGLE_QUERY_SCOPE=standard|expanded
-  GOOGLE_CRAWL_PROFILE=balanced|fast_bulk|backfill
+  GOOGLE_CRAWL_PROFILE=balanced|fast_bulk|backfill|rederive|tiles
+    rederive: 不打 API，用 details_archive.py 封存的原始 Details 重算 tags/價格/營業時間
+    tiles: 以 Nearby Search 掃描縣市網格取代關鍵字查詢，滿頁的格子再細分（見 tile_crawl.py）
   MERGE_MODE=merge|replace
+  GOOGLE_CONCURRENCY=4  # 同時進行的請求數（見 google_places_client.py）
+  GOOGLE_QPS=5          # 每秒請求上限
+  PLACES_CACHE=on|off|offline|refresh  # 回應快取（見 response_cache.py）；offline 不需 API key
+  REDERIVE_WORKERS=4    # rederive 使用的行程數（預設 CPU 數）
+  ENRICH_WORKERS=1      # 補資料 Details 處理的行程數；>1 時每 ENRICH_BATCH_SIZE 筆分批平行處理
+  ENRICH_BATCH_SIZE=500
+  DETAILS_FIELD_TIERING=1  # 補資料時只請求缺漏欄位（見 details_fields.py），0 = 一律全欄位
+  CRAWL_PRIORITY_WEIGHTS / CRAWL_PHASE_WEIGHTS  # 補資料排序與各階段配額（見 crawl_scheduler.py）
+  PLACE_CHANGELOG_PATH=backend/data/place_changes.jsonl  # 逐欄位變更紀錄（見 place_diff.py）
+  GOOGLE_QUOTA_LEDGER / GOOGLE_DAILY_QUOTA / GOOGLE_MONTHLY_QUOTA / GOOGLE_GLOBAL_QPS  # 跨行程共用額度（見 quota_ledger.py）
 """
 from __future__ import annotations
 
+import argparse
 import json
 import os
 import re
-import ssl
 import sys
 import time
 import urllib.parse
-import urllib.request
+from concurrent.futures import FIRST_COMPLETED, Future, ProcessPoolExecutor, wait
 from dataclasses import dataclass
 from datetime import datetime, timezone
 from pathlib import Path
 from typing import Dict, Any, List, Iterable, Tuple
 
+from address_canon import (
+    address_quality_score,
+    build_address_from_components,
+    cache_summary as address_cache_summary,
+    canonical_address,
+    canonical_entry,
+    ensure_address_with_city,
+    extract_city,
+    extract_city_from_components,
+    normalize_city_name,
+    normalize_tw_text,
+    pick_best_address,
+    stamp_canonical_address,
+)
+from crawl_checkpoint import CheckpointMismatch, CrawlCheckpoint
+from crawl_scheduler import EnrichmentQueue, allocate_budget, load_itinerary_place_counts
+from details_fields import FULL_FIELDS, FieldMaskStats, plan_fields
+from details_archive import ARCHIVE_PATH, DetailsArchive, load_latest
+from http_transport import get_json, transport_summary
+from keyword_matcher import KeywordMatcher
+from google_places_client import PLACES_BASE_URL, BudgetExhausted, PlacesClient, RequestBudget, TokenBucket
+from place_diff import ChangeLog, diff_fields, place_fingerprint
+from place_store import PlaceStore, append_review_items, iter_review_items, open_place_store
+from quota_ledger import QuotaLedger
+from response_cache import ResponseCache
+from review_dedupe import ReviewDeduper, dedupe_review_items
+from tile_crawl import COUNTY_BOUNDS, NEARBY_PAGE_SIZE, SpatialDedupe, TileSet, item_location, tile_plan
+
 ROOT = Path(__file__).resolve().parents[1]
-DB_PATH = ROOT / "data" / "db.json"
-REVIEWS_PATH = ROOT / "data" / "places_with_reviews.json"
+DB_PATH = Path(os.environ.get("PLACES_DB_PATH", str(ROOT / "data" / "db.json")))
+REVIEWS_PATH = Path(os.environ.get("PLACES_REVIEWS_PATH", str(ROOT / "data" / "places_with_reviews.jsonl")))
 API_KEY = os.environ.get("GOOGLE_MAPS_API_KEY")
 
 MAX_REQUESTS = int(os.environ.get("MAX_REQUESTS", "100"))
 TEXTSEARCH_MAX_PAGES = int(os.environ.get("TEXTSEARCH_MAX_PAGES", "2"))
 QUERY_SCOPE = os.environ.get("GOOGLE_QUERY_SCOPE", "standard").strip().lower()
 CRAWL_PROFILE = os.environ.get("GOOGLE_CRAWL_PROFILE", "balanced").strip().lower()
-SLEEP_BETWEEN = 0.2
 MERGE_MODE = os.environ.get("MERGE_MODE", "merge").strip().lower()
+DETAILS_FIELD_TIERING = os.environ.get("DETAILS_FIELD_TIERING", "1").strip() != "0"
+REDERIVE_WORKERS = int(os.environ.get("REDERIVE_WORKERS", "0") or 0) or (os.cpu_count() or 1)
+ENRICH_WORKERS = max(1, int(os.environ.get("ENRICH_WORKERS", "1") or 1))
+ENRICH_BATCH_SIZE = max(1, int(os.environ.get("ENRICH_BATCH_SIZE", "500") or 500))
 REVIEWS_LIMIT = 5
 MIN_REVIEW_LEN = 12
 
-if CRAWL_PROFILE not in {"balanced", "fast_bulk", "backfill"}:
+if CRAWL_PROFILE not in {"balanced", "fast_bulk", "backfill", "rederive", "tiles"}:
     CRAWL_PROFILE = "balanced"
 
 TAIWAN_CITIES = [
@@ -113,67 +161,6 @@ CITY_QUERY_ALIASES = {
     "連江縣": "馬祖",
 }
 
-CITY_HINTS = [
-    "臺北市",
-    "台北市",
-    "新北市",
-    "新北市",
-    "基隆市",
-    "桃園市",
-    "新竹市",
-    "新竹市",
-    "新竹縣",
-    "苗栗縣",
-    "臺中市",
-    "台中市",
-    "彰化縣",
-    "南投縣",
-    "雲林縣",
-    "嘉義市",
-    "嘉義縣",
-    "臺南市",
-    "台南市",
-    "高雄市",
-    "高雄市",
-    "屏東縣",
-    "宜蘭縣",
-    "花蓮縣",
-    "台東縣",
-    "澎湖縣",
-    "金門縣",
-    "連江縣",
-]
-
-CITY_CANONICAL_MAP = {
-    "台北市": "臺北市",
-    "臺北市": "臺北市",
-    "新北市": "新北市",
-    "基隆市": "基隆市",
-    "桃園市": "桃園市",
-    "新竹市": "新竹市",
-    "新竹縣": "新竹縣",
-    "苗栗縣": "苗栗縣",
-    "台中市": "臺中市",
-    "臺中市": "臺中市",
-    "彰化縣": "彰化縣",
-    "南投縣": "南投縣",
-    "雲林縣": "雲林縣",
-    "嘉義市": "嘉義市",
-    "嘉義縣": "嘉義縣",
-    "台南市": "臺南市",
-    "臺南市": "臺南市",
-    "高雄市": "高雄市",
-    "屏東縣": "屏東縣",
-    "宜蘭縣": "宜蘭縣",
-    "花蓮縣": "花蓮縣",
-    "台東縣": "臺東縣",
-    "臺東縣": "臺東縣",
-    "澎湖縣": "澎湖縣",
-    "金門縣": "金門縣",
-    "連江縣": "連江縣",
-    "馬祖": "連江縣",
-}
-
 # tag keywords (kw -> tag)
 INTEREST_KEYWORDS = [
     ("觀光工廠", "creative_park"),
@@ -262,6 +249,7 @@ INTEREST_KEYWORDS = [
     ("寺", "temple"),
     ("宮", "temple"),
 ]
+_INTEREST_MATCHER = KeywordMatcher(INTEREST_KEYWORDS)
 
 PLACE_TYPE_TAGS = {
     "museum": "museum",
@@ -278,16 +266,6 @@ PLACE_TYPE_TAGS = {
     "place_of_worship": "temple",
 }
 
-try:
-    import certifi
-
-    ssl._create_default_https_context = lambda: ssl.create_default_context(  # noqa: E731
-        cafile=certifi.where()
-    )
-except Exception:
-    pass
-
-
 @dataclass
 class Place:
     id: str
@@ -307,6 +285,7 @@ class Place:
     openingHours: Dict[str, Any] | None
     source: str | None = None
     updatedAt: str | None = None
+    canonicalAddress: Dict[str, Any] | None = None
 
     def to_dict(self) -> Dict[str, Any]:
         return {
@@ -327,6 +306,7 @@ class Place:
             "openingHours": self.openingHours,
             "source": self.source,
             "updatedAt": self.updatedAt,
+            "canonicalAddress": self.canonicalAddress,
         }
 
 
@@ -339,203 +319,36 @@ def _stamp_metadata(place: Dict[str, Any], *, source: str = "google_places") ->
     place["updatedAt"] = _utc_now_iso()
 
 
-def _ssl_context() -> ssl.SSLContext:
-    try:
-        import certifi
-
-        return ssl.create_default_context(cafile=certifi.where())
-    except Exception:
-        return ssl.create_default_context()
-
-
-TW_TEXT_VARIANT_MAP = str.maketrans({
-    "臺": "台",
-    "云": "雲",
-    "县": "縣",
-    "市": "市",
-    "区": "區",
-    "镇": "鎮",
-    "乡": "鄉",
-    "村": "村",
-    "里": "里",
-    "东": "東",
-    "西": "西",
-    "南": "南",
-    "北": "北",
-    "兰": "蘭",
-    "门": "門",
-    "连": "連",
-    "江": "江",
-    "台": "台",
-    "号": "號",
-    "段": "段",
-    "路": "路",
-    "街": "街",
-    "巷": "巷",
-    "弄": "弄",
-})
-
-
-def _normalize_tw_text(value: str) -> str:
-    if not value:
-        return ""
-    text = str(value).strip().translate(TW_TEXT_VARIANT_MAP)
-    text = text.replace("邮政编码", "郵政編碼").replace("郵遞區號", "郵政編碼")
-    return text
-
-
-def _extract_city(address: str) -> str:
-    if not address:
-        return ""
-    address = _normalize_tw_text(address)
-    for hint in CITY_HINTS:
-        if hint in address:
-            return hint
-    return ""
-
-
-def _extract_city_from_components(components: list[dict]) -> str:
-    # Prefer admin_area_level_1 (city/county), then locality.
-    for level in ("administrative_area_level_1", "locality"):
-        for comp in components:
-            types = comp.get("types") or []
-            if level in types:
-                name = _normalize_tw_text(comp.get("long_name") or "")
-                return name
-    return ""
-
-
-def _normalize_city_name(value: str) -> str:
-    if not value:
-        return ""
-    normalized = _normalize_tw_text(value)
-    return CITY_CANONICAL_MAP.get(normalized, value.strip())
-
-
 def _normalize_name(value: str) -> str:
     return " ".join((value or "").strip().split()).lower()
 
 
 def _normalize_address(value: str) -> str:
-    return "".join(_normalize_tw_text(value).split()).lower()
-
-
-def _clean_display_address(value: str) -> str:
-    if not value:
-        return ""
-    text = _normalize_tw_text(value)
-    text = re.sub(r"[，,、]?\s*郵政編碼[:：]?\s*\d{3,6}", "", text)
-    text = re.sub(r"\s+", "", text)
-    text = re.sub(
-        r"^(?P<postal>\d{3,6})(?=(台北市|臺北市|新北市|基隆市|桃園市|新竹市|新竹縣|苗栗縣|台中市|臺中市|彰化縣|南投縣|雲林縣|嘉義市|嘉義縣|台南市|臺南市|高雄市|屏東縣|宜蘭縣|花蓮縣|台東縣|臺東縣|澎湖縣|金門縣|連江縣))",
-        "",
-        text,
-    )
-    return text.strip(" ,，、")
-
-
-def _address_quality_score(value: str) -> int:
-    text = _clean_display_address(value)
-    if not text:
-        return -100
-    score = len(text)
-    if _extract_city(text):
-        score += 30
-    if re.search(r"[鄉鎮市區村里]", text):
-        score += 20
-    if re.search(r"[路街道段巷弄號]", text):
-        score += 20
-    if re.fullmatch(r"\d{3,6}", text):
-        score -= 120
-    if "郵政編碼" in text:
-        score -= 80
-    return score
-
-
-def _build_address_from_components(components: list[dict], fallback: str = "") -> str:
-    cleaned_fallback = _clean_display_address(fallback)
-    if not components:
-        return cleaned_fallback
-
-    ordered_types = [
-        "administrative_area_level_1",
-        "administrative_area_level_2",
-        "administrative_area_level_3",
-        "administrative_area_level_4",
-        "locality",
-        "sublocality_level_1",
-        "sublocality_level_2",
-        "sublocality_level_3",
-        "route",
-        "street_number",
-        "premise",
-        "subpremise",
-    ]
-
-    parts: list[str] = []
-    seen: set[str] = set()
-    for type_name in ordered_types:
-        for comp in components:
-            types = comp.get("types") or []
-            if type_name not in types:
-                continue
-            name = _clean_display_address(comp.get("long_name") or "")
-            if type_name == "street_number" and name.isdigit():
-                name = f"{name}號"
-            if not name or name in seen:
-                continue
-            seen.add(name)
-            parts.append(name)
-
-    rebuilt = _clean_display_address("".join(parts))
-    if _address_quality_score(cleaned_fallback) > _address_quality_score(rebuilt):
-        return cleaned_fallback
-    return rebuilt or cleaned_fallback
-
-
-def _pick_best_address(*candidates: str) -> str:
-    best = ""
-    best_score = -10**9
-    best_len = -1
-    for candidate in candidates:
-        cleaned = _clean_display_address(candidate)
-        if not cleaned:
-            continue
-        score = _address_quality_score(cleaned)
-        if score > best_score or (score == best_score and len(cleaned) > best_len):
-            best = cleaned
-            best_score = score
-            best_len = len(cleaned)
-    return best
-
-
-def _ensure_address_with_city(address: str, city: str) -> str:
-    cleaned = _clean_display_address(address)
-    normalized_city = _normalize_city_name(city)
-    if not cleaned or not normalized_city:
-        return cleaned
-    if normalized_city in cleaned:
-        return cleaned
-    candidate = _clean_display_address(f"{normalized_city}{cleaned}")
-    if _address_quality_score(candidate) >= _address_quality_score(cleaned):
-        return candidate
-    return cleaned
+    return "".join(normalize_tw_text(value).split()).lower()
 
 
 def _place_merge_key(name: str, city: str, address: str) -> tuple[str, str]:
     normalized_name = _normalize_name(name)
-    normalized_city = _normalize_city_name(city)
+    normalized_city = normalize_city_name(city)
     if normalized_city:
         return normalized_name, normalized_city
-    extracted_city = _normalize_city_name(_extract_city(address))
+    extracted_city = normalize_city_name(extract_city(address))
     if extracted_city:
         return normalized_name, extracted_city
     normalized_address = _normalize_address(address)
     return normalized_name, normalized_address
 
 
+def _place_record_merge_key(place: Dict[str, Any]) -> tuple[str, str]:
+    return _place_merge_key(
+        str(place.get("name") or ""),
+        str(place.get("city") or ""),
+        str(place.get("address") or ""),
+    )
+
+
 def _city_variants(value: str) -> set[str]:
-    canonical = _normalize_city_name(value)
+    canonical = normalize_city_name(value)
     if not canonical:
         return set()
     variants = {
@@ -552,20 +365,17 @@ def _city_variants(value: str) -> set[str]:
 
 
 def _matches_selected_city(selected_city: str, city: str, address: str) -> bool:
-    normalized_selected = _normalize_city_name(selected_city)
+    normalized_selected = normalize_city_name(selected_city)
     if not normalized_selected:
         return True
-    if city and _normalize_city_name(city) == normalized_selected:
+    if city and normalize_city_name(city) == normalized_selected:
         return True
-    normalized_address = _normalize_tw_text(address or "")
-    return any(_normalize_tw_text(variant) in normalized_address for variant in _city_variants(normalized_selected))
+    normalized_address = normalize_tw_text(address or "")
+    return any(normalize_tw_text(variant) in normalized_address for variant in _city_variants(normalized_selected))
 
 
 def _extract_tags(text: str, types: list[str]) -> list[str]:
-    tags = set()
-    for kw, tag in INTEREST_KEYWORDS:
-        if kw in text:
-            tags.add(tag)
+    tags = _INTEREST_MATCHER.find(text)
     for t in types:
         mapped = PLACE_TYPE_TAGS.get(t)
         if mapped:
@@ -576,15 +386,14 @@ def _extract_tags(text: str, types: list[str]) -> list[str]:
 
 
 def _clean_reviews(raw_reviews: list[str]) -> list[str]:
-    seen = set()
+    deduper = ReviewDeduper()
     cleaned: list[str] = []
     for text in raw_reviews:
         text = (text or "").strip()
         if len(text) < MIN_REVIEW_LEN:
             continue
-        if text in seen:
+        if not deduper.add(text):
             continue
-        seen.add(text)
         cleaned.append(text)
         if len(cleaned) >= REVIEWS_LIMIT:
             break
@@ -593,14 +402,10 @@ def _clean_reviews(raw_reviews: list[str]) -> list[str]:
 
 def _fetch_json(url: str, params: Dict[str, Any]) -> Dict[str, Any]:
     params["key"] = API_KEY
-    qs = urllib.parse.urlencode(params, safe=",")
-    full_url = f"{url}?{qs}"
-    req = urllib.request.Request(full_url, headers={"User-Agent": "smart-travel/1.0"})
     last_err = None
     for attempt in range(3):
         try:
-            with urllib.request.urlopen(req, timeout=20, context=_ssl_context()) as resp:
-                data = json.loads(resp.read().decode("utf-8"))
+            data = get_json(url, params, timeout=20)
             break
         except Exception as err:
             last_err = err
@@ -648,32 +453,21 @@ def _load_queries() -> List[str]:
     return _unique(queries)
 
 
-def _place_details(place_id: str) -> Dict[str, Any] | None:
-    data = _fetch_json(
-        "https://maps.googleapis.com/maps/api/place/details/json",
-        {
-            "place_id": place_id,
-            "language": "zh-TW",
-            "reviews_sort": "most_relevant",
-            "fields": ",".join(
-                [
-                    "place_id",
-                    "name",
-                    "formatted_address",
-                    "geometry",
-                    "editorial_summary",
-                    "reviews",
-                    "rating",
-                    "user_ratings_total",
-                    "price_level",
-                    "types",
-                    "address_components",
-                    "photos",
-                    "opening_hours",
-                ]
-            ),
-        },
-    )
+def _place_details(
+    client: PlacesClient,
+    place_id: str,
+    *,
+    fields: Tuple[str, ...] = FULL_FIELDS,
+    ceiling: int | None = None,
+) -> Dict[str, Any] | None:
+    params = {
+        "place_id": place_id,
+        "language": "zh-TW",
+        "fields": ",".join(fields),
+    }
+    if "reviews" in fields:
+        params["reviews_sort"] = "most_relevant"
+    data = client.fetch("details", params, ceiling=ceiling)
     status = data.get("status")
     if status != "OK":
         if status not in {"ZERO_RESULTS", "NOT_FOUND"}:
@@ -688,7 +482,7 @@ def _photo_url(photo_ref: str) -> str:
     params = urllib.parse.urlencode(
         {"maxwidth": "800", "photo_reference": photo_ref, "key": API_KEY}
     )
-    return f"https://maps.googleapis.com/maps/api/place/photo?{params}"
+    return f"{PLACES_BASE_URL}/photo?{params}"
 
 
 def _price_category(price_level: int | None) -> str | None:
@@ -846,6 +640,14 @@ DAYTIME_OPEN_KEYWORDS = (
     "科學館",
 )
 
+_FREE_TICKET_MATCHER = KeywordMatcher(FREE_TICKET_KEYWORDS)
+_PAID_TICKET_MATCHER = KeywordMatcher(PAID_TICKET_KEYWORDS)
+_HIGH_PRICE_VENUE_MATCHER = KeywordMatcher(HIGH_PRICE_VENUE_KEYWORDS)
+_FREE_DEFAULT_MATCHER = KeywordMatcher(FREE_DEFAULT_KEYWORDS)
+_LOW_PRICE_MATCHER = KeywordMatcher(LOW_PRICE_KEYWORDS)
+_OPEN_ALL_DAY_MATCHER = KeywordMatcher(OPEN_ALL_DAY_KEYWORDS)
+_DAYTIME_OPEN_MATCHER = KeywordMatcher(DAYTIME_OPEN_KEYWORDS)
+
 
 def _infer_price_level(
     name: str,
@@ -879,7 +681,7 @@ def _infer_price_level(
         return None
 
     def has_explicit_free_ticket_signal() -> bool:
-        return any(keyword in haystack for keyword in FREE_TICKET_KEYWORDS)
+        return _FREE_TICKET_MATCHER.search(haystack)
 
     explicit_amount = extract_explicit_ticket_amount()
     if explicit_amount is not None:
@@ -890,27 +692,27 @@ def _infer_price_level(
     if has_explicit_free_ticket_signal():
         return 0
 
-    has_explicit_paid_signal = any(keyword in haystack for keyword in PAID_TICKET_KEYWORDS)
+    has_explicit_paid_signal = _PAID_TICKET_MATCHER.search(haystack)
     if has_explicit_paid_signal:
-        if type_set.intersection(HIGH_PRICE_TAGS) or any(
-            keyword in haystack for keyword in HIGH_PRICE_VENUE_KEYWORDS
+        if type_set.intersection(HIGH_PRICE_TAGS) or _HIGH_PRICE_VENUE_MATCHER.search(
+            haystack
         ):
             return 3
         return 1
 
-    if type_set.intersection(HIGH_PRICE_TAGS) or any(
-        keyword in haystack for keyword in HIGH_PRICE_VENUE_KEYWORDS
+    if type_set.intersection(HIGH_PRICE_TAGS) or _HIGH_PRICE_VENUE_MATCHER.search(
+        haystack
     ):
         return 3
 
     if type_set.intersection(FREE_DEFAULT_TYPES) or type_set.intersection(FREE_DEFAULT_TAGS):
         return 0
-    if any(keyword in haystack for keyword in FREE_DEFAULT_KEYWORDS):
+    if _FREE_DEFAULT_MATCHER.search(haystack):
         return 0
 
     if type_set.intersection(LOW_PRICE_TYPES) or type_set.intersection(LOW_PRICE_TAGS):
         return 1
-    if any(keyword in haystack for keyword in LOW_PRICE_KEYWORDS):
+    if _LOW_PRICE_MATCHER.search(haystack):
         return 1
 
     return None
@@ -946,7 +748,7 @@ def _infer_opening_hours(
     type_set = set(types or [])
     tag_set = set(tags or [])
 
-    if any(keyword in haystack for keyword in OPEN_ALL_DAY_KEYWORDS) or type_set.intersection(
+    if _OPEN_ALL_DAY_MATCHER.search(haystack) or type_set.intersection(
         {"park", "beach", "hiking_area"}
     ) or tag_set.intersection({"lake_river", "beach", "national_park", "waterfall"}):
         return _build_inferred_opening_hours(
@@ -962,7 +764,7 @@ def _infer_opening_hours(
             note="依夜市型景點推估，實際仍以現場公告為準",
         )
 
-    if any(keyword in haystack for keyword in DAYTIME_OPEN_KEYWORDS) or type_set.intersection(
+    if _DAYTIME_OPEN_MATCHER.search(haystack) or type_set.intersection(
         {"museum", "art_gallery", "library"}
     ) or tag_set.intersection({"museum", "creative_park", "heritage"}):
         return _build_inferred_opening_hours(
@@ -1047,26 +849,32 @@ def _merge_tags(existing: Iterable[str], fresh: Iterable[str]) -> list[str]:
     return merged
 
 
-def _needs_enrich(place: Dict[str, Any]) -> bool:
+def _enrich_gaps(place: Dict[str, Any]) -> list[str]:
+    """Missing fields that a Details call could fill (gap names from details_fields.py)."""
     if not place:
-        return True
+        return ["image", "rating", "price", "address", "city", "opening_hours", "location"]
+    gaps = []
     if not place.get("imageUrl"):
-        return True
+        gaps.append("image")
     if place.get("rating") is None or place.get("userRatingsTotal") is None:
-        return True
+        gaps.append("rating")
     if place.get("priceLevel") is None or not place.get("priceCategory"):
-        return True
-    if _address_quality_score(str(place.get("address") or "")) < 40:
-        return True
+        gaps.append("price")
+    if canonical_address(place)[1] < 40:
+        gaps.append("address")
     if not place.get("city"):
-        return True
+        gaps.append("city")
     if not place.get("openingHours"):
-        return True
+        gaps.append("opening_hours")
     lat = place.get("lat")
     lng = place.get("lng")
     if not lat or not lng:
-        return True
-    return False
+        gaps.append("location")
+    return gaps
+
+
+def _needs_enrich(place: Dict[str, Any]) -> bool:
+    return bool(_enrich_gaps(place))
 
 
 def _has_metadata(place: Dict[str, Any]) -> bool:
@@ -1075,15 +883,16 @@ def _has_metadata(place: Dict[str, Any]) -> bool:
     )
 
 
-def _find_place_id(query: str) -> str | None:
-    data = _fetch_json(
-        "https://maps.googleapis.com/maps/api/place/findplacefromtext/json",
+def _find_place_id(client: PlacesClient, query: str, *, ceiling: int | None = None) -> str | None:
+    data = client.fetch(
+        "findplacefromtext",
         {
             "input": query,
             "inputtype": "textquery",
             "language": "zh-TW",
             "fields": "place_id",
         },
+        ceiling=ceiling,
     )
     if data.get("status") != "OK":
         return None
@@ -1094,212 +903,561 @@ def _find_place_id(query: str) -> str | None:
 
 
 def _merge_places(
-    existing: List[Dict[str, Any]], fresh: List[Place]
+    store: PlaceStore, fresh: List[Place | Dict[str, Any]], changelog: ChangeLog | None = None
 ) -> Tuple[List[Dict[str, Any]], Dict[str, int]]:
+    """Merge fresh places into the store; plain dicts (e.g. a shard's db.json records) merge as-is."""
     stats = {"added": 0, "updated": 0, "unchanged": 0}
     if MERGE_MODE == "replace":
         stats["added"] = len(fresh)
-        return [p.to_dict() for p in fresh], stats
-    by_id: Dict[str, Dict[str, Any]] = {p.get("id"): p for p in existing if p.get("id")}
-    by_merge_key: Dict[tuple[str, str], Dict[str, Any]] = {}
-    for place in existing:
-        if not isinstance(place, dict):
-            continue
-        key = _place_merge_key(
-            str(place.get("name") or ""),
-            str(place.get("city") or ""),
-            str(place.get("address") or ""),
-        )
-        if key[0]:
-            by_merge_key[key] = place
+        replaced = [p.to_dict() if isinstance(p, Place) else dict(p) for p in fresh]
+        for place in replaced:
+            place["fingerprint"] = place_fingerprint(place)
+        store.replace_all(replaced)
+        return store.places, stats
     for place in fresh:
-        fresh_dict = place.to_dict()
-        target = None
-        if place.id in by_id:
-            target = by_id[place.id]
-        else:
-            key = _place_merge_key(place.name, place.city, place.address)
-            target = by_merge_key.get(key)
+        fresh_dict = place.to_dict() if isinstance(place, Place) else dict(place)
+        target = store.get_by_id(str(fresh_dict.get("id") or ""))
+        if target is None:
+            target = store.get_by_merge_key(_place_record_merge_key(fresh_dict))
 
         if target is not None:
-            before = json.dumps(target, ensure_ascii=False, sort_keys=True)
-            target.update(fresh_dict)
-            after = json.dumps(target, ensure_ascii=False, sort_keys=True)
-            if after == before:
+            changes = diff_fields(target, fresh_dict)
+            if not changes:
+                # Nothing but bookkeeping differs; leave updatedAt alone.
                 stats["unchanged"] += 1
-            else:
-                stats["updated"] += 1
+                continue
+            target.update(fresh_dict)
+            # Stamped here for the change log entry; PlaceStore.save() keeps it current.
+            target["fingerprint"] = place_fingerprint(target)
+            store.mark_dirty(target)
+            stats["updated"] += 1
+            if changelog is not None:
+                changelog.record("updated", target, changes)
         else:
-            existing.append(fresh_dict)
-            if place.id:
-                by_id[place.id] = fresh_dict
-            key = _place_merge_key(place.name, place.city, place.address)
-            if key[0]:
-                by_merge_key[key] = fresh_dict
+            fresh_dict["fingerprint"] = place_fingerprint(fresh_dict)
+            store.add(fresh_dict)
             stats["added"] += 1
-    return existing, stats
+            if changelog is not None:
+                changelog.record("added", fresh_dict, diff_fields({}, fresh_dict))
+    return store.places, stats
 
 
-def _enrich_place_from_details(place: Dict[str, Any], details: Dict[str, Any]) -> tuple[bool, Dict[str, Any] | None]:
-    if not details:
-        return False, None
+ENRICH_STAGES = ("parse", "address", "tags", "infer", "apply")
 
-    geometry = (details.get("geometry") or {}).get("location", {})
+
+@dataclass
+class DerivedPlace:
+    """Everything one Details response yields for a place, before it is written anywhere."""
+
+    place_id: str
+    name: str
+    city: str
+    address: str
+    lat: float
+    lng: float
+    types: List[str]
+    rating: Any
+    rating_total: Any
+    price_level: Any
+    price_level_value: int | None
+    price_category: str | None
+    editorial: str
+    image_url: str
+    reviews: List[str]
+    tags: List[str]
+    opening_hours: Dict[str, Any] | None
+    with_reviews: bool
+
+    def to_place(self) -> Place:
+        return Place(
+            id=self.place_id,
+            name=self.name,
+            category=self.tags[0] if self.tags else "other",
+            tags=self.tags,
+            city=self.city,
+            address=self.address,
+            lat=self.lat,
+            lng=self.lng,
+            description=self.editorial,
+            imageUrl=self.image_url,
+            rating=float(self.rating) if self.rating is not None else None,
+            userRatingsTotal=int(self.rating_total) if self.rating_total is not None else None,
+            priceLevel=self.price_level_value,
+            priceCategory=self.price_category,
+            openingHours=self.opening_hours,
+            source="google_places",
+            updatedAt=_utc_now_iso(),
+            canonicalAddress=canonical_entry(self.address),
+        )
+
+    def review_item(self) -> Dict[str, Any] | None:
+        if not self.with_reviews:
+            return None
+        return {
+            "place_id": self.place_id,
+            "source_name": self.name,
+            "name": self.name,
+            "formatted_address": self.address,
+            "rating": self.rating,
+            "user_ratings_total": self.rating_total,
+            "price_level": self.price_level,
+            "types": self.types,
+            "editorial_summary": self.editorial,
+            "reviews": self.reviews,
+            "image_url": self.image_url,
+            "opening_hours": self.opening_hours,
+        }
+
+
+def _derive_place(
+    place: Dict[str, Any],
+    details: Dict[str, Any],
+    fields: Iterable[str] = FULL_FIELDS,
+    *,
+    place_id: str = "",
+    search_item: Dict[str, Any] | None = None,
+    fallback_city: str = "",
+    timings: Dict[str, float] | None = None,
+) -> DerivedPlace:
+    """Details -> place values: parse, address, tags, infer (hours / price).
+
+    Pure function of its arguments so it can run in a worker process.
+    `search_item` (a Text Search result) fills geometry / types / rating / photos
+    that a missing or trimmed Details response lacks.
+    """
+    clock = time.perf_counter
+    started = clock()
+    requested = set(fields)
+    item = search_item or {}
+    name = str(place.get("name") or "")
+    geometry = (details.get("geometry") or item.get("geometry") or {}).get("location", {})
     lat = float(geometry.get("lat") or 0)
     lng = float(geometry.get("lng") or 0)
-    types = details.get("types") or []
-    rating = details.get("rating")
-    rating_total = details.get("user_ratings_total")
-    price_level = details.get("price_level")
-    editorial = (details.get("editorial_summary") or {}).get("overview") if details else None
-    details_address = details.get("formatted_address") or ""
-    existing_address = place.get("address") or ""
-    components = details.get("address_components") or []
-    base_address = _pick_best_address(details_address, existing_address)
-    rebuilt_address = _build_address_from_components(components, base_address)
-    city = _normalize_city_name(
-        _extract_city_from_components(components)
-        or _extract_city(base_address)
-        or _extract_city(rebuilt_address)
+    types = details.get("types") or item.get("types") or []
+    # 0 is a real rating / price level, so scalars only fall back when Details has no value.
+    rating, rating_total, price_level = (
+        details[key] if details.get(key) is not None else item.get(key)
+        for key in ("rating", "user_ratings_total", "price_level")
     )
-    full_address = _pick_best_address(base_address, rebuilt_address)
-    full_address = _ensure_address_with_city(full_address, city)
-    photos = details.get("photos") or []
+    editorial = ((details.get("editorial_summary") or {}).get("overview") if details else None) or ""
+    photos = details.get("photos") or item.get("photos") or []
     photo_ref = ""
     if isinstance(photos, list) and photos:
         photo_ref = photos[0].get("photo_reference", "") if isinstance(photos[0], dict) else ""
     image_url = _photo_url(photo_ref)
     raw_reviews = [r.get("text", "") for r in (details.get("reviews") or []) if isinstance(r, dict)]
     reviews = _clean_reviews(raw_reviews)
-    text = f"{place.get('name','')} {full_address} {editorial or ''} {' '.join(reviews)}"
-    tags = _extract_tags(text, types)
-    merged_tags = _merge_tags(_normalize_tag_list(place.get("tags")), tags)
-    opening_hours = _normalize_opening_hours(details.get("opening_hours")) or _infer_opening_hours(
-        str(place.get("name") or ""),
-        types,
-        merged_tags,
-        editorial or "",
-    )
+    parsed = clock()
+
+    components = details.get("address_components") or []
+    base_address = pick_best_address(details.get("formatted_address") or "", place.get("address") or "")
+    rebuilt_address = build_address_from_components(components, base_address)
+    city = normalize_city_name(
+        extract_city_from_components(components)
+        or extract_city(base_address)
+        or extract_city(rebuilt_address)
+    ) or fallback_city
+    full_address = pick_best_address(base_address, rebuilt_address)
+    full_address = ensure_address_with_city(full_address, city)
+    addressed = clock()
+
+    text = f"{name} {full_address} {editorial} {' '.join(reviews)}"
+    tags = _merge_tags(_normalize_tag_list(place.get("tags")), _extract_tags(text, types))
+    tagged = clock()
+
+    # Only re-derive hours / price when they were requested; otherwise inference on a trimmed
+    # payload could overwrite values that are already good.
+    opening_hours = _normalize_opening_hours(details.get("opening_hours"))
+    if opening_hours is None and "opening_hours" in requested:
+        opening_hours = _infer_opening_hours(name, types, tags, editorial)
     price_level_value = int(price_level) if price_level is not None else None
-    if price_level_value is None:
+    if price_level_value is None and "price_level" in requested:
         price_level_value = _infer_price_level(
-            str(place.get("name") or ""),
-            types,
-            city,
-            full_address,
-            editorial or "",
-            " ".join(reviews),
+            name, types, city, full_address, editorial, " ".join(reviews)
         )
-    price_category = _price_category(price_level_value)
-    changed = False
-
-    if city and _normalize_city_name(str(place.get("city") or "")) != city:
-        place["city"] = city
-        changed = True
-    existing_address = str(place.get("address") or "")
-    if full_address and _address_quality_score(full_address) > _address_quality_score(existing_address):
-        place["address"] = full_address
-        changed = True
-    if (not place.get("lat") or not place.get("lng")) and lat and lng:
-        place["lat"] = lat
-        place["lng"] = lng
-        changed = True
-    if not place.get("imageUrl") and image_url:
-        place["imageUrl"] = image_url
-        changed = True
-    if place.get("rating") is None and rating is not None:
-        place["rating"] = float(rating)
-        changed = True
-    if place.get("userRatingsTotal") is None and rating_total is not None:
-        place["userRatingsTotal"] = int(rating_total)
-        changed = True
-    if price_level_value is not None and place.get("priceLevel") != price_level_value:
-        place["priceLevel"] = price_level_value
-        changed = True
-    if price_category and place.get("priceCategory") != price_category:
-        place["priceCategory"] = price_category
-        changed = True
-    if not place.get("description") and editorial:
-        place["description"] = editorial
-        changed = True
-    if merged_tags:
-        if _normalize_tag_list(place.get("tags")) != merged_tags:
-            place["tags"] = merged_tags
+    inferred = clock()
+
+    if timings is not None:
+        timings["parse"] += parsed - started
+        timings["address"] += addressed - parsed
+        timings["tags"] += tagged - addressed
+        timings["infer"] += inferred - tagged
+    return DerivedPlace(
+        place_id=place_id or str(place.get("id") or "") or str(details.get("place_id") or ""),
+        name=name,
+        city=city,
+        address=full_address,
+        lat=lat,
+        lng=lng,
+        types=types,
+        rating=rating,
+        rating_total=rating_total,
+        price_level=price_level,
+        price_level_value=price_level_value,
+        price_category=_price_category(price_level_value),
+        editorial=editorial,
+        image_url=image_url,
+        reviews=reviews,
+        tags=tags,
+        opening_hours=opening_hours,
+        with_reviews=bool(details) and "reviews" in requested,
+    )
+
+
+def _derive_job(job: tuple) -> tuple[DerivedPlace, Dict[str, float]]:
+    # Runs in a worker process; timings travel back with the result.
+    place, details, fields, place_id = job
+    timings = dict.fromkeys(ENRICH_STAGES, 0.0)
+    return _derive_place(place, details, fields, place_id=place_id, timings=timings), timings
+
+
+class EnrichmentEngine:
+    """Details -> place pipeline shared by backfill, search, city enrichment and rederive.
+
+    Derivation (`_derive_place`) only reads its inputs, so batches can fan out to
+    a process pool; writing the result into the place (`apply`) always happens in
+    this process. Per-stage CPU time is accumulated for the end-of-run summary.
+    """
+
+    def __init__(
+        self,
+        workers: int = 1,
+        *,
+        min_jobs_per_worker: int = 1000,
+        changelog: ChangeLog | None = None,
+    ) -> None:
+        self.workers = max(1, workers)
+        self.min_jobs_per_worker = max(1, min_jobs_per_worker)
+        self.changelog = changelog
+        self.timings = dict.fromkeys(ENRICH_STAGES, 0.0)
+        self.count = 0
+        self.pooled = 0
+        self._pool: ProcessPoolExecutor | None = None
+
+    def derive(
+        self,
+        place: Dict[str, Any],
+        details: Dict[str, Any],
+        fields: Iterable[str] = FULL_FIELDS,
+        **kwargs: Any,
+    ) -> DerivedPlace:
+        self.count += 1
+        return _derive_place(place, details, fields, timings=self.timings, **kwargs)
+
+    def derive_batch(self, jobs: List[tuple]) -> List[DerivedPlace]:
+        """Derive (place, details, fields, place_id) jobs, in a process pool when the batch is big enough."""
+        # Process start-up and pickling only pay off for large batches.
+        workers = min(self.workers, len(jobs) // self.min_jobs_per_worker or 1)
+        if workers <= 1:
+            return [
+                self.derive(place, details, fields, place_id=place_id)
+                for place, details, fields, place_id in jobs
+            ]
+        if self._pool is None:
+            self._pool = ProcessPoolExecutor(max_workers=self.workers)
+        results = list(
+            self._pool.map(_derive_job, jobs, chunksize=max(1, len(jobs) // (workers * 8)))
+        )
+        derived = []
+        for item, timings in results:
+            derived.append(item)
+            for stage, seconds in timings.items():
+                self.timings[stage] += seconds
+        self.count += len(jobs)
+        self.pooled += len(jobs)
+        return derived
+
+    def apply(self, place: Dict[str, Any], derived: DerivedPlace) -> tuple[bool, bool]:
+        """Fill what `place` is missing from `derived`; returns (changed, needs_save)."""
+        started = time.perf_counter()
+        before = dict(place)
+        changed = False
+        city = derived.city
+        if city and normalize_city_name(str(place.get("city") or "")) != city:
+            place["city"] = city
             changed = True
-        if not place.get("category") and merged_tags[0]:
-            place["category"] = merged_tags[0]
+        existing_address = str(place.get("address") or "")
+        existing_text, existing_score = canonical_address(place)
+        new_score = address_quality_score(derived.address)
+        if derived.address and (
+            new_score > existing_score
+            # Same address, but the stored string is not in canonical form yet.
+            or (new_score == existing_score and derived.address == existing_text != existing_address)
+        ):
+            place["address"] = derived.address
             changed = True
-    if opening_hours and (
-        not place.get("openingHours") or
-        len(str(place.get("openingHours"))) < len(str(opening_hours))
-    ):
-        place["openingHours"] = opening_hours
-        changed = True
-    if changed or not _has_metadata(place):
-        _stamp_metadata(place)
-
-    review_item = {
-        "place_id": place.get("id") or details.get("place_id"),
-        "source_name": place.get("name"),
-        "name": place.get("name"),
-        "formatted_address": full_address,
-        "rating": rating,
-        "user_ratings_total": rating_total,
-        "price_level": price_level,
-        "types": types,
-        "editorial_summary": editorial or "",
-        "reviews": reviews,
-        "image_url": image_url,
-        "opening_hours": opening_hours,
-    }
-    return changed, review_item
+        if (not place.get("lat") or not place.get("lng")) and derived.lat and derived.lng:
+            place["lat"] = derived.lat
+            place["lng"] = derived.lng
+            changed = True
+        if not place.get("imageUrl") and derived.image_url:
+            place["imageUrl"] = derived.image_url
+            changed = True
+        if place.get("rating") is None and derived.rating is not None:
+            place["rating"] = float(derived.rating)
+            changed = True
+        if place.get("userRatingsTotal") is None and derived.rating_total is not None:
+            place["userRatingsTotal"] = int(derived.rating_total)
+            changed = True
+        if derived.price_level_value is not None and place.get("priceLevel") != derived.price_level_value:
+            place["priceLevel"] = derived.price_level_value
+            changed = True
+        if derived.price_category and place.get("priceCategory") != derived.price_category:
+            place["priceCategory"] = derived.price_category
+            changed = True
+        if not place.get("description") and derived.editorial:
+            place["description"] = derived.editorial
+            changed = True
+        if derived.tags:
+            if _normalize_tag_list(place.get("tags")) != derived.tags:
+                place["tags"] = derived.tags
+                changed = True
+            if not place.get("category") and derived.tags[0]:
+                place["category"] = derived.tags[0]
+                changed = True
+        opening_hours = derived.opening_hours
+        if opening_hours and (
+            not place.get("openingHours") or
+            len(str(place.get("openingHours"))) < len(str(opening_hours))
+        ):
+            place["openingHours"] = opening_hours
+            changed = True
+        needs_save = changed or not _has_metadata(place)
+        if needs_save:
+            _stamp_metadata(place)
+        if changed:
+            place["fingerprint"] = place_fingerprint(place)
+            if self.changelog is not None:
+                self.changelog.record("enriched", place, diff_fields(before, place))
+        if stamp_canonical_address(place):
+            needs_save = True
+        self.timings["apply"] += time.perf_counter() - started
+        return changed, needs_save
+
+    def enrich_batch(
+        self, jobs: List[tuple]
+    ) -> List[tuple[bool, bool, Dict[str, Any] | None]]:
+        """Derive and apply (place, details, fields, place_id) jobs in order.
+
+        Returns (changed, needs_save, review_item) per job; empty Details leave the place untouched.
+        """
+        results: List[tuple[bool, bool, Dict[str, Any] | None]] = [(False, False, None)] * len(jobs)
+        live = [idx for idx, job in enumerate(jobs) if job[1]]
+        derived_list = self.derive_batch([jobs[idx] for idx in live])
+        for idx, derived in zip(live, derived_list):
+            changed, needs_save = self.apply(jobs[idx][0], derived)
+            results[idx] = (changed, needs_save, derived.review_item())
+        return results
+
+    def summary(self) -> str:
+        total = sum(self.timings.values())
+        stages = "、".join(f"{stage} {self.timings[stage] * 1000:.0f}ms" for stage in ENRICH_STAGES)
+        pooled = f"，其中 {self.pooled} 筆由 {self.workers} 個行程處理" if self.pooled else ""
+        return f"Details 處理 {self.count} 筆，耗時 {total:.2f}s（{stages}）{pooled}"
+
+    def close(self) -> None:
+        if self._pool is not None:
+            self._pool.shutdown()
+            self._pool = None
+
+
+def _rederive_from_archive(
+    store: PlaceStore, places: List[Dict[str, Any]], changelog: ChangeLog | None = None
+) -> tuple[int, List[Dict[str, Any]]]:
+    """Replay archived Details through the enrichment engine for `places`."""
+    started = time.perf_counter()
+    latest = load_latest(ARCHIVE_PATH)
+    jobs: List[tuple] = []
+    for place in places:
+        if not isinstance(place, dict):
+            continue
+        record = latest.get((place.get("id") or "").strip())
+        if record is None:
+            continue
+        jobs.append((place, record.get("result") or {}, FULL_FIELDS, ""))
+    loaded = time.perf_counter()
+    print(
+        f"rederive: 封存 {ARCHIVE_PATH}，可重算 {len(jobs)}/{len(places)} 筆，"
+        f"讀取 {loaded - started:.2f}s"
+    )
+
+    engine = EnrichmentEngine(REDERIVE_WORKERS, changelog=changelog)
+    try:
+        results = engine.enrich_batch(jobs)
+    finally:
+        engine.close()
+
+    changed_count = 0
+    reviews_out: List[Dict[str, Any]] = []
+    for (place, *_), (changed, needs_save, review_item) in zip(jobs, results):
+        if needs_save:
+            store.mark_dirty(place)
+        if changed:
+            changed_count += 1
+        if review_item:
+            reviews_out.append(review_item)
+    print(f"rederive: 更新 {changed_count} 筆，重算 {time.perf_counter() - loaded:.2f}s")
+    print(engine.summary())
+    print(address_cache_summary())
+    return changed_count, reviews_out
+
+
+def _append_review_items(path: Path, items: List[Dict[str, Any]], deduper: ReviewDeduper) -> int:
+    """Store fresh review items, dropping reviews that already appear elsewhere in the corpus.
+
+    `deduper` is seeded once per run with the stored corpus and then sees every
+    appended item, so a flush only pays for the items it writes. A fresh item
+    replaces the stored one with the same place_id / source_name, whose reviews
+    then stop counting as earlier copies, so a re-fetched place keeps its own reviews.
+    """
+    if not items:
+        return 0
+    # Templated / copy-pasted reviews repeat across places; keep only the first copy corpus-wide.
+    dedupe_review_items(items, deduper)
+    append_review_items(path, items)
+    return len(items)
 
 
-def main() -> None:
-    if not API_KEY:
+def _review_item_keys(item: Dict[str, Any]) -> tuple[str, str]:
+    return (
+        (item.get("place_id") or "").strip(),
+        (item.get("source_name") or item.get("name") or "").strip(),
+    )
+
+
+def main(
+    argv: List[str] | None = None,
+    *,
+    shared_budget: RequestBudget | None = None,
+    shared_limiter: TokenBucket | None = None,
+) -> None:
+    """Run one crawl; crawl_shards.py passes a budget and limiter shared by all its processes."""
+    parser = argparse.ArgumentParser(description="從 Google Places 抓取景點並合併到 db.json")
+    parser.add_argument("--resume", action="store_true", help="從上次中斷的檢查點接續抓取")
+    args = parser.parse_args(argv)
+
+    cache = ResponseCache()
+    rederive_mode = CRAWL_PROFILE == "rederive"
+    if not API_KEY and not cache.offline and not rederive_mode:
         sys.exit("請先在環境變數設定 GOOGLE_MAPS_API_KEY")
     if not DB_PATH.exists():
         sys.exit(f"找不到 {DB_PATH}")
 
-    db = json.loads(DB_PATH.read_text(encoding="utf-8"))
-    existing_places = db.get("places") or []
-    existing_by_id = {p.get("id"): p for p in existing_places if isinstance(p, dict) and p.get("id")}
-    existing_by_merge_key = {}
-    for place in existing_places:
-        if not isinstance(place, dict):
-            continue
-        key = _place_merge_key(
-            str(place.get("name") or ""),
-            str(place.get("city") or ""),
-            str(place.get("address") or ""),
-        )
-        if key[0]:
-            existing_by_merge_key[key] = place
-    if REVIEWS_PATH.exists():
-        reviews_db = json.loads(REVIEWS_PATH.read_text(encoding="utf-8"))
-        if not isinstance(reviews_db, list):
-            reviews_db = []
-    else:
-        reviews_db = []
-    reviews_by_name = {
-        (item.get("source_name") or item.get("name") or "").strip(): item
-        for item in reviews_db
-        if isinstance(item, dict)
-    }
-    reviews_by_id = {
-        (item.get("place_id") or "").strip(): item
-        for item in reviews_db
-        if isinstance(item, dict) and item.get("place_id")
+    selected_city = (os.environ.get("GOOGLE_PLACE_CITY") or "").strip()
+    store = open_place_store(
+        DB_PATH,
+        merge_key=_place_record_merge_key,
+        city=normalize_city_name(selected_city),
+    )
+    existing_places = store.places
+    # Places that already have review text; Details for them can skip the reviews field.
+    reviewed_keys: set[str] = set()
+    review_deduper = ReviewDeduper()
+    for item in iter_review_items(REVIEWS_PATH):
+        review_deduper.seed(item)
+        if item.get("reviews"):
+            reviewed_keys.update(key for key in _review_item_keys(item) if key)
+
+    if rederive_mode:
+        targets = store.in_city(normalize_city_name(selected_city)) if selected_city else existing_places
+        changelog = ChangeLog()
+        changed_count, reviews_out = _rederive_from_archive(store, targets, changelog)
+        store.save()
+        changelog.flush()
+        _append_review_items(REVIEWS_PATH, reviews_out, review_deduper)
+        print(f"完成，寫入 {store.path}，重算 {len(reviews_out)} 筆，更新 {changed_count} 筆")
+        print(changelog.summary())
+        return
+
+    tiles_mode = CRAWL_PROFILE == "tiles"
+    tile_counties = (
+        [city for city in TAIWAN_CITIES if city == normalize_city_name(selected_city)]
+        if selected_city
+        else [city for city in TAIWAN_CITIES if city in COUNTY_BOUNDS]
+    )
+    if tiles_mode and not tile_counties:
+        sys.exit(f"tiles 模式找不到縣市範圍：{selected_city}")
+    queries = [] if tiles_mode else _load_queries()
+    checkpoint_config: Dict[str, Any] = {
+        "profile": CRAWL_PROFILE,
+        "scope": QUERY_SCOPE,
+        "city": selected_city,
+        "mergeMode": MERGE_MODE,
+        "queries": queries,
     }
+    if tiles_mode:
+        checkpoint_config["tiles"] = tile_plan(tile_counties)
+    checkpoint = CrawlCheckpoint(checkpoint_config)
+    resume_state: Dict[str, Any] = {}
+    if args.resume:
+        try:
+            resume_state = checkpoint.load() or {}
+        except CheckpointMismatch as err:
+            sys.exit(f"無法接續：{err}")
+        if resume_state:
+            print(f"從檢查點接續: {checkpoint.path}，已用請求 {resume_state.get('requestCount', 0)}")
+        else:
+            print(f"找不到檢查點 {checkpoint.path}，從頭開始抓取")
+    elif checkpoint.exists():
+        print(f"發現舊檢查點 {checkpoint.path}，本次從頭開始並覆寫（接續請加 --resume）")
 
-    queries = _load_queries()
     output: List[Place] = []
     reviews_out: List[Dict[str, Any]] = []
-    seen = set()
-    request_count = 0
-    skipped_complete = 0
-    skipped_outside_city = 0
-    selected_city = (os.environ.get("GOOGLE_PLACE_CITY") or "").strip()
+    seen = set(resume_state.get("seen") or [])
+    budget = shared_budget or RequestBudget(MAX_REQUESTS, used=int(resume_state.get("requestCount") or 0))
+    mask_stats = FieldMaskStats()
+
+    def _fetch_tracked(url: str, params: Dict[str, Any]) -> Dict[str, Any]:
+        # Only real HTTP calls reach the fetcher (cache hits do not), so this measures the wire.
+        started = time.perf_counter()
+        data = _fetch_json(url, params)
+        if "fields" in params and url.endswith("/details/json"):
+            size = len(json.dumps(data, ensure_ascii=False).encode("utf-8"))
+            mask_stats.record(tuple(params["fields"].split(",")), time.perf_counter() - started, size)
+        return data
+
+    ledger = QuotaLedger.open("fetch_places_from_google")
+    client = PlacesClient(_fetch_tracked, budget, cache=cache, limiter=shared_limiter, ledger=ledger)
+    archive = DetailsArchive()
+    changelog = ChangeLog()
+    engine = EnrichmentEngine(
+        ENRICH_WORKERS,
+        min_jobs_per_worker=max(1, ENRICH_BATCH_SIZE // ENRICH_WORKERS),
+        changelog=changelog,
+    )
+    # Details results waiting for a batched enrich (only batched when ENRICH_WORKERS > 1).
+    details_batch: List[tuple[Dict[str, Any], str, Dict[str, Any], Tuple[str, ...]]] = []
+    batch_size = ENRICH_BATCH_SIZE if ENRICH_WORKERS > 1 else 1
+    skipped_complete = int(resume_state.get("skippedComplete") or 0)
+    skipped_outside_city = int(resume_state.get("skippedOutsideCity") or 0)
+    merge_stats = {"added": 0, "updated": 0, "unchanged": 0, **(resume_state.get("mergeStats") or {})}
+    backfill_done = bool(resume_state.get("backfillDone"))
+    backfill_processed: set[str] = set(resume_state.get("backfillProcessed") or [])
+    city_processed: set[str] = set(resume_state.get("cityProcessed") or [])
+    search_resume: Dict[str, Any] = resume_state.get("search") or {}
+    # Search-phase progress; kept at this level so checkpoints can serialize it.
+    # Page tokens expire within minutes, so a query interrupted mid-paging restarts from its
+    # first page; the results it already produced are in `seen` and get no second Details call.
+    query_state: Dict[int, Dict[str, Any]] = {
+        int(idx): {"page": 0, "token": None, "done": False} if value.get("token") else value
+        for idx, value in (search_resume.get("queries") or {}).items()
+    }
+    staged: Dict[tuple[int, int, int], tuple[Place, Dict[str, Any] | None]] = {
+        (key[0], key[1], key[2]): (Place(**place), review_item)
+        for key, place, review_item in search_resume.get("staged") or []
+    }
+    inflight: Dict[tuple[int, int, int], Dict[str, Any]] = {
+        (key[0], key[1], key[2]): item for key, item in search_resume.get("inflight") or []
+    }
+    flushed_queries = int(search_resume.get("flushed") or 0)
+    search_stats = {"requests": 0, "new": 0, **(search_resume.get("stats") or {})}
+    # In tiles mode the search "queries" are map tiles, numbered in TileSet order.
+    tile_set = (
+        (TileSet.from_state(search_resume["tiles"]) if search_resume.get("tiles") else TileSet.for_counties(tile_counties))
+        if tiles_mode
+        else TileSet()
+    )
+    spatial_dedupe = SpatialDedupe.from_state(search_resume.get("dedupe") or [])
     single_city_mode = bool(selected_city)
     fast_bulk_mode = CRAWL_PROFILE == "fast_bulk"
     backfill_only_mode = CRAWL_PROFILE == "backfill"
@@ -1309,10 +1467,16 @@ def main() -> None:
 
     print(
         f"抓取設定: profile={CRAWL_PROFILE}, scope={QUERY_SCOPE}, "
-        f"max_requests={MAX_REQUESTS}, textsearch_pages={TEXTSEARCH_MAX_PAGES}"
+        f"max_requests={MAX_REQUESTS}, textsearch_pages={TEXTSEARCH_MAX_PAGES}, "
+        f"concurrency={client.concurrency}, qps={client.limiter.rate:g}"
     )
     if queries:
         print(f"本次查詢目標: {', '.join(queries)}")
+    if tiles_mode:
+        print(
+            f"網格模式啟用：{'、'.join(tile_counties)}，共 {len(tile_set)} 格"
+            f"（Nearby Search，每頁 {NEARBY_PAGE_SIZE} 筆滿頁即細分）"
+        )
     if single_city_mode:
         print(f"單縣市模式啟用: {selected_city}（優先抓取該縣市，暫跳過全庫補資料）")
     if fast_bulk_mode:
@@ -1331,377 +1495,476 @@ def main() -> None:
             parts.append(address)
         return " ".join([p for p in parts if p]).strip()
 
-    if enrich_existing_global or backfill_only_mode:
-        # Enrich existing places missing image/rating/price/city/address.
-        # Reserve some quota for search queries so crawl doesn't end before query loop starts.
-        reserve_for_search = 0 if backfill_only_mode else min(MAX_REQUESTS, max(20, len(queries) * 8))
-        for place in existing_places:
-            if request_count >= max(0, MAX_REQUESTS - reserve_for_search):
-                break
-            if not _needs_enrich(place):
-                continue
-            query = _build_query_from_place(place)
-            if not query:
-                continue
-            place_id = _find_place_id(query)
-            request_count += 1
+    def _lookup_details(
+        place: Dict[str, Any],
+        *,
+        use_existing_id: bool = False,
+        ceiling: int | None = None,
+    ) -> tuple[str, Dict[str, Any], Tuple[str, ...]]:
+        # Runs on a client worker: FindPlace (unless the stored id is reused) then Details.
+        fields = _details_fields_for(place)
+        place_id = (place.get("id") or "").strip() if use_existing_id else ""
+        if not place_id:
+            place_id = _find_place_id(client, _build_query_from_place(place), ceiling=ceiling) or ""
             if not place_id:
-                continue
-            details = _place_details(place_id) or {}
-            if details:
-                request_count += 1
-            geometry = (details.get("geometry") or {}).get("location", {})
-            lat = float(geometry.get("lat") or 0)
-            lng = float(geometry.get("lng") or 0)
-            types = details.get("types") or []
-            rating = details.get("rating")
-            rating_total = details.get("user_ratings_total")
-            price_level = details.get("price_level")
-            editorial = (details.get("editorial_summary") or {}).get("overview") if details else None
-            details_address = details.get("formatted_address") or ""
-            existing_address = place.get("address") or ""
-            components = details.get("address_components") or []
-            base_address = _pick_best_address(details_address, existing_address)
-            rebuilt_address = _build_address_from_components(components, base_address)
-            city = _normalize_city_name(
-                _extract_city_from_components(components)
-                or _extract_city(base_address)
-                or _extract_city(rebuilt_address)
+                return "", {}, fields
+        details = _archived_details(
+            place_id, ref=str(place.get("id") or ""), fields=fields, ceiling=ceiling
+        )
+        return place_id, details, fields
+
+    def _details_fields_for(place: Dict[str, Any]) -> Tuple[str, ...]:
+        if not DETAILS_FIELD_TIERING:
+            return FULL_FIELDS
+        gaps = _enrich_gaps(place)
+        name = (place.get("name") or "").strip()
+        if (place.get("id") or "").strip() not in reviewed_keys and name not in reviewed_keys:
+            gaps.append("reviews")
+        return plan_fields(gaps)
+
+    def _archived_details(
+        place_id: str,
+        *,
+        ref: str = "",
+        fields: Tuple[str, ...] = FULL_FIELDS,
+        ceiling: int | None = None,
+    ) -> Dict[str, Any]:
+        details = _place_details(client, place_id, fields=fields, ceiling=ceiling) or {}
+        archive.append(place_id, details, ref=ref)
+        return details
+
+    def _progress_key(place: Dict[str, Any]) -> str:
+        return (place.get("id") or "").strip() or _build_query_from_place(place)
+
+    def _flush() -> None:
+        # Persist everything merged so far, so an interrupted crawl keeps its paid results.
+        store.save()
+        changelog.flush()
+        _append_review_items(REVIEWS_PATH, reviews_out, review_deduper)
+        reviews_out.clear()
+
+    def _save_checkpoint() -> None:
+        _flush()
+        checkpoint.save(
+            {
+                "requestCount": budget.used,
+                "skippedComplete": skipped_complete,
+                "skippedOutsideCity": skipped_outside_city,
+                "mergeStats": merge_stats,
+                "backfillDone": backfill_done,
+                "backfillProcessed": sorted(backfill_processed),
+                "cityProcessed": sorted(city_processed),
+                "seen": sorted(seen),
+                "search": {
+                    "queries": {str(idx): value for idx, value in query_state.items()},
+                    "staged": [
+                        [list(key), place.to_dict(), review_item]
+                        for key, (place, review_item) in sorted(staged.items())
+                    ],
+                    "inflight": [[list(key), item] for key, item in sorted(inflight.items())],
+                    "flushed": flushed_queries,
+                    "stats": search_stats,
+                    **(
+                        {"tiles": tile_set.to_state(), "dedupe": spatial_dedupe.to_state()}
+                        if tiles_mode
+                        else {}
+                    ),
+                },
+            }
+        )
+
+    def _enrich_details_batch(processed: set[str], *, adopt_id: bool = False) -> int:
+        # Places are marked processed only once their Details are applied, so a checkpoint
+        # written mid-batch never skips them on --resume.
+        jobs = []
+        for place, place_id, details, fields in details_batch:
+            if adopt_id and (place.get("id") or "").strip() != place_id:
+                place["id"] = place_id
+                store.mark_dirty(place)
+            jobs.append((place, details, fields, place_id))
+        changed_count = 0
+        for job, (changed, needs_save, review_item) in zip(jobs, engine.enrich_batch(jobs)):
+            place = job[0]
+            if needs_save:
+                store.mark_dirty(place)
+            changed_count += int(changed)
+            if review_item:
+                reviews_out.append(review_item)
+            processed.add(_progress_key(place))
+        details_batch.clear()
+        return changed_count
+
+    # Split the remaining quota across phases by estimated demand (see crawl_scheduler.py).
+    max_pages = max(1, TEXTSEARCH_MAX_PAGES)
+    itinerary_counts = load_itinerary_place_counts()
+    run_backfill = (enrich_existing_global or backfill_only_mode) and not backfill_done
+    run_city_enrich = single_city_mode and not fast_bulk_mode
+    backfill_candidates = [
+        place
+        for place in existing_places
+        if run_backfill
+        and isinstance(place, dict)
+        and _needs_enrich(place)
+        and _build_query_from_place(place)
+        and _progress_key(place) not in backfill_processed
+    ]
+    city_estimate = [
+        place
+        for place in existing_places
+        if run_city_enrich
+        and isinstance(place, dict)
+        and _matches_selected_city(selected_city, str(place.get("city") or ""), str(place.get("address") or ""))
+        and _needs_enrich(place)
+        and _progress_key(place) not in city_processed
+    ]
+    search_units = tile_set.next_seq if tiles_mode else len(queries)
+    open_queries = (
+        sum(1 for idx in range(search_units) if not query_state.get(idx, {}).get("done"))
+        if run_search_queries
+        else 0
+    )
+    per_page = 1 + (20 if fetch_search_details else 0)
+    demands = {
+        "backfill": len(backfill_candidates) * 2,
+        "search": open_queries * max_pages * per_page,
+        "city": sum(1 if (place.get("id") or "").strip() else 2 for place in city_estimate),
+    }
+    allocation = allocate_budget(budget.remaining(), demands, floors={"search": open_queries})
+    backfill_ceiling = budget.used + allocation["backfill"]
+    # Search may also use whatever backfill leaves unspent; the city phase keeps its share.
+    search_ceiling = MAX_REQUESTS - allocation["city"]
+    print(
+        "配額分配: "
+        + ", ".join(f"{name}={allocation[name]}/{demands[name]}" for name in demands)
+        + f"（剩餘 {budget.remaining()}，行程熱門景點 {len(itinerary_counts)} 個）"
+    )
+
+    try:
+        if run_backfill:
+            # Enrich existing places missing image/rating/price/city/address, most valuable first.
+            queue = EnrichmentQueue(
+                backfill_candidates,
+                gap_count=lambda place: len(_enrich_gaps(place)),
+                itinerary_counts=itinerary_counts,
             )
-            full_address = _pick_best_address(base_address, rebuilt_address)
-            full_address = _ensure_address_with_city(full_address, city)
-            photos = details.get("photos") or []
-            photo_ref = ""
-            if isinstance(photos, list) and photos:
-                photo_ref = photos[0].get("photo_reference", "") if isinstance(photos[0], dict) else ""
-            image_url = _photo_url(photo_ref)
-            opening_hours = _normalize_opening_hours(details.get("opening_hours"))
-            raw_reviews = [r.get("text", "") for r in (details.get("reviews") or []) if isinstance(r, dict)]
-            reviews = _clean_reviews(raw_reviews)
-            text = f"{place.get('name','')} {full_address} {editorial or ''} {' '.join(reviews)}"
-            tags = _extract_tags(text, types)
-            merged_tags = _merge_tags(_normalize_tag_list(place.get("tags")), tags)
-            opening_hours = opening_hours or _infer_opening_hours(
-                str(place.get("name") or ""),
-                types,
-                merged_tags,
-                editorial or "",
+            print(
+                f"補資料候選 {len(queue)} 筆（其中 {queue.in_itineraries} 筆出現在歷史行程），"
+                f"最高優先分數 {queue.top_score():.1f}"
             )
-            price_level_value = int(price_level) if price_level is not None else None
-            if price_level_value is None:
-                price_level_value = _infer_price_level(
-                    str(place.get("name") or ""),
-                    types,
-                    city,
-                    full_address,
-                    editorial or "",
-                    " ".join(reviews),
-                )
-            price_category = _price_category(price_level_value)
-            changed = False
-
-            # Fill only missing fields
-            if city and _normalize_city_name(str(place.get("city") or "")) != city:
-                place["city"] = city
-                changed = True
-            existing_address = str(place.get("address") or "")
-            if full_address and _address_quality_score(full_address) > _address_quality_score(existing_address):
-                place["address"] = full_address
-                changed = True
-            if (not place.get("lat") or not place.get("lng")) and lat and lng:
-                place["lat"] = lat
-                place["lng"] = lng
-                changed = True
-            if not place.get("imageUrl") and image_url:
-                place["imageUrl"] = image_url
-                changed = True
-            if place.get("rating") is None and rating is not None:
-                place["rating"] = float(rating)
-                changed = True
-            if place.get("userRatingsTotal") is None and rating_total is not None:
-                place["userRatingsTotal"] = int(rating_total)
-                changed = True
-            if price_level_value is not None and place.get("priceLevel") != price_level_value:
-                place["priceLevel"] = price_level_value
-                changed = True
-            if price_category and place.get("priceCategory") != price_category:
-                place["priceCategory"] = price_category
-                changed = True
-            if not place.get("description") and editorial:
-                place["description"] = editorial
-                changed = True
-            if merged_tags:
-                if _normalize_tag_list(place.get("tags")) != merged_tags:
-                    place["tags"] = merged_tags
-                    changed = True
-                if not place.get("category") and merged_tags[0]:
-                    place["category"] = merged_tags[0]
-                    changed = True
-            if opening_hours and (
-                not place.get("openingHours") or
-                len(str(place.get("openingHours"))) < len(str(opening_hours))
+            for place, future in client.map_ordered(
+                lambda item: _lookup_details(item, ceiling=backfill_ceiling),
+                queue,
+                ceiling=backfill_ceiling,
             ):
-                place["openingHours"] = opening_hours
-                changed = True
-            if changed or not _has_metadata(place):
-                _stamp_metadata(place)
-
-            if details:
-                review_item = {
-                    "place_id": place_id,
-                    "source_name": place.get("name"),
-                    "name": place.get("name"),
-                    "formatted_address": full_address,
-                    "rating": rating,
-                    "user_ratings_total": rating_total,
-                    "price_level": price_level,
-                    "types": types,
-                    "editorial_summary": editorial or "",
-                    "reviews": reviews,
-                    "image_url": image_url,
-                    "opening_hours": opening_hours,
-                }
-                reviews_out.append(review_item)
-                if place_id:
-                    reviews_by_id[place_id] = review_item
-
-    if run_search_queries:
-        for query_idx, query in enumerate(queries):
-            if request_count >= MAX_REQUESTS:
-                break
-            page_no = 0
-            page_token: str | None = None
-            while request_count < MAX_REQUESTS and page_no < max(1, TEXTSEARCH_MAX_PAGES):
-                params: Dict[str, Any]
-                token_attempts = 1
+                if checkpoint.due():
+                    _enrich_details_batch(backfill_processed)
+                    _save_checkpoint()
+                try:
+                    place_id, details, fields = future.result()
+                except BudgetExhausted:
+                    continue
+                if not place_id:
+                    backfill_processed.add(_progress_key(place))
+                    continue
+                details_batch.append((place, place_id, details, fields))
+                if len(details_batch) >= batch_size:
+                    _enrich_details_batch(backfill_processed)
+            _enrich_details_batch(backfill_processed)
+            backfill_done = True
+
+        def _search_item_address(item: Dict[str, Any]) -> str:
+            # Nearby Search results carry a short `vicinity` instead of formatted_address.
+            return item.get("formatted_address") or item.get("vicinity") or ""
+
+        def _place_from_search_item(
+            item: Dict[str, Any], details: Dict[str, Any]
+        ) -> tuple[Place, Dict[str, Any] | None] | None:
+            nonlocal skipped_outside_city
+            derived = engine.derive(
+                {"name": item.get("name") or "", "address": _search_item_address(item)},
+                details,
+                place_id=item.get("place_id") or "",
+                search_item=item,
+                fallback_city=normalize_city_name(selected_city) if single_city_mode else "",
+            )
+            if single_city_mode and not _matches_selected_city(selected_city, derived.city, derived.address):
+                skipped_outside_city += 1
+                return None
+            return derived.to_place(), derived.review_item()
+
+        if run_search_queries:
+            # Every query's pages and every result's Details call run concurrently; results are
+            # staged by (query, page, result) position so the merged output order stays stable.
+            # Each query's next unfetched page lives in query_state; a query is flushed into the
+            # store once its pages are done and none of its requests are outstanding.
+            # In tiles mode a "query" is a tile of tile_set and each page is a Nearby Search;
+            # a tile whose first page is full is split, its children appended as new queries.
+            pending: Dict[Future, tuple] = {}
+            outstanding: Dict[int, int] = {}
+
+            def _track(query_idx: int, delta: int) -> None:
+                outstanding[query_idx] = outstanding.get(query_idx, 0) + delta
+
+            def _flush_completed_queries() -> None:
+                nonlocal flushed_queries
+                if MERGE_MODE == "replace":
+                    return  # replace mode rewrites the whole list once at the end
+                while (
+                    flushed_queries < search_units
+                    and query_state.get(flushed_queries, {}).get("done")
+                    and not outstanding.get(flushed_queries)
+                ):
+                    fresh: List[Place] = []
+                    for key in sorted(k for k in staged if k[0] == flushed_queries):
+                        place, review_item = staged.pop(key)
+                        fresh.append(place)
+                        if review_item:
+                            reviews_out.append(review_item)
+                    _, stats = _merge_places(store, fresh, changelog)
+                    for name, count in stats.items():
+                        merge_stats[name] += count
+                    flushed_queries += 1
+
+            def _submit_details(key: tuple[int, int, int], item: Dict[str, Any]) -> None:
+                if fetch_search_details and budget.remaining(search_ceiling) > 0:
+                    details_future = client.run(
+                        lambda place_id: _archived_details(place_id, ceiling=search_ceiling),
+                        item.get("place_id"),
+                    )
+                    pending[details_future] = ("details", key, item)
+                    inflight[key] = item
+                    _track(key[0], 1)
+                else:
+                    _stage(key, item, {})
+
+            def _submit_page(query_idx: int, page_no: int, page_token: str | None, attempt: int = 0) -> bool:
                 if page_token:
                     params = {"pagetoken": page_token, "language": "zh-TW"}
-                    token_attempts = 4
+                    # next_page_token requires a short propagation delay.
+                    delay = 2.0 if attempt == 0 else 1.2
                 else:
-                    params = {"query": query, "language": "zh-TW"}
-
-                data: Dict[str, Any] = {}
-                status = "UNKNOWN"
-                for attempt in range(token_attempts):
-                    if page_token:
-                        # next_page_token requires a short propagation delay.
-                        time.sleep(2.0 if attempt == 0 else 1.2)
-                    data = _fetch_json(
-                        "https://maps.googleapis.com/maps/api/place/textsearch/json",
-                        params,
+                    params = (
+                        tile_set[query_idx].nearby_params()
+                        if tiles_mode
+                        else {"query": queries[query_idx], "language": "zh-TW"}
                     )
-                    request_count += 1
-                    status = data.get("status") or "UNKNOWN"
-                    if status == "INVALID_REQUEST" and page_token and attempt < token_attempts - 1:
-                        continue
+                    delay = 0.0
+                endpoint = "nearbysearch" if tiles_mode else "textsearch"
+                try:
+                    future = client.submit(endpoint, params, delay=delay, ceiling=search_ceiling)
+                except BudgetExhausted:
+                    return False
+                pending[future] = ("search", query_idx, page_no, page_token, attempt)
+                _track(query_idx, 1)
+                return True
+
+            def _stage(key: tuple[int, int, int], item: Dict[str, Any], details: Dict[str, Any]) -> None:
+                built = _place_from_search_item(item, details)
+                if built is not None:
+                    staged[key] = built
+
+            def _query_label(query_idx: int) -> str:
+                return tile_set[query_idx].label if tiles_mode else queries[query_idx]
+
+            for key, item in sorted(inflight.items()):
+                _submit_details(key, item)
+            for query_idx in range(search_units):
+                state = query_state.setdefault(query_idx, {"page": 0, "token": None, "done": False})
+                if state["done"]:
+                    continue
+                if not _submit_page(query_idx, state["page"], state["token"]):
                     break
 
-                if status not in {"OK", "ZERO_RESULTS"}:
-                    print(f"查詢狀態: {query} page={page_no+1} -> {status}")
-
-                results = data.get("results") or []
-                for item in results:
-                    place_id = item.get("place_id")
-                    name = item.get("name") or ""
-                    address = item.get("formatted_address") or ""
-                    if not place_id or not name:
-                        continue
-                    if place_id in seen or name in seen:
-                        continue
-                    seen.add(place_id)
-                    seen.add(name)
-
-                    preview_address = item.get("formatted_address") or ""
-                    preview_city = _normalize_city_name(_extract_city(preview_address))
-                    merge_key = _place_merge_key(name, preview_city, preview_address)
-                    existing_hit = existing_by_id.get(place_id) or existing_by_merge_key.get(merge_key)
-                    if existing_hit and not _needs_enrich(existing_hit):
-                        skipped_complete += 1
+            while pending:
+                done, _ = wait(list(pending), return_when=FIRST_COMPLETED)
+                for future in done:
+                    kind, *ctx = pending.pop(future)
+                    if kind == "details":
+                        key, item = ctx
+                        try:
+                            details = future.result()
+                        except BudgetExhausted:
+                            details = None
+                        _stage(key, item, details or {})
+                        inflight.pop(key, None)
+                        _track(key[0], -1)
                         continue
 
-                    details = {}
-                    if fetch_search_details:
-                        # Reserve quota for the remaining queries (at least 1 call each query).
-                        remaining_queries = max(0, len(queries) - query_idx - 1)
-                        reserve_quota = remaining_queries
-                        if request_count < MAX_REQUESTS - reserve_quota:
-                            details = _place_details(place_id) or {}
-                            if details:
-                                request_count += 1
-
-                    geometry = (details.get("geometry") or item.get("geometry") or {}).get("location", {})
-                    lat = float(geometry.get("lat") or 0)
-                    lng = float(geometry.get("lng") or 0)
-                    types = details.get("types") or item.get("types") or []
-                    rating = details.get("rating") or item.get("rating")
-                    rating_total = details.get("user_ratings_total") or item.get("user_ratings_total")
-                    price_level = details.get("price_level") or item.get("price_level")
-                    editorial = (details.get("editorial_summary") or {}).get("overview") if details else None
-                    details_address = details.get("formatted_address") or ""
-                    components = details.get("address_components") or []
-                    base_address = _pick_best_address(details_address, address)
-                    rebuilt_address = _build_address_from_components(components, base_address)
-                    city = _normalize_city_name(
-                        _extract_city_from_components(components)
-                        or _extract_city(base_address)
-                        or _extract_city(rebuilt_address)
-                    )
-                    if single_city_mode and not city:
-                        city = _normalize_city_name(selected_city)
-                    full_address = _pick_best_address(base_address, rebuilt_address)
-                    full_address = _ensure_address_with_city(full_address, city)
-                    if single_city_mode and not _matches_selected_city(selected_city, city, full_address):
-                        skipped_outside_city += 1
+                    query_idx, page_no, page_token, attempt = ctx
+                    _track(query_idx, -1)
+                    try:
+                        data = future.result()
+                    except BudgetExhausted:
                         continue
-                    photos = details.get("photos") or item.get("photos") or []
-                    photo_ref = ""
-                    if isinstance(photos, list) and photos:
-                        photo_ref = photos[0].get("photo_reference", "") if isinstance(photos[0], dict) else ""
-                    image_url = _photo_url(photo_ref)
-                    opening_hours = _normalize_opening_hours(details.get("opening_hours"))
-                    raw_reviews = [r.get("text", "") for r in (details.get("reviews") or []) if isinstance(r, dict)]
-                    reviews = _clean_reviews(raw_reviews)
-                    text = f"{name} {full_address} {editorial or ''} {' '.join(reviews)}"
-                    tags = _extract_tags(text, types)
-                    category = tags[0] if tags else "other"
-                    opening_hours = opening_hours or _infer_opening_hours(
-                        name,
-                        types,
-                        tags,
-                        editorial or "",
-                    )
-                    price_level_value = int(price_level) if price_level is not None else None
-                    if price_level_value is None:
-                        price_level_value = _infer_price_level(
-                            name,
-                            types,
-                            city,
-                            full_address,
-                            editorial or "",
-                            " ".join(reviews),
-                        )
-                    price_category = _price_category(price_level_value)
-                    output.append(
-                        Place(
-                            id=place_id,
-                            name=name,
-                            category=category,
-                            tags=tags,
-                            city=city,
-                            address=full_address,
-                            lat=lat,
-                            lng=lng,
-                            description=editorial or "",
-                            imageUrl=image_url,
-                            rating=float(rating) if rating is not None else None,
-                            userRatingsTotal=int(rating_total) if rating_total is not None else None,
-                            priceLevel=price_level_value,
-                            priceCategory=price_category,
-                            openingHours=opening_hours,
-                            source="google_places",
-                            updatedAt=_utc_now_iso(),
-                        )
+                    search_stats["requests"] += 1
+                    status = data.get("status") or "UNKNOWN"
+                    if status == "INVALID_REQUEST" and page_token and attempt < 3:
+                        if _submit_page(query_idx, page_no, page_token, attempt + 1):
+                            continue
+
+                    if status not in {"OK", "ZERO_RESULTS"}:
+                        print(f"查詢狀態: {_query_label(query_idx)} page={page_no+1} -> {status}")
+
+                    results = data.get("results") or []
+                    for item_idx, item in enumerate(results):
+                        place_id = item.get("place_id")
+                        name = item.get("name") or ""
+                        if not place_id or not name:
+                            continue
+                        if tiles_mode:
+                            # Same-named places in different towns are distinct; only drop a name
+                            # repeated at (almost) the same coordinates.
+                            if place_id in seen or not spatial_dedupe.add(place_id, name, *item_location(item)):
+                                continue
+                            seen.add(place_id)
+                        else:
+                            if place_id in seen or name in seen:
+                                continue
+                            seen.add(place_id)
+                            seen.add(name)
+                        search_stats["new"] += 1
+
+                        preview_address = _search_item_address(item)
+                        preview_city = normalize_city_name(extract_city(preview_address))
+                        merge_key = _place_merge_key(name, preview_city, preview_address)
+                        existing_hit = store.get_by_id(place_id) or store.get_by_merge_key(merge_key)
+                        if existing_hit and not _needs_enrich(existing_hit):
+                            skipped_complete += 1
+                            continue
+
+                        _submit_details((query_idx, page_no, item_idx), item)
+
+                    next_token = data.get("next_page_token")
+                    page_no += 1
+                    if (
+                        tiles_mode
+                        and page_no == 1
+                        and len(results) >= NEARBY_PAGE_SIZE
+                        and tile_set[query_idx].can_split()
+                    ):
+                        # Dense tile: four smaller circles find more than paging this one would.
+                        query_state[query_idx] = {"page": page_no, "token": None, "done": True}
+                        for child_idx in tile_set.split(query_idx):
+                            query_state[child_idx] = {"page": 0, "token": None, "done": False}
+                            _submit_page(child_idx, 0, None)
+                        search_units = tile_set.next_seq
+                        continue
+                    if next_token and status in {"OK", "ZERO_RESULTS"} and page_no < max_pages:
+                        # Left unfinished if the budget runs out, so --resume can continue the query.
+                        query_state[query_idx] = {"page": page_no, "token": next_token, "done": False}
+                        if _submit_page(query_idx, page_no, next_token):
+                            continue
+                    else:
+                        query_state[query_idx] = {"page": page_no, "token": None, "done": True}
+                    print(
+                        f"完成查詢: {_query_label(query_idx)}, 分頁 {page_no}/{max_pages}, "
+                        f"累積 {len(staged) + sum(merge_stats.values())} 筆, 用量 {budget.used}/{MAX_REQUESTS}, "
+                        f"跳過完整資料 {skipped_complete} 筆, 跳過非目標縣市 {skipped_outside_city} 筆"
                     )
-                    if details:
-                        reviews_out.append(
-                            {
-                                "place_id": place_id,
-                                "source_name": name,
-                                "name": name,
-                                "formatted_address": address,
-                                "rating": rating,
-                                "user_ratings_total": rating_total,
-                                "price_level": price_level,
-                                "types": types,
-                                "editorial_summary": editorial or "",
-                                "reviews": reviews,
-                                "image_url": image_url,
-                                "opening_hours": opening_hours,
-                            }
-                        )
-                    if request_count >= MAX_REQUESTS:
-                        break
-
-                page_token = data.get("next_page_token")
-                page_no += 1
-                if not page_token or status not in {"OK", "ZERO_RESULTS"}:
-                    break
 
-            print(
-                f"完成查詢: {query}, 分頁 {page_no}/{max(1, TEXTSEARCH_MAX_PAGES)}, "
-                f"累積 {len(output)} 筆, 用量 {request_count}/{MAX_REQUESTS}, "
-                f"跳過完整資料 {skipped_complete} 筆, 跳過非目標縣市 {skipped_outside_city} 筆"
-            )
-            time.sleep(SLEEP_BETWEEN)
-
-    # Backfill only the source marker for legacy records.
-    # Do not stamp updatedAt here, otherwise "只看剛更新" 會把沒有被這次爬蟲碰到的舊資料
-    # 也誤判成剛更新，讓單縣市結果看起來像混進其他縣市。
-    for place in existing_places:
-        if isinstance(place, dict) and not place.get("source"):
-            place["source"] = "google_places"
-
-    merged_places, merge_stats = _merge_places(existing_places, output)
-
-    if single_city_mode and request_count < MAX_REQUESTS and not fast_bulk_mode:
-        enriched_selected_city = 0
-        for place in merged_places:
-            if request_count >= MAX_REQUESTS:
-                break
-            if not isinstance(place, dict):
-                continue
-            if not _matches_selected_city(selected_city, str(place.get("city") or ""), str(place.get("address") or "")):
-                continue
-            if not _needs_enrich(place):
-                continue
+                _flush_completed_queries()
+                if checkpoint.due():
+                    _save_checkpoint()
 
-            place_id = (place.get("id") or "").strip()
-            if not place_id:
-                query = _build_query_from_place(place)
-                if not query:
+        for key in sorted(staged):
+            place, review_item = staged[key]
+            output.append(place)
+            if review_item:
+                reviews_out.append(review_item)
+        staged.clear()
+
+        # Backfill only the source marker for legacy records.
+        # Do not stamp updatedAt here, otherwise "只看剛更新" 會把沒有被這次爬蟲碰到的舊資料
+        # 也誤判成剛更新，讓單縣市結果看起來像混進其他縣市。
+        for place in existing_places:
+            if isinstance(place, dict) and not place.get("source"):
+                place["source"] = "google_places"
+                store.mark_dirty(place)
+
+        merged_places, stats = _merge_places(store, output, changelog)
+        for name, count in stats.items():
+            merge_stats[name] += count
+
+        if run_city_enrich and budget.remaining() > 0:
+            enriched_selected_city = 0
+            candidates = [
+                place
+                for place in merged_places
+                if isinstance(place, dict)
+                and _matches_selected_city(selected_city, str(place.get("city") or ""), str(place.get("address") or ""))
+                and _needs_enrich(place)
+                and ((place.get("id") or "").strip() or _build_query_from_place(place))
+                and _progress_key(place) not in city_processed
+            ]
+            queue = EnrichmentQueue(
+                candidates,
+                gap_count=lambda place: len(_enrich_gaps(place)),
+                itinerary_counts=itinerary_counts,
+            )
+            for place, future in client.map_ordered(
+                lambda item: _lookup_details(item, use_existing_id=True),
+                queue,
+            ):
+                if checkpoint.due():
+                    enriched_selected_city += _enrich_details_batch(city_processed, adopt_id=True)
+                    _save_checkpoint()
+                try:
+                    place_id, details, fields = future.result()
+                except BudgetExhausted:
                     continue
-                place_id = _find_place_id(query) or ""
-                request_count += 1
                 if not place_id:
+                    city_processed.add(_progress_key(place))
                     continue
-                place["id"] = place_id
-
-            details = _place_details(place_id) or {}
-            if details:
-                request_count += 1
-            changed, review_item = _enrich_place_from_details(place, details)
-            if changed:
-                enriched_selected_city += 1
-            if review_item:
-                reviews_out.append(review_item)
-                review_place_id = (review_item.get("place_id") or "").strip()
-                if review_place_id:
-                    reviews_by_id[review_place_id] = review_item
-
-        if enriched_selected_city:
-            print(f"單縣市補完整資料：{selected_city} 額外補齊 {enriched_selected_city} 筆")
-
-    db["places"] = merged_places
-    DB_PATH.write_text(json.dumps(db, ensure_ascii=False, indent=2), encoding="utf-8")
-    if reviews_out:
-        for item in reviews_out:
-            key = (item.get("source_name") or item.get("name") or "").strip()
-            if key:
-                reviews_by_name[key] = item
-            place_id = (item.get("place_id") or "").strip()
-            if place_id:
-                reviews_by_id[place_id] = item
-        merged_reviews = {**reviews_by_name, **reviews_by_id}
-        REVIEWS_PATH.write_text(
-            json.dumps(list(merged_reviews.values()), ensure_ascii=False, indent=2),
-            encoding="utf-8",
-        )
+                details_batch.append((place, place_id, details, fields))
+                if len(details_batch) >= batch_size:
+                    enriched_selected_city += _enrich_details_batch(city_processed, adopt_id=True)
+            enriched_selected_city += _enrich_details_batch(city_processed, adopt_id=True)
+
+            if enriched_selected_city:
+                print(f"單縣市補完整資料：{selected_city} 額外補齊 {enriched_selected_city} 筆")
+    except BaseException:
+        # Timeout, OVER_QUERY_LIMIT or Ctrl-C: keep what was paid for and where we stopped.
+        _save_checkpoint()
+        print(f"抓取中斷，已寫入檢查點 {checkpoint.path}，可加 --resume 接續")
+        raise
+    finally:
+        client.shutdown()
+        engine.close()
+        cache.close()
+        archive.close()
+        quota_summary = ledger.summary() if ledger is not None else ""
+        if ledger is not None:
+            ledger.close()
+
+    store.save()
+    changelog.flush()
+    _append_review_items(REVIEWS_PATH, reviews_out, review_deduper)
+    checkpoint.clear()
     print(
-        f"完成，寫入 {DB_PATH}，來源 {len(output)} 筆，"
+        f"完成，寫入 {store.path}，來源 {sum(merge_stats.values())} 筆，"
         f"新增 {merge_stats['added']}／更新 {merge_stats['updated']}／未變更 {merge_stats['unchanged']}，"
         f"查詢中跳過完整資料 {skipped_complete} 筆，"
         f"跳過非目標縣市 {skipped_outside_city} 筆"
     )
+    print(f"API 請求 {budget.used}/{MAX_REQUESTS}，{cache.summary()}，Details 封存新增 {archive.appended} 筆")
+    if client.quota_exhausted:
+        print("共用額度已用完，提前結束（見 quota_ledger.py）")
+    if quota_summary:
+        print(quota_summary)
+    if search_stats["requests"]:
+        print(
+            f"搜尋請求 {search_stats['requests']} 次，新景點 {search_stats['new']} 筆"
+            f"（每請求 {search_stats['new'] / search_stats['requests']:.2f} 筆）"
+        )
+    if tiles_mode:
+        print(f"網格 {len(tile_set)} 格（細分 {tile_set.split_count} 次），{spatial_dedupe.summary()}")
+    print(engine.summary())
+    print(address_cache_summary())
+    print(transport_summary())
+    print(changelog.summary())
+    mask_stats.save()
+    for line in mask_stats.summary():
+        print(line)
 
 
 if __name__ == "__main__":
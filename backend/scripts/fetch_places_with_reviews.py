@@ -7,31 +7,50 @@ Usage:
   GOOGLE_MAPS_API_KEY=your_key python3 backend/scripts/fetch_places_with_reviews.py
 
 Outputs:
-  backend/data/places_with_reviews.json  (list of dicts with name/address/geometry/reviews/category/tags)
+  backend/data/places_with_reviews.jsonl  (one dict per line with name/address/geometry/reviews/category/tags;
+  this run's places are appended and replace older lines for the same place, see review_store.py)
 
 Notes:
-  - Uses Text Search to find place_id by name+city, then Place Details to fetch fields:
+  - Reuses a known place_id (name→place_id map, Google ids stored by the crawler, earlier
+    places_with_reviews.jsonl; see place_id_resolver.py) and only runs Text Search on a miss,
+    then Place Details to fetch fields:
     name, formatted_address, geometry, editorial_summary, reviews, rating, user_ratings_total, types
   - Extracts tags from name/summary/reviews/types with keyword rules (multi-label).
-  - Uses a local text classifier to filter low-signal reviews when enough data is available.
+  - Near-duplicate reviews (templated / copy-pasted, see review_dedupe.py) are dropped
+    across all places before tags are extracted.
+  - Uses a local text classifier to filter low-signal reviews when enough data is available;
+    all reviews are scored in one batch, and the fitted model is saved to REVIEW_MODEL_PATH
+    with REVIEW_MODEL_VERSION and a hash of the labeled reviews, so an unchanged pool reloads it.
   - MAX_REQUESTS limits total HTTP calls (search + details each算一次) to avoid超額。
   - 遇到 OVER_QUERY_LIMIT/429 會立即停止。
+  - 每次請求也計入跨行程共用的每日／每月額度（quota_ledger.py），額度用完即停止。
+  - 回應會寫入磁碟快取（response_cache.py），快取命中不計入 MAX_REQUESTS；
+    PLACES_CACHE=offline 可在不連網、不需 API key 的情況下重跑。
 """
 from __future__ import annotations
 
-import json
+import hashlib
 import os
-import ssl
+import pickle
 import sys
 import time
-import urllib.parse
-import urllib.request
 from pathlib import Path
-from typing import Dict, Any, List
+from typing import Dict, Any, Iterable, Iterator, List
+
+from http_transport import get_json, transport_summary
+from keyword_matcher import KeywordMatcher
+from place_id_resolver import PlaceIdResolver
+from place_store import PlaceStore, append_review_items, iter_review_items, open_place_store
+from quota_ledger import QuotaLedger
+from response_cache import CACHE_MISS_STATUS, ResponseCache
+from review_dedupe import ReviewDeduper
 
 ROOT = Path(__file__).resolve().parents[1]
 DB_PATH = ROOT / "data" / "db.json"
-OUT_PATH = ROOT / "data" / "places_with_reviews.json"
+OUT_PATH = ROOT / "data" / "places_with_reviews.jsonl"
+REVIEW_MODEL_PATH = Path(os.environ.get("REVIEW_MODEL_PATH", str(ROOT / "data" / "review_filter_model.pkl")))
+# Bump when the pipeline or its hyperparameters change, so saved models are retrained.
+REVIEW_MODEL_VERSION = "tfidf8000-logreg-1"
 API_KEY = os.environ.get("GOOGLE_MAPS_API_KEY")
 
 MAX_REQUESTS = 300  # 總請求數上限（search+details 都算）
@@ -41,6 +60,8 @@ MIN_REVIEW_LEN = 12  # 評論最少字數
 MIN_MODEL_PROB = 0.55  # 模型判斷為「有效評論」的門檻
 USE_LOCAL_MODEL = True
 MERGE_TO_DB = True  # 抓完後直接合併 tags 回 db.json
+# Details statuses that mean a stored place_id no longer works and should be searched again.
+STALE_ID_STATUSES = {"NOT_FOUND", "INVALID_REQUEST"}
 
 NOISE_HINTS = [
     "哈哈",
@@ -91,18 +112,11 @@ FIELDS = ",".join(
     ]
 )
 
-if not API_KEY:
-    sys.exit("請先在環境變數設定 GOOGLE_MAPS_API_KEY")
-
-try:
-    import certifi
-
-    ssl._create_default_https_context = lambda: ssl.create_default_context(  # noqa: E731
-        cafile=certifi.where()
-    )
-except Exception:
-    pass
+response_cache = ResponseCache()
+quota_ledger: QuotaLedger | None = None
 
+if not API_KEY and not response_cache.offline:
+    sys.exit("請先在環境變數設定 GOOGLE_MAPS_API_KEY")
 
 # tag keywords (kw -> tag)
 INTEREST_KEYWORDS = [
@@ -192,6 +206,7 @@ INTEREST_KEYWORDS = [
     ("寺", "temple"),
     ("宮", "temple"),
 ]
+_INTEREST_MATCHER = KeywordMatcher(INTEREST_KEYWORDS)
 
 PLACE_TYPE_TAGS = {
     "museum": "museum",
@@ -210,12 +225,9 @@ PLACE_TYPE_TAGS = {
 
 
 def extract_tags(text: str, types: list[str], fallback: str) -> list[str]:
-    tags = set()
+    tags = _INTEREST_MATCHER.find(text)
     if fallback:
         tags.add(fallback)
-    for kw, tag in INTEREST_KEYWORDS:
-        if kw in text:
-            tags.add(tag)
     for t in types:
         mapped = PLACE_TYPE_TAGS.get(t)
         if mapped:
@@ -235,8 +247,48 @@ def _label_review(text: str) -> int | None:
     return None
 
 
+def _labeled_pool(texts: list[str]) -> tuple[list[str], list[int]]:
+    labeled_texts: list[str] = []
+    labels: list[int] = []
+    for t in texts:
+        label = _label_review(t)
+        if label is None:
+            continue
+        labeled_texts.append(t)
+        labels.append(label)
+    return labeled_texts, labels
+
+
+def _pool_hash(labeled_texts: list[str], labels: list[int]) -> str:
+    digest = hashlib.sha1()
+    for text, label in sorted(zip(labeled_texts, labels)):
+        digest.update(f"{label}\t{text}\n".encode("utf-8"))
+    return digest.hexdigest()
+
+
+def _load_review_model(data_hash: str, sklearn_version: str):
+    if not REVIEW_MODEL_PATH.exists():
+        return None
+    try:
+        with REVIEW_MODEL_PATH.open("rb") as fh:
+            saved = pickle.load(fh)
+    except Exception as exc:
+        print("Cannot read saved review filter, retrain:", exc)
+        return None
+    if (
+        not isinstance(saved, dict)
+        or saved.get("version") != REVIEW_MODEL_VERSION
+        or saved.get("sklearn") != sklearn_version
+        or saved.get("dataHash") != data_hash
+    ):
+        return None
+    return saved.get("model")
+
+
 def _train_review_model(texts: list[str]):
+    """TF-IDF + LogisticRegression review filter; reuses the saved one when the labeled pool is unchanged."""
     try:
+        import sklearn
         from sklearn.feature_extraction.text import TfidfVectorizer
         from sklearn.linear_model import LogisticRegression
         from sklearn.pipeline import make_pipeline
@@ -244,73 +296,116 @@ def _train_review_model(texts: list[str]):
         print("sklearn not available, skip model filtering:", exc)
         return None
 
-    labels = []
-    labeled_texts = []
-    for t in texts:
-        label = _label_review(t)
-        if label is None:
-            continue
-        labeled_texts.append(t)
-        labels.append(label)
-
+    labeled_texts, labels = _labeled_pool(texts)
     if len(set(labels)) < 2 or len(labels) < 80:
         print("Not enough labeled reviews for model; skip model filtering.")
         return None
 
+    data_hash = _pool_hash(labeled_texts, labels)
+    model = _load_review_model(data_hash, sklearn.__version__)
+    if model is not None:
+        print(f"Loaded local review filter ({len(labels)} samples, {data_hash[:12]}) from {REVIEW_MODEL_PATH}.")
+        return model
+
     model = make_pipeline(
         TfidfVectorizer(max_features=8000),
         LogisticRegression(max_iter=1000),
     )
     model.fit(labeled_texts, labels)
     print("Trained local review filter on", len(labels), "samples.")
+    REVIEW_MODEL_PATH.parent.mkdir(parents=True, exist_ok=True)
+    tmp = REVIEW_MODEL_PATH.with_suffix(".tmp")
+    with tmp.open("wb") as fh:
+        pickle.dump(
+            {
+                "version": REVIEW_MODEL_VERSION,
+                "sklearn": sklearn.__version__,
+                "dataHash": data_hash,
+                "samples": len(labels),
+                "model": model,
+            },
+            fh,
+        )
+    tmp.replace(REVIEW_MODEL_PATH)
     return model
 
 
-def clean_reviews(reviews: list[str], model=None) -> list[str]:
-    seen = set()
+def score_reviews(texts: list[str], model) -> Dict[str, float]:
+    """P(informative) for every distinct review long enough to keep, in one predict_proba call."""
+    if model is None:
+        return {}
+    unique = list(dict.fromkeys(t for t in ((raw or "").strip() for raw in texts) if len(t) >= MIN_REVIEW_LEN))
+    if not unique:
+        return {}
+    started = time.perf_counter()
+    try:
+        probs = model.predict_proba(unique)[:, 1]
+    except Exception as exc:
+        print("Review filter failed, keep all reviews:", exc)
+        return {}
+    print(f"Scored {len(unique)} reviews in {(time.perf_counter() - started) * 1000:.0f} ms.")
+    return dict(zip(unique, probs.tolist()))
+
+
+def clean_reviews(
+    reviews: list[str],
+    scores: Dict[str, float] | None = None,
+    deduper: ReviewDeduper | None = None,
+    owner: int | None = None,
+) -> list[str]:
+    """Drop short, low-scoring and (near-)duplicate reviews; pass one deduper to dedupe across places.
+
+    `owner` is the deduper's `claim()` token for the item the reviews belong to.
+    """
+    deduper = deduper or ReviewDeduper()
     cleaned: list[str] = []
     for raw in reviews:
         text = (raw or "").strip()
         if len(text) < MIN_REVIEW_LEN:
             continue
-        if text in seen:
+        if scores:
+            score = scores.get(text)
+            if score is not None and score < MIN_MODEL_PROB:
+                continue
+        if not deduper.add(text, owner):
             continue
-        if model is not None:
-            try:
-                score = model.predict_proba([text])[0][1]
-                if score < MIN_MODEL_PROB:
-                    continue
-            except Exception:
-                pass
-        seen.add(text)
         cleaned.append(text)
     return cleaned
 
+
+def _seeding(deduper: ReviewDeduper, items: Iterable[Dict[str, Any]]) -> Iterator[Dict[str, Any]]:
+    for item in items:
+        deduper.seed(item)
+        yield item
+
 def fetch_json(url: str, params: Dict[str, Any]) -> Dict[str, Any]:
+    cached = response_cache.get(url, params)
+    if cached is not None:
+        return cached
+    if response_cache.offline:
+        return {"status": CACHE_MISS_STATUS}
+    key_params = dict(params)
+    data = _fetch_remote(url, params)
+    response_cache.put(url, key_params, data)
+    return data
+
+
+def _fetch_remote(url: str, params: Dict[str, Any]) -> Dict[str, Any]:
     global request_count
     if request_count >= MAX_REQUESTS:
         raise RuntimeError("已達 MAX_REQUESTS，停止以避免超額")
+    if quota_ledger is not None:
+        # QuotaExhausted is a RuntimeError, so the main loop stops the same way.
+        quota_ledger.reserve(url.rstrip("/").split("/")[-2])
+        quota_ledger.throttle()
     params["key"] = API_KEY
-    qs = urllib.parse.urlencode(params, safe=",")
-    full_url = f"{url}?{qs}"
-    req = urllib.request.Request(full_url, headers={"User-Agent": "smart-travel/1.0"})
-    with urllib.request.urlopen(req, timeout=20, context=_ssl_context()) as resp:
-        data = json.loads(resp.read().decode("utf-8"))
+    data = get_json(url, params, timeout=20)
     request_count += 1
     if data.get("status") in {"OVER_QUERY_LIMIT", "RESOURCE_EXHAUSTED"}:
         raise RuntimeError("OVER_QUERY_LIMIT/RESOURCE_EXHAUSTED，已停止")
     return data
 
 
-def _ssl_context() -> ssl.SSLContext:
-    try:
-        import certifi
-
-        return ssl.create_default_context(cafile=certifi.where())
-    except Exception:
-        return ssl.create_default_context()
-
-
 def text_search(query: str) -> str | None:
     data = fetch_json(
         "https://maps.googleapis.com/maps/api/place/textsearch/json",
@@ -322,7 +417,8 @@ def text_search(query: str) -> str | None:
     return results[0].get("place_id")
 
 
-def place_details(place_id: str) -> Dict[str, Any] | None:
+def place_details(place_id: str) -> tuple[str, Dict[str, Any] | None]:
+    """(status, result); result is None unless status is OK."""
     data = fetch_json(
         "https://maps.googleapis.com/maps/api/place/details/json",
         {
@@ -332,19 +428,45 @@ def place_details(place_id: str) -> Dict[str, Any] | None:
             "fields": FIELDS,
         },
     )
-    if data.get("status") != "OK":
-        return None
-    return data.get("result") or {}
+    status = data.get("status") or ""
+    if status != "OK":
+        return status, None
+    return status, data.get("result") or {}
+
+
+def resolve_details(
+    place: Dict[str, Any], query: str, resolver: PlaceIdResolver
+) -> tuple[str | None, Dict[str, Any] | None]:
+    """(place_id, details) for a db place; Text Search runs only when no known place_id works."""
+    pid = resolver.lookup(place)
+    if pid:
+        status, detail = place_details(pid)
+        if detail is not None or status not in STALE_ID_STATUSES:
+            return pid, detail
+        print(f"[INFO] 既有 place_id 已失效（{status}），改用搜尋: {place.get('name')}")
+        resolver.forget(place)
+        time.sleep(SLEEP_BETWEEN)
+    pid = text_search(query)
+    if not pid:
+        return None, None
+    resolver.remember(place, pid)
+    time.sleep(SLEEP_BETWEEN)
+    return pid, place_details(pid)[1]
 
 
 def main():
-    global request_count
+    global request_count, quota_ledger
     request_count = 0
+    quota_ledger = QuotaLedger.open("fetch_places_with_reviews")
 
     if not DB_PATH.exists():
         sys.exit(f"找不到 {DB_PATH}")
-    db = json.loads(DB_PATH.read_text(encoding="utf-8"))
-    places = db.get("places") or []
+    store = open_place_store(DB_PATH)
+    places = store.places
+    # One pass over the stored reviews feeds the resolver's place_id index and seeds the
+    # deduper, so new reviews that copy a stored one are dropped like in the crawler.
+    deduper = ReviewDeduper()
+    resolver = PlaceIdResolver(review_items=_seeding(deduper, iter_review_items(OUT_PATH)))
     output: List[Dict[str, Any]] = []
     review_pool: List[str] = []
     staged: List[Dict[str, Any]] = []
@@ -361,28 +483,18 @@ def main():
 
         query = f"{name} {city}".strip()
         try:
-            pid = text_search(query)
+            pid, detail = resolve_details(p, query, resolver)
         except RuntimeError as e:
             print(f"[STOP] {e}")
             break
         except Exception as e:
-            print(f"[WARN] search失敗: {name} ({e})")
+            print(f"[WARN] search/details失敗: {name} ({e})")
             continue
 
         if not pid:
             print(f"[SKIP] 找不到 place_id: {name}")
             continue
 
-        time.sleep(SLEEP_BETWEEN)
-        try:
-            detail = place_details(pid)
-        except RuntimeError as e:
-            print(f"[STOP] {e}")
-            break
-        except Exception as e:
-            print(f"[WARN] details失敗: {name} ({e})")
-            continue
-
         if not detail:
             print(f"[SKIP] details 無資料: {name}")
             continue
@@ -416,8 +528,11 @@ def main():
             break
 
     model = _train_review_model(review_pool) if USE_LOCAL_MODEL else None
-    for item in staged:
-        reviews_texts = clean_reviews(item.pop("raw_reviews"), model)[:REVIEWS_LIMIT]
+    scores = score_reviews(review_pool, model)
+    # Claim every fresh item first: reviews of the stored items they replace never count as copies.
+    owners = [deduper.claim(item) for item in staged]
+    for item, owner in zip(staged, owners):
+        reviews_texts = clean_reviews(item.pop("raw_reviews"), scores, deduper, owner)[:REVIEWS_LIMIT]
         editorial = item.get("editorial_summary") or ""
         types = item.get("types") or []
         text_blob = " ".join([item.get("source_name", ""), editorial, " ".join(reviews_texts)])
@@ -426,15 +541,24 @@ def main():
         item["reviews"] = reviews_texts
         output.append(item)
 
-    OUT_PATH.write_text(json.dumps(output, ensure_ascii=False, indent=2), encoding="utf-8")
-    print(f"完成，寫入 {OUT_PATH}, 總筆數 {len(output)}, API 請求 {request_count}")
+    resolver.save()
+    append_review_items(OUT_PATH, output)
+    print(f"完成，寫入 {OUT_PATH}, 本次 {len(output)} 筆, API 請求 {request_count}")
+    print(resolver.summary())
+    print(deduper.summary())
+    print(response_cache.summary())
+    print(transport_summary())
+    if quota_ledger is not None:
+        print(quota_ledger.summary())
+        quota_ledger.close()
     if MERGE_TO_DB:
-        merge_into_db(output)
+        merge_into_db(output, store)
 
 
-def merge_into_db(reviews: list[Dict[str, Any]]) -> None:
-    db = json.loads(DB_PATH.read_text(encoding="utf-8"))
-    places = db.get("places") or []
+def merge_into_db(reviews: list[Dict[str, Any]], store: PlaceStore | None = None) -> None:
+    if store is None:
+        store = open_place_store(DB_PATH)
+    places = store.places
     tag_map: dict[str, list[str]] = {}
     for item in reviews:
         name = (item.get("source_name") or item.get("name") or "").strip()
@@ -451,11 +575,14 @@ def merge_into_db(reviews: list[Dict[str, Any]]) -> None:
         tags = tag_map[name]
         if not tags:
             continue
+        if p.get("tags") == tags and p.get("category") == tags[0]:
+            continue
         p["tags"] = tags
         p["category"] = tags[0]
+        store.mark_dirty(p)
         updated += 1
 
-    DB_PATH.write_text(json.dumps(db, ensure_ascii=False, indent=2), encoding="utf-8")
+    store.save()
     print(f"已合併 tags 回 db.json: {updated} 筆")
 
 
@@ -0,0 +1,338 @@
+"""
+Concurrent Google Places request engine shared by the crawl scripts.
+
+Runs Details / FindPlace / TextSearch calls on a bounded thread pool with a
+token-bucket QPS limiter and a thread-safe request budget, so MAX_REQUESTS is
+respected exactly even with many requests in flight. `submit(..., delay=...)`
+schedules a call without holding a worker, which is how next_page_token
+propagation waits are handled without blocking other queries.
+
+The HTTP call itself is injected (`fetcher(url, params) -> dict`), so the
+scripts keep their own retry / status handling. With a `ResponseCache`
+(response_cache.py) attached, cache hits skip the budget and the rate limiter
+entirely, so reruns only pay for what is missing.
+
+`SharedRequestBudget` / `SharedTokenBucket` keep the counter and the bucket in
+shared memory, so several crawler processes (crawl_shards.py) draw from one
+MAX_REQUESTS and one QPS limit. An attached `QuotaLedger` (quota_ledger.py)
+additionally counts every paid request against the persistent daily / monthly
+quota shared with other scripts and runs.
+
+Optional env:
+  GOOGLE_PLACES_BASE_URL=https://maps.googleapis.com/maps/api/place  # e.g. http://127.0.0.1:8765 for a local stand-in server
+  GOOGLE_CONCURRENCY=4   # max requests in flight
+  GOOGLE_QPS=5           # token-bucket refill rate (requests / second)
+"""
+from __future__ import annotations
+
+import multiprocessing
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable, Dict, Iterable, Iterator, Tuple, TypeVar
+
+from response_cache import CACHE_MISS_STATUS, ResponseCache
+
+PLACES_BASE_URL = os.environ.get(
+    "GOOGLE_PLACES_BASE_URL", "https://maps.googleapis.com/maps/api/place"
+).rstrip("/")
+CONCURRENCY = max(1, int(os.environ.get("GOOGLE_CONCURRENCY", "4")))
+QPS = float(os.environ.get("GOOGLE_QPS", "5"))
+
+Fetcher = Callable[[str, Dict[str, Any]], Dict[str, Any]]
+T = TypeVar("T")
+
+
+class BudgetExhausted(RuntimeError):
+    """Raised when a request would exceed MAX_REQUESTS (or a phase ceiling)."""
+
+
+class RequestBudget:
+    """Thread-safe request counter with an absolute limit.
+
+    `ceiling` lets a crawl phase stop below the global limit, e.g. to keep
+    quota in reserve for a later phase.
+    """
+
+    def __init__(self, limit: int, used: int = 0) -> None:
+        self.limit = max(0, int(limit))
+        self._used = max(0, int(used))
+        self._lock = threading.Lock()
+
+    @property
+    def used(self) -> int:
+        with self._lock:
+            return self._used
+
+    def remaining(self, ceiling: int | None = None) -> int:
+        cap = self.limit if ceiling is None else min(self.limit, ceiling)
+        with self._lock:
+            return max(0, cap - self._used)
+
+    def try_acquire(self, ceiling: int | None = None) -> bool:
+        cap = self.limit if ceiling is None else min(self.limit, ceiling)
+        with self._lock:
+            if self._used >= cap:
+                return False
+            self._used += 1
+            return True
+
+    def acquire(self, ceiling: int | None = None) -> None:
+        if not self.try_acquire(ceiling):
+            raise BudgetExhausted("已達 MAX_REQUESTS，停止以避免超額")
+
+    def release(self) -> None:
+        """Give back a request that was acquired but never sent."""
+        with self._lock:
+            self._used = max(0, self._used - 1)
+
+
+class SharedRequestBudget(RequestBudget):
+    """RequestBudget whose counter lives in shared memory.
+
+    Hand it to worker processes when they start (Process args or pool
+    initargs); every process then draws from the same limit. `local_used`
+    counts only the requests made by the current process.
+    """
+
+    def __init__(self, limit: int, used: int = 0, *, ctx: Any = None) -> None:
+        ctx = ctx or multiprocessing.get_context()
+        self.limit = max(0, int(limit))
+        self._shared = ctx.Value("q", max(0, int(used)))
+        self.local_used = 0
+
+    @property
+    def used(self) -> int:
+        return self._shared.value
+
+    def remaining(self, ceiling: int | None = None) -> int:
+        cap = self.limit if ceiling is None else min(self.limit, ceiling)
+        return max(0, cap - self._shared.value)
+
+    def try_acquire(self, ceiling: int | None = None) -> bool:
+        cap = self.limit if ceiling is None else min(self.limit, ceiling)
+        with self._shared.get_lock():
+            if self._shared.value >= cap:
+                return False
+            self._shared.value += 1
+            self.local_used += 1
+            return True
+
+    def release(self) -> None:
+        with self._shared.get_lock():
+            self._shared.value = max(0, self._shared.value - 1)
+            self.local_used = max(0, self.local_used - 1)
+
+
+class TokenBucket:
+    """Blocking token bucket; `rate <= 0` disables limiting."""
+
+    def __init__(self, rate: float, burst: float | None = None) -> None:
+        self.rate = float(rate)
+        self.capacity = max(1.0, float(burst if burst is not None else rate))
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self) -> None:
+        if self.rate <= 0:
+            return
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait = (1 - self._tokens) / self.rate
+            time.sleep(wait)
+
+
+class SharedTokenBucket(TokenBucket):
+    """TokenBucket whose level lives in shared memory, so the QPS limit holds across processes."""
+
+    def __init__(self, rate: float, burst: float | None = None, *, ctx: Any = None) -> None:
+        ctx = ctx or multiprocessing.get_context()
+        self.rate = float(rate)
+        self.capacity = max(1.0, float(burst if burst is not None else rate))
+        # [tokens, last refill]; time.monotonic() is the same clock in every process.
+        self._state = ctx.Array("d", [self.capacity, time.monotonic()])
+
+    def acquire(self) -> None:
+        if self.rate <= 0:
+            return
+        while True:
+            with self._state.get_lock():
+                now = time.monotonic()
+                tokens = min(self.capacity, self._state[0] + (now - self._state[1]) * self.rate)
+                self._state[1] = now
+                if tokens >= 1:
+                    self._state[0] = tokens - 1
+                    return
+                self._state[0] = tokens
+                wait = (1 - tokens) / self.rate
+            time.sleep(wait)
+
+
+class PlacesClient:
+    def __init__(
+        self,
+        fetcher: Fetcher,
+        budget: RequestBudget,
+        *,
+        base_url: str = PLACES_BASE_URL,
+        concurrency: int = CONCURRENCY,
+        qps: float = QPS,
+        cache: ResponseCache | None = None,
+        limiter: TokenBucket | None = None,
+        ledger: Any = None,
+    ) -> None:
+        self.fetcher = fetcher
+        self.budget = budget
+        # quota_ledger.QuotaLedger (not imported here: it imports BudgetExhausted from this module).
+        self.ledger = ledger
+        self.quota_exhausted = False
+        self.cache = cache if cache is not None and cache.enabled else None
+        self.base_url = base_url.rstrip("/")
+        self.concurrency = max(1, concurrency)
+        self.limiter = limiter or TokenBucket(qps, burst=max(1.0, min(qps, float(self.concurrency))))
+        self._executor = ThreadPoolExecutor(max_workers=self.concurrency, thread_name_prefix="places")
+
+    def __enter__(self) -> "PlacesClient":
+        return self
+
+    def __exit__(self, *exc: Any) -> None:
+        self.shutdown()
+
+    def shutdown(self) -> None:
+        self._executor.shutdown(wait=True, cancel_futures=True)
+
+    def url(self, endpoint: str) -> str:
+        return f"{self.base_url}/{endpoint}/json"
+
+    def _reserve(self, endpoint: str, ceiling: int | None) -> None:
+        self.budget.acquire(ceiling)
+        if self.ledger is None:
+            return
+        try:
+            self.ledger.reserve(endpoint)
+        except BudgetExhausted:
+            self.budget.release()
+            self.quota_exhausted = True
+            raise
+
+    def _call(self, endpoint: str, params: Dict[str, Any]) -> Dict[str, Any]:
+        self.limiter.acquire()
+        if self.ledger is not None:
+            self.ledger.throttle()
+        url = self.url(endpoint)
+        if self.cache is None:
+            return self.fetcher(url, params)
+        key_params = dict(params)
+        data = self.fetcher(url, params)
+        self.cache.put(url, key_params, data)
+        return data
+
+    def _cached(self, endpoint: str, params: Dict[str, Any]) -> Dict[str, Any] | None:
+        if self.cache is None:
+            return None
+        data = self.cache.get(self.url(endpoint), params)
+        if data is None and self.cache.offline:
+            return {"status": CACHE_MISS_STATUS}
+        return data
+
+    def fetch(self, endpoint: str, params: Dict[str, Any], *, ceiling: int | None = None) -> Dict[str, Any]:
+        """Blocking call; counts against the budget before the request goes out."""
+        cached = self._cached(endpoint, params)
+        if cached is not None:
+            return cached
+        self._reserve(endpoint, ceiling)
+        return self._call(endpoint, params)
+
+    def submit(
+        self,
+        endpoint: str,
+        params: Dict[str, Any],
+        *,
+        delay: float = 0.0,
+        ceiling: int | None = None,
+    ) -> Future:
+        """Reserve budget now and run the call in the pool, optionally after `delay` seconds.
+
+        Raises BudgetExhausted immediately when no budget is left, so callers
+        decide in submission order which requests get the remaining quota.
+        Cache hits resolve immediately without waiting for `delay`.
+        """
+        cached = self._cached(endpoint, params)
+        if cached is not None:
+            done: Future = Future()
+            done.set_result(cached)
+            return done
+        self._reserve(endpoint, ceiling)
+        if delay <= 0:
+            return self._executor.submit(self._call, endpoint, params)
+        outer: Future = Future()
+
+        def _fire() -> None:
+            if not outer.set_running_or_notify_cancel():
+                return
+            try:
+                inner = self._executor.submit(self._call, endpoint, params)
+            except RuntimeError as exc:  # executor already shut down
+                outer.set_exception(exc)
+                return
+            inner.add_done_callback(lambda done: _copy_result(done, outer))
+
+        timer = threading.Timer(delay, _fire)
+        timer.daemon = True
+        timer.start()
+        return outer
+
+    def run(self, fn: Callable[..., T], *args: Any) -> "Future[T]":
+        """Run a multi-request task (e.g. FindPlace then Details) on the pool."""
+        return self._executor.submit(fn, *args)
+
+    def map_ordered(
+        self,
+        fn: Callable[[Any], T],
+        items: Iterable[Any],
+        *,
+        ceiling: int | None = None,
+        window: int | None = None,
+    ) -> Iterator[Tuple[Any, "Future[T]"]]:
+        """Run `fn(item)` concurrently and yield (item, future) in input order.
+
+        Keeps at most `window` tasks in flight and stops feeding new items once
+        the budget (up to `ceiling`) is spent.
+        """
+        window = window or self.concurrency * 2
+        pending: deque[Tuple[Any, Future]] = deque()
+        source = iter(items)
+        feeding = True
+        while True:
+            while feeding and len(pending) < window:
+                if self.budget.remaining(ceiling) <= 0 or self.quota_exhausted:
+                    feeding = False
+                    break
+                try:
+                    item = next(source)
+                except StopIteration:
+                    feeding = False
+                    break
+                pending.append((item, self.run(fn, item)))
+            if not pending:
+                return
+            item, future = pending.popleft()
+            future.exception()  # wait without raising
+            yield item, future
+
+
+def _copy_result(source: Future, target: Future) -> None:
+    exc = source.exception()
+    if exc is not None:
+        target.set_exception(exc)
+    else:
+        target.set_result(source.result())
@@ -0,0 +1,310 @@
+"""
+Shared HTTP transport for every script that calls a remote API.
+
+`urllib.request.urlopen` opens a new TCP + TLS connection per request, and the
+scripts used to build a fresh SSLContext (re-reading the certifi bundle) for
+each call as well. This module keeps:
+
+  - one SSLContext per verify mode, built once (certifi bundle when installed);
+  - a pool of idle keep-alive connections per (scheme, host, port), so a long
+    crawl against maps.googleapis.com reuses a handful of TLS sessions; a
+    connection is checked out by one thread at a time, so the pool is safe to
+    share with PlacesClient's worker threads;
+  - `Accept-Encoding: gzip, deflate` with transparent decoding.
+
+Redirects are followed and proxies from the usual *_proxy env vars are honoured,
+like urlopen does. Errors keep urlopen's shape: status >= 400 raises `HttpError`
+(a urllib.error.HTTPError, with `.code` and `.read()`), transport failures raise
+OSError / URLError.
+
+Usage:
+  from http_transport import get_json, request, transport_summary
+  data = get_json("https://maps.googleapis.com/maps/api/place/details/json", {"place_id": ...})
+  resp = request("POST", url, data=b"", headers={...}, timeout=90)
+
+Optional env:
+  HTTP_POOL_MAX_IDLE=8   # 每個主機最多保留幾條閒置連線
+"""
+from __future__ import annotations
+
+import gzip
+import http.client
+import io
+import json
+import os
+import ssl
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+import zlib
+from dataclasses import dataclass, field
+from functools import lru_cache
+from typing import Any, Dict, List, Mapping, Tuple
+
+POOL_MAX_IDLE = max(1, int(os.environ.get("HTTP_POOL_MAX_IDLE", "8")))
+DEFAULT_USER_AGENT = "smart-travel/1.0"
+MAX_REDIRECTS = 5
+_REDIRECT_CODES = {301, 302, 303, 307, 308}
+
+# Errors a reused keep-alive connection raises when the server closed it while idle.
+_STALE_ERRORS = (http.client.RemoteDisconnected, http.client.BadStatusLine, ConnectionResetError, BrokenPipeError)
+# Only these are resent after the request went out: the server may have acted on it before dropping.
+_IDEMPOTENT_METHODS = {"GET", "HEAD"}
+
+_PoolKey = Tuple[str, str, int, bool]
+
+
+@lru_cache(maxsize=None)
+def ssl_context(verify: bool = True) -> ssl.SSLContext:
+    """Process-wide SSLContext; `verify=False` only for the open-data fallback in fetch_places.py."""
+    if not verify:
+        context = ssl.create_default_context()
+        context.check_hostname = False
+        context.verify_mode = ssl.CERT_NONE
+        return context
+    try:
+        import certifi
+
+        return ssl.create_default_context(cafile=certifi.where())
+    except Exception:
+        return ssl.create_default_context()
+
+
+class HttpError(urllib.error.HTTPError):
+    """A response with status >= 400; the body is already read."""
+
+    def __init__(self, url: str, status: int, reason: str, headers: http.client.HTTPMessage, body: bytes) -> None:
+        super().__init__(url, status, reason, headers, io.BytesIO(body))
+        self.body = body
+
+
+@dataclass
+class HttpResponse:
+    url: str
+    status: int
+    reason: str
+    headers: http.client.HTTPMessage
+    body: bytes
+
+    def text(self, encoding: str = "utf-8") -> str:
+        return self.body.decode(encoding)
+
+    def json(self, encoding: str = "utf-8") -> Any:
+        return json.loads(self.body.decode(encoding))
+
+
+def _decode_body(body: bytes, encoding: str) -> bytes:
+    encoding = (encoding or "").strip().lower()
+    if encoding in {"gzip", "x-gzip"}:
+        return gzip.decompress(body)
+    if encoding == "deflate":
+        try:
+            return zlib.decompress(body)
+        except zlib.error:
+            # Some servers send raw deflate without the zlib header.
+            return zlib.decompress(body, -zlib.MAX_WBITS)
+    return body
+
+
+@dataclass
+class PoolStats:
+    requests: int = 0
+    connections: int = 0
+    reused: int = 0
+    retried_stale: int = 0
+    seconds: float = 0.0
+    _lock: threading.Lock = field(default_factory=threading.Lock, repr=False)
+
+    def record(self, *, reused: bool, seconds: float) -> None:
+        with self._lock:
+            self.requests += 1
+            self.reused += int(reused)
+            self.seconds += seconds
+
+    def summary(self) -> str:
+        if not self.requests:
+            return "HTTP：無請求"
+        avg_ms = self.seconds / self.requests * 1000
+        return (
+            f"HTTP：{self.requests} 次請求，新建連線 {self.connections} 條，重用 {self.reused} 次，"
+            f"平均 {avg_ms:.0f} ms/次"
+        )
+
+
+class ConnectionPool:
+    """Idle keep-alive connections per (scheme, host, port, verify)."""
+
+    def __init__(self, max_idle: int = POOL_MAX_IDLE) -> None:
+        self.max_idle = max_idle
+        self.stats = PoolStats()
+        self._idle: Dict[_PoolKey, List[http.client.HTTPConnection]] = {}
+        self._lock = threading.Lock()
+
+    # -- connections -------------------------------------------------------
+
+    def _connect(self, key: _PoolKey, timeout: float) -> http.client.HTTPConnection:
+        scheme, host, port, verify = key
+        proxy = _proxy_for(scheme, host)
+        if scheme == "https":
+            if proxy is not None:
+                conn = http.client.HTTPSConnection(proxy[0], proxy[1], timeout=timeout, context=ssl_context(verify))
+                conn.set_tunnel(host, port)
+            else:
+                conn = http.client.HTTPSConnection(host, port, timeout=timeout, context=ssl_context(verify))
+        else:
+            target_host, target_port = proxy if proxy is not None else (host, port)
+            conn = http.client.HTTPConnection(target_host, target_port, timeout=timeout)
+        with self.stats._lock:
+            self.stats.connections += 1
+        return conn
+
+    def _checkout(self, key: _PoolKey, timeout: float) -> Tuple[http.client.HTTPConnection, bool]:
+        with self._lock:
+            idle = self._idle.get(key)
+            conn = idle.pop() if idle else None
+        if conn is None:
+            return self._connect(key, timeout), False
+        conn.timeout = timeout
+        if conn.sock is not None:
+            conn.sock.settimeout(timeout)
+        return conn, True
+
+    def _checkin(self, key: _PoolKey, conn: http.client.HTTPConnection) -> None:
+        with self._lock:
+            idle = self._idle.setdefault(key, [])
+            if len(idle) < self.max_idle:
+                idle.append(conn)
+                return
+        conn.close()
+
+    def close(self) -> None:
+        with self._lock:
+            idle, self._idle = self._idle, {}
+        for conns in idle.values():
+            for conn in conns:
+                conn.close()
+
+    # -- requests ----------------------------------------------------------
+
+    def _send(
+        self, method: str, url: str, headers: Dict[str, str], data: bytes | None, timeout: float, verify: bool
+    ) -> HttpResponse:
+        parts = urllib.parse.urlsplit(url)
+        scheme = parts.scheme.lower()
+        if scheme not in {"http", "https"} or not parts.hostname:
+            raise urllib.error.URLError(f"unsupported URL: {url}")
+        port = parts.port or (443 if scheme == "https" else 80)
+        key: _PoolKey = (scheme, parts.hostname, port, verify)
+        path = urllib.parse.urlunsplit(("", "", parts.path or "/", parts.query, ""))
+        if scheme == "http" and _proxy_for(scheme, parts.hostname) is not None:
+            path = url  # plain-HTTP proxies take the absolute URL
+
+        retried = False
+        while True:
+            if retried:
+                conn, reused = self._connect(key, timeout), False
+            else:
+                conn, reused = self._checkout(key, timeout)
+            started = time.perf_counter()
+            sent = False
+            try:
+                conn.request(method, path, body=data, headers=headers)
+                sent = True
+                resp = conn.getresponse()
+                raw = resp.read()
+            except _STALE_ERRORS:
+                conn.close()
+                # The server dropped the idle connection; retry once on a fresh one, unless a
+                # non-idempotent request was fully sent and may already have been processed.
+                if not reused or (sent and method not in _IDEMPOTENT_METHODS):
+                    raise
+                retried = True
+                with self.stats._lock:
+                    self.stats.retried_stale += 1
+                continue
+            except BaseException:
+                conn.close()
+                raise
+            self.stats.record(reused=reused, seconds=time.perf_counter() - started)
+            if resp.will_close:
+                conn.close()
+            else:
+                self._checkin(key, conn)
+            body = _decode_body(raw, resp.getheader("Content-Encoding", ""))
+            return HttpResponse(url, resp.status, resp.reason, resp.headers, body)
+
+    def request(
+        self,
+        method: str,
+        url: str,
+        *,
+        headers: Mapping[str, str] | None = None,
+        data: bytes | None = None,
+        timeout: float = 20,
+        verify: bool = True,
+    ) -> HttpResponse:
+        """Send one request and return the decoded response; raises HttpError for status >= 400."""
+        merged = {"User-Agent": DEFAULT_USER_AGENT, "Accept-Encoding": "gzip, deflate"}
+        for name, value in (headers or {}).items():
+            merged[name.title() if name.islower() else name] = value
+        if data is not None:
+            merged.setdefault("Content-Length", str(len(data)))
+        for _ in range(MAX_REDIRECTS + 1):
+            resp = self._send(method.upper(), url, merged, data, timeout, verify)
+            location = resp.headers.get("Location")
+            if resp.status not in _REDIRECT_CODES or not location:
+                break
+            url = urllib.parse.urljoin(url, location)
+            if resp.status == 303 or (resp.status in {301, 302} and method.upper() == "POST"):
+                method, data = "GET", None
+                merged.pop("Content-Length", None)
+        if resp.status >= 400:
+            raise HttpError(resp.url, resp.status, resp.reason, resp.headers, resp.body)
+        return resp
+
+
+def _proxy_for(scheme: str, host: str) -> Tuple[str, int] | None:
+    proxies = _env_proxies()
+    proxy = proxies.get(scheme)
+    if not proxy or urllib.request.proxy_bypass(host):
+        return None
+    parts = urllib.parse.urlsplit(proxy if "://" in proxy else f"http://{proxy}")
+    if not parts.hostname:
+        return None
+    return parts.hostname, parts.port or 80
+
+
+@lru_cache(maxsize=1)
+def _env_proxies() -> Dict[str, str]:
+    return urllib.request.getproxies()
+
+
+_POOL = ConnectionPool()
+
+
+def request(method: str, url: str, **kwargs: Any) -> HttpResponse:
+    """`ConnectionPool.request` on the process-wide pool."""
+    return _POOL.request(method, url, **kwargs)
+
+
+def get_json(
+    url: str,
+    params: Mapping[str, Any] | None = None,
+    *,
+    headers: Mapping[str, str] | None = None,
+    timeout: float = 20,
+) -> Any:
+    """GET `url` (with `params` url-encoded, commas kept as-is) and parse the JSON body."""
+    if params:
+        url = f"{url}?{urllib.parse.urlencode(params, safe=',')}"
+    return _POOL.request("GET", url, headers=headers, timeout=timeout).json()
+
+
+def transport_summary() -> str:
+    return _POOL.stats.summary()
+
+
+def close() -> None:
+    _POOL.close()
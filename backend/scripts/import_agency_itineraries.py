@@ -6,6 +6,9 @@ This script is intentionally conservative:
 - It expects raw, structured itinerary drafts in JSON.
 - It tries to match stop names to existing place ids in backend/data/db.json.
 - Unmatched items are kept in a separate report for manual review.
+- Stops are matched within the item's `city` (or the source's
+  `context.destinationCities`) first, then neighbouring counties; island-wide
+  only exact names are accepted, so fuzzy matches never cross into a far county.
 
 Usage:
   python3 backend/scripts/import_agency_itineraries.py
@@ -29,15 +32,20 @@ from __future__ import annotations
 import json
 import os
 import re
+import heapq
 import socket
 import time
+from collections import Counter
 from dataclasses import dataclass
 from datetime import datetime
 from difflib import SequenceMatcher
 from pathlib import Path
 from typing import Any
 from urllib import error as urllib_error
-from urllib import request as urllib_request
+
+from address_canon import COUNTY_NEIGHBOURS, extract_city, neighbouring_counties, normalize_city_name
+from http_transport import request as http_request
+from tile_crawl import COUNTY_BOUNDS
 
 ROOT = Path(__file__).resolve().parents[1]
 DOTENV_PATH = ROOT.parent / ".env.local"
@@ -91,6 +99,14 @@ _PLACE_LIKE_TYPES = {
     "campus",
 }
 
+# CandidateIndex thresholds: candidates kept for the report, minimum / accepted
+# similarity, and the score given when one name contains the other.
+_MATCH_TOP_K = 5
+_EXACT_TOP_K = 3
+_MIN_MATCH_SCORE = 0.60
+_ACCEPT_MATCH_SCORE = 0.84
+_CONTAINED_SCORE = 0.96
+
 _SLOT_RANGES = (
     (0, 11, "morning"),
     (11, 14, "noon"),
@@ -105,6 +121,9 @@ class PlaceCandidate:
     place_id: str
     name: str
     normalized: str
+    city: str = ""
+    lat: float | None = None
+    lng: float | None = None
 
 
 def _load_dotenv_overrides() -> dict[str, str]:
@@ -182,17 +201,16 @@ def _fetch_remote_payload(remote_url: str, remote_token: str) -> dict[str, Any]:
     retries = _as_positive_int(_env_value("REMOTE_EXPORT_RETRIES"), 2)
     last_error: Exception | None = None
     for attempt in range(1, retries + 1):
-        request = urllib_request.Request(
-            remote_url,
-            headers={
-                "x-admin-token": remote_token,
-                "accept": "application/json",
-            },
-            method="GET",
-        )
         try:
-            with urllib_request.urlopen(request, timeout=timeout_seconds) as response:
-                payload = json.loads(response.read().decode("utf-8"))
+            payload = http_request(
+                "GET",
+                remote_url,
+                headers={
+                    "x-admin-token": remote_token,
+                    "accept": "application/json",
+                },
+                timeout=timeout_seconds,
+            ).json()
             if not isinstance(payload, dict):
                 raise ValueError("遠端匯出內容不是 object")
             return payload
@@ -244,6 +262,35 @@ def _load_places_payload() -> tuple[dict[str, Any], str]:
     return _load_json(PLACES_DB_PATH), "local"
 
 
+def _canonical_city(value: Any) -> str:
+    """Canonical county name in `value` (a city field or an address), or ""."""
+    text = str(value or "").strip()
+    if not text:
+        return ""
+    city = normalize_city_name(text)
+    if city in COUNTY_NEIGHBOURS:
+        return city
+    city = normalize_city_name(extract_city(text))
+    return city if city in COUNTY_NEIGHBOURS else ""
+
+
+def _coordinate(value: Any) -> float | None:
+    return float(value) if isinstance(value, (int, float)) and not isinstance(value, bool) else None
+
+
+def _place_city(item: dict[str, Any], lat: float | None, lng: float | None) -> str:
+    city = _canonical_city(item.get("city")) or _canonical_city(item.get("address"))
+    if city or lat is None or lng is None:
+        return city
+    # County boxes overlap along borders; only trust a point that falls in exactly one.
+    inside = [
+        county
+        for county, (south, west, north, east) in COUNTY_BOUNDS.items()
+        if south <= lat <= north and west <= lng <= east
+    ]
+    return inside[0] if len(inside) == 1 else ""
+
+
 def _load_place_candidates() -> tuple[list[PlaceCandidate], str]:
     data, source_label = _load_places_payload()
     places = data.get("places")
@@ -258,11 +305,16 @@ def _load_place_candidates() -> tuple[list[PlaceCandidate], str]:
         normalized = _normalize_name(name)
         if not place_id or not name or not normalized:
             continue
+        lat = _coordinate(item.get("lat"))
+        lng = _coordinate(item.get("lng"))
         output.append(
             PlaceCandidate(
                 place_id=place_id,
                 name=name,
                 normalized=normalized,
+                city=_place_city(item, lat, lng),
+                lat=lat,
+                lng=lng,
             )
         )
     return output, source_label
@@ -319,41 +371,193 @@ def _stay_minutes(item: dict[str, Any]) -> int | None:
     return None
 
 
-def _choose_match(name: str, candidates: list[PlaceCandidate]) -> tuple[PlaceCandidate | None, list[dict[str, Any]]]:
-    normalized = _normalize_name(name)
-    if not normalized:
-        return None, []
-
-    exact = [candidate for candidate in candidates if candidate.normalized == normalized]
-    if exact:
-        return exact[0], [
-            {"placeId": item.place_id, "name": item.name, "score": 1.0}
-            for item in exact[:3]
-        ]
-
-    scored: list[tuple[float, PlaceCandidate]] = []
-    for candidate in candidates:
-        if normalized in candidate.normalized or candidate.normalized in normalized:
-            score = 0.96 if normalized != candidate.normalized else 1.0
+class CandidateIndex:
+    """Stop-name -> place matching; indexes PlaceCandidate.normalized so a stop name is not compared with every place.
+
+    - exact: normalized name -> candidate positions, for the exact tier;
+    - bigrams: character bigram -> positions, to find names containing the stop name;
+      names contained in the stop name are found by looking up its substrings in `exact`;
+    - chars: character -> (position, count), giving each candidate's character overlap
+      with the stop name. 2 * overlap / (len(a) + len(b)) bounds SequenceMatcher.ratio()
+      from above, so candidates are scored in descending bound order and the scan stops
+      once no bound can reach the current top-k.
+
+    Candidates that share no character with the stop name score 0 and are never touched,
+    and the results are exactly those of scoring every candidate.
+    """
+
+    def __init__(self, candidates: list[PlaceCandidate]) -> None:
+        self.candidates = candidates
+        self.exact: dict[str, list[int]] = {}
+        self.bigrams: dict[str, list[int]] = {}
+        self.chars: dict[str, list[tuple[int, int]]] = {}
+        for position, candidate in enumerate(candidates):
+            normalized = candidate.normalized
+            self.exact.setdefault(normalized, []).append(position)
+            for gram in {normalized[i : i + 2] for i in range(len(normalized) - 1)}:
+                self.bigrams.setdefault(gram, []).append(position)
+            for char, count in Counter(normalized).items():
+                self.chars.setdefault(char, []).append((position, count))
+        self._cache: dict[str, tuple[PlaceCandidate | None, list[dict[str, Any]]]] = {}
+        self.scored = 0
+
+    def _containing(self, normalized: str) -> set[int]:
+        if len(normalized) == 1:
+            positions = {position for position, _ in self.chars.get(normalized, ())}
         else:
-            score = SequenceMatcher(None, normalized, candidate.normalized).ratio()
-        if score >= 0.60:
-            scored.append((score, candidate))
-    scored.sort(key=lambda item: item[0], reverse=True)
-    top = [
-        {
-            "placeId": candidate.place_id,
-            "name": candidate.name,
-            "score": round(score, 4),
-        }
-        for score, candidate in scored[:5]
-    ]
-    if not scored:
-        return None, top
-    best_score, best_candidate = scored[0]
-    if best_score < 0.84:
-        return None, top
-    return best_candidate, top
+            grams = sorted(
+                {normalized[i : i + 2] for i in range(len(normalized) - 1)},
+                key=lambda gram: len(self.bigrams.get(gram, ())),
+            )
+            positions = set(self.bigrams.get(grams[0], ()))
+            for gram in grams[1:]:
+                if not positions:
+                    break
+                positions.intersection_update(self.bigrams.get(gram, ()))
+        return {position for position in positions if normalized in self.candidates[position].normalized}
+
+    def _contained(self, normalized: str) -> set[int]:
+        found: set[int] = set()
+        for start in range(len(normalized)):
+            for end in range(start + 1, len(normalized) + 1):
+                found.update(self.exact.get(normalized[start:end], ()))
+        return found
+
+    def _rank(self, normalized: str) -> list[tuple[float, int]]:
+        """(score, position) of the top-k candidates scoring at least _MIN_MATCH_SCORE, best first."""
+        scores = dict.fromkeys(self._containing(normalized) | self._contained(normalized), _CONTAINED_SCORE)
+        overlap: dict[int, int] = {}
+        for char, wanted in Counter(normalized).items():
+            for position, count in self.chars.get(char, ()):
+                overlap[position] = overlap.get(position, 0) + min(wanted, count)
+        size = len(normalized)
+        bounds = sorted(
+            (
+                (2.0 * shared / (size + len(self.candidates[position].normalized)), position)
+                for position, shared in overlap.items()
+                if position not in scores
+            ),
+            key=lambda item: (-item[0], item[1]),
+        )
+        top = heapq.nsmallest(_MATCH_TOP_K, scores.values())  # min-heap of the best k scores
+        heapq.heapify(top)
+        for bound, position in bounds:
+            floor = max(_MIN_MATCH_SCORE, top[0]) if len(top) >= _MATCH_TOP_K else _MIN_MATCH_SCORE
+            if bound < floor:
+                break
+            self.scored += 1
+            score = SequenceMatcher(None, normalized, self.candidates[position].normalized).ratio()
+            if score < _MIN_MATCH_SCORE:
+                continue
+            scores[position] = score
+            if len(top) < _MATCH_TOP_K:
+                heapq.heappush(top, score)
+            elif score > top[0]:
+                heapq.heapreplace(top, score)
+        # Ties keep candidate order, like a stable sort over the full candidate list.
+        ranked = sorted(((score, position) for position, score in scores.items()), key=lambda item: (-item[0], item[1]))
+        return ranked[:_MATCH_TOP_K]
+
+    def choose(self, name: str) -> tuple[PlaceCandidate | None, list[dict[str, Any]]]:
+        normalized = _normalize_name(name)
+        if not normalized:
+            return None, []
+        cached = self._cache.get(normalized)
+        if cached is None:
+            cached = self._cache[normalized] = self._choose(normalized)
+        matched, top = cached
+        return matched, [dict(item) for item in top]
+
+    def _choose(self, normalized: str) -> tuple[PlaceCandidate | None, list[dict[str, Any]]]:
+        exact = [self.candidates[position] for position in self.exact.get(normalized, ())]
+        if exact:
+            return exact[0], [
+                {"placeId": item.place_id, "name": item.name, "score": 1.0}
+                for item in exact[:_EXACT_TOP_K]
+            ]
+
+        ranked = self._rank(normalized)
+        top = [
+            {
+                "placeId": self.candidates[position].place_id,
+                "name": self.candidates[position].name,
+                "score": round(score, 4),
+            }
+            for score, position in ranked
+        ]
+        if not ranked:
+            return None, top
+        best_score, best_position = ranked[0]
+        if best_score < _ACCEPT_MATCH_SCORE:
+            return None, top
+        return self.candidates[best_position], top
+
+
+class CityPartitions:
+    """A CandidateIndex per group of counties, searched from a stop's own counties outwards.
+
+    Scopes, widened only on a miss:
+      city       the item's `city`, else the source's destinationCities;
+      neighbour  those counties plus the ones bordering them;
+      island     every place, but with target counties known only an exact name
+                 is accepted here; a fuzzy hit that far away is left unmatched
+                 (its candidates still go to the report for a manual override).
+    Places without a known county are kept in every partition.
+    """
+
+    def __init__(self, candidates: list[PlaceCandidate]) -> None:
+        self.candidates = candidates
+        self.island = CandidateIndex(candidates)
+        self._indexes: dict[frozenset[str], CandidateIndex] = {}
+        self.scopes: Counter = Counter()
+        self.lookups = 0
+        self.first_scope_size = 0
+
+    def _index(self, cities: frozenset[str]) -> CandidateIndex:
+        index = self._indexes.get(cities)
+        if index is None:
+            index = CandidateIndex(
+                [candidate for candidate in self.candidates if not candidate.city or candidate.city in cities]
+            )
+            self._indexes[cities] = index
+        return index
+
+    def choose(
+        self, name: str, cities: list[str]
+    ) -> tuple[PlaceCandidate | None, list[dict[str, Any]], str]:
+        """(match, report candidates, scope) for a stop name in the given counties."""
+        targets = frozenset(city for city in cities if city)
+        scopes: list[tuple[str, CandidateIndex]] = []
+        if targets:
+            scopes.append(("city", self._index(targets)))
+            widened = targets.union(*(neighbouring_counties(city) for city in targets))
+            if widened != targets:
+                scopes.append(("neighbour", self._index(widened)))
+        scopes.append(("island", self.island))
+
+        self.lookups += 1
+        self.first_scope_size += len(scopes[0][1].candidates)
+        top: list[dict[str, Any]] = []
+        for scope, index in scopes:
+            matched, top = index.choose(name)
+            if matched is None:
+                continue
+            if scope == "island" and targets and top[0]["score"] < 1.0:
+                break
+            self.scopes[scope] += 1
+            return matched, top, scope
+        self.scopes["unmatched"] += 1
+        return None, top, "unmatched"
+
+    def summary(self) -> str:
+        indexes = [self.island, *self._indexes.values()]
+        average = self.first_scope_size / self.lookups if self.lookups else 0.0
+        return (
+            f"景點比對：{self.lookups} 次查詢，本縣市 {self.scopes['city']}／鄰近縣市 {self.scopes['neighbour']}／"
+            f"全島 {self.scopes['island']}／未對應 {self.scopes['unmatched']}；"
+            f"首輪平均搜尋 {average:.0f} 筆（全島 {len(self.candidates)} 筆），"
+            f"相似度計算 {sum(index.scored for index in indexes)} 次"
+        )
 
 
 def _normalize_context(source: dict[str, Any]) -> dict[str, Any]:
@@ -389,6 +593,7 @@ def main() -> None:
 
     candidates, places_source = _load_place_candidates()
     candidate_by_id = {candidate.place_id: candidate for candidate in candidates}
+    partitions = CityPartitions(candidates)
     overrides = _load_match_overrides()
     output_samples: list[dict[str, Any]] = []
     report_sources: list[dict[str, Any]] = []
@@ -403,6 +608,9 @@ def main() -> None:
         days = source.get("days")
         if not isinstance(days, list):
             continue
+        destination_cities = [
+            city for city in map(_canonical_city, _normalize_context(source)["destinationCities"]) if city
+        ]
 
         sample_days: list[dict[str, Any]] = []
         source_report = {
@@ -505,7 +713,10 @@ def main() -> None:
                             previous_departure = departure or arrival or previous_departure
                             continue
 
-                matched, top_candidates = _choose_match(item_name, candidates)
+                item_city = _canonical_city(item.get("city"))
+                matched, top_candidates, match_scope = partitions.choose(
+                    item_name, [item_city] if item_city else destination_cities
+                )
                 if matched is None:
                     unmatched_count += 1
                     source_report["unmatchedItems"].append(
@@ -548,6 +759,7 @@ def main() -> None:
                         "sourceName": item_name,
                         "matchedPlaceId": matched.place_id,
                         "matchedPlaceName": matched.name,
+                        "matchScope": match_scope,
                     }
                 )
                 previous_departure = departure or arrival or previous_departure
@@ -600,6 +812,7 @@ def main() -> None:
         f"{OUTPUT_PATH} (samples={len(output_samples)}, matched={matched_count}, "
         f"unmatched={unmatched_count}, skipped={skipped_count}, places_source={places_source})"
     )
+    print(partitions.summary())
 
 
 if __name__ == "__main__":
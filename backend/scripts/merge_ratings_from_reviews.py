@@ -1,36 +1,35 @@
 """
-Merge Google rating/user_ratings_total from places_with_reviews.json into db.json.
+Merge Google rating/user_ratings_total from places_with_reviews.jsonl into db.json.
 
 Usage:
   python3 backend/scripts/merge_ratings_from_reviews.py
 """
 from __future__ import annotations
 
-import json
 from pathlib import Path
 
+from place_store import iter_review_items, open_place_store, review_items_exist
+
 ROOT = Path(__file__).resolve().parents[1]
 DB_PATH = ROOT / "data" / "db.json"
-REVIEWS_PATH = ROOT / "data" / "places_with_reviews.json"
+REVIEWS_PATH = ROOT / "data" / "places_with_reviews.jsonl"
 
 
 def main() -> None:
     if not DB_PATH.exists():
         raise SystemExit(f"找不到 {DB_PATH}")
-    if not REVIEWS_PATH.exists():
-        raise SystemExit("尚未產生評論資料 places_with_reviews.json")
+    if not review_items_exist(REVIEWS_PATH):
+        raise SystemExit("尚未產生評論資料 places_with_reviews.jsonl")
 
-    db = json.loads(DB_PATH.read_text(encoding="utf-8"))
-    places = db.get("places") or []
-    reviews = json.loads(REVIEWS_PATH.read_text(encoding="utf-8"))
+    store = open_place_store(DB_PATH)
+    places = store.places
 
-    by_name = {}
-    for item in reviews:
-        if not isinstance(item, dict):
-            continue
+    # Stream the review store; only the name -> (rating, total) map is kept in memory.
+    by_name: dict[str, tuple[object, object]] = {}
+    for item in iter_review_items(REVIEWS_PATH):
         name = (item.get("source_name") or item.get("name") or "").strip()
         if name:
-            by_name[name] = item
+            by_name[name] = (item.get("rating"), item.get("user_ratings_total"))
 
     updated = 0
     for place in places:
@@ -38,15 +37,17 @@ def main() -> None:
         match = by_name.get(name)
         if not match:
             continue
-        rating = match.get("rating")
-        total = match.get("user_ratings_total")
+        rating, total = match
         if rating is None and total is None:
             continue
+        if place.get("rating") == rating and place.get("userRatingsTotal") == total:
+            continue
         place["rating"] = rating
         place["userRatingsTotal"] = total
+        store.mark_dirty(place)
         updated += 1
 
-    DB_PATH.write_text(json.dumps(db, ensure_ascii=False, indent=2), encoding="utf-8")
+    store.save()
     print(f"已回填評分：{updated} / {len(places)}")
 
 
@@ -1,31 +1,32 @@
 """
-Merge tags from places_with_reviews.json into db.json places.
+Merge tags from places_with_reviews.jsonl into db.json places.
 
 Usage:
   python3 backend/scripts/merge_tags_from_reviews.py
 """
 from __future__ import annotations
 
-import json
 from pathlib import Path
 
+from place_store import iter_review_items, open_place_store, review_items_exist
+
 ROOT = Path(__file__).resolve().parents[1]
 DB_PATH = ROOT / "data" / "db.json"
-REVIEWS_PATH = ROOT / "data" / "places_with_reviews.json"
+REVIEWS_PATH = ROOT / "data" / "places_with_reviews.jsonl"
 
 
 def main() -> None:
     if not DB_PATH.exists():
         raise SystemExit(f"找不到 {DB_PATH}")
-    if not REVIEWS_PATH.exists():
+    if not review_items_exist(REVIEWS_PATH):
         raise SystemExit(f"找不到 {REVIEWS_PATH}")
 
-    db = json.loads(DB_PATH.read_text(encoding="utf-8"))
-    places = db.get("places") or []
-    reviews = json.loads(REVIEWS_PATH.read_text(encoding="utf-8"))
+    store = open_place_store(DB_PATH)
+    places = store.places
 
+    # Stream the review store; only the name -> tags map is kept in memory.
     tag_map: dict[str, list[str]] = {}
-    for item in reviews:
+    for item in iter_review_items(REVIEWS_PATH):
         name = (item.get("source_name") or item.get("name") or "").strip()
         tags = item.get("tags")
         if not name or not isinstance(tags, list) or not tags:
@@ -40,11 +41,14 @@ def main() -> None:
         tags = tag_map[name]
         if not tags:
             continue
+        if p.get("tags") == tags and p.get("category") == tags[0]:
+            continue
         p["tags"] = tags
         p["category"] = tags[0]
+        store.mark_dirty(p)
         updated += 1
 
-    DB_PATH.write_text(json.dumps(db, ensure_ascii=False, indent=2), encoding="utf-8")
+    store.save()
     print(f"Updated tags for {updated} places -> {DB_PATH}")
 
 
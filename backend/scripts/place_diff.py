@@ -0,0 +1,93 @@
+"""
+Field-level change tracking for places written by the crawler.
+
+`diff_fields()` compares a stored place with fresh values field by field
+(plain equality, no serialization) and returns exactly what changed.
+`place_fingerprint()` is a short hash of a place's content fields; the
+crawler stores it as `fingerprint` whenever it adds or changes a place, and
+PlaceStore.save() restamps it on every changed place that carries one,
+whichever script changed it, so downstream consumers can tell whether their
+copy is current without diffing.
+
+`ChangeLog` appends one JSON line per added / updated place:
+  {"at": "...", "op": "updated", "id": "ChIJ...", "name": "...",
+   "fingerprint": "...", "changes": {"rating": [4.2, 4.3], ...}}
+
+Optional env:
+  PLACE_CHANGELOG_PATH=backend/data/place_changes.jsonl   # 設為空字串 = 不寫檔
+"""
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+from collections import Counter
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Dict, List
+
+ROOT = Path(__file__).resolve().parents[1]
+CHANGELOG_PATH = os.environ.get("PLACE_CHANGELOG_PATH", str(ROOT / "data" / "place_changes.jsonl")).strip()
+
+# Bookkeeping fields: they change on every write and say nothing about the place itself.
+VOLATILE_FIELDS = frozenset({"updatedAt", "fingerprint", "canonicalAddress"})
+
+
+def place_fingerprint(place: Dict[str, Any]) -> str:
+    content = {key: value for key, value in place.items() if key not in VOLATILE_FIELDS}
+    payload = json.dumps(content, ensure_ascii=False, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha1(payload.encode("utf-8")).hexdigest()[:16]
+
+
+def diff_fields(target: Dict[str, Any], fresh: Dict[str, Any]) -> Dict[str, tuple[Any, Any]]:
+    """Fields of `fresh` whose value differs from (or is missing in) `target`, as (old, new)."""
+    return {
+        key: (target.get(key), value)
+        for key, value in fresh.items()
+        if key not in VOLATILE_FIELDS and (key not in target or target[key] != value)
+    }
+
+
+class ChangeLog:
+    """Buffers per-place field changes and appends them to a JSONL file on flush."""
+
+    def __init__(self, path: str | Path | None = CHANGELOG_PATH) -> None:
+        self.path = Path(path) if path else None
+        self.field_counts: Counter = Counter()
+        self.ops: Counter = Counter()
+        self.written = 0
+        self._pending: List[str] = []
+
+    def record(self, op: str, place: Dict[str, Any], changes: Dict[str, tuple[Any, Any]]) -> None:
+        if not changes:
+            return
+        self.ops[op] += 1
+        self.field_counts.update(changes.keys())
+        if self.path is None:
+            return
+        entry = {
+            "at": datetime.now(timezone.utc).replace(microsecond=0).isoformat(),
+            "op": op,
+            "id": place.get("id"),
+            "name": place.get("name"),
+            "fingerprint": place.get("fingerprint"),
+            "changes": {key: [old, new] for key, (old, new) in changes.items()},
+        }
+        self._pending.append(json.dumps(entry, ensure_ascii=False, separators=(",", ":")))
+
+    def flush(self) -> None:
+        if self.path is None or not self._pending:
+            return
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with self.path.open("a", encoding="utf-8") as fh:
+            fh.write("\n".join(self._pending) + "\n")
+        self.written += len(self._pending)
+        self._pending.clear()
+
+    def summary(self) -> str:
+        if not self.field_counts:
+            return "欄位變更：無"
+        fields = "、".join(f"{name} {count}" for name, count in self.field_counts.most_common())
+        ops = "、".join(f"{op} {count}" for op, count in sorted(self.ops.items()))
+        where = f"，寫入 {self.path}（{self.written} 筆）" if self.path is not None else ""
+        return f"欄位變更（{ops}）：{fields}{where}"
@@ -0,0 +1,125 @@
+"""
+Google place_id resolution for fetch_places_with_reviews.py.
+
+Text Search costs as much as the Details call it feeds, so a place only gets
+searched when none of these already knows its place_id:
+
+  1. the name + city → place_id map at PLACE_ID_MAP_PATH, which remembers every
+     Text Search hit across runs;
+  2. the place's own `id`, when the crawler stored a Google place_id there
+     (ChIJ... / GhIJ..., or `source: google_places`);
+  3. places_with_reviews.jsonl, by source name (skipped when one name maps to
+     several place_ids).
+
+When the Details call for a known id fails (Google retires place_ids now and
+then), the caller calls `forget()` and falls back to Text Search; the new hit
+goes into the map, which is checked first next time.
+
+Optional env:
+  PLACE_ID_MAP_PATH=backend/data/place_id_map.json   # 設為空字串 = 不寫檔
+"""
+from __future__ import annotations
+
+import json
+import os
+from collections import Counter
+from pathlib import Path
+from typing import Any, Dict, Iterable
+
+ROOT = Path(__file__).resolve().parents[1]
+PLACE_ID_MAP_PATH = os.environ.get("PLACE_ID_MAP_PATH", str(ROOT / "data" / "place_id_map.json")).strip()
+
+GOOGLE_PLACE_ID_PREFIXES = ("ChIJ", "GhIJ")
+_SOURCE_LABELS = {
+    "map": "名稱對照",
+    "id": "既有 id",
+    "reviews": "評論檔",
+    "search": "Text Search",
+}
+
+
+def _normalize(value: str) -> str:
+    return " ".join((value or "").split()).replace("台", "臺")
+
+
+def name_key(name: str, city: str = "") -> str:
+    return f"{_normalize(name)}|{_normalize(city)}"
+
+
+def google_place_id(place: Dict[str, Any]) -> str:
+    """The place's own id when it is a Google place_id, else ""."""
+    place_id = str(place.get("id") or "").strip()
+    if place_id.startswith(GOOGLE_PLACE_ID_PREFIXES) or (place_id and place.get("source") == "google_places"):
+        return place_id
+    return ""
+
+
+class PlaceIdResolver:
+    def __init__(self, path: str | Path | None = PLACE_ID_MAP_PATH, review_items: Iterable[Dict[str, Any]] = ()) -> None:
+        self.path = Path(path) if path else None
+        self.names: Dict[str, str] = {}
+        if self.path is not None and self.path.exists():
+            raw = json.loads(self.path.read_text(encoding="utf-8"))
+            if isinstance(raw, dict):
+                self.names = {str(key): str(value) for key, value in raw.items() if value}
+        self._reviews = self._index_reviews(review_items)
+        self._dirty = False
+        self.sources: Counter = Counter()
+        self.stale = 0
+
+    @staticmethod
+    def _index_reviews(items: Iterable[Dict[str, Any]]) -> Dict[str, str]:
+        found: Dict[str, set[str]] = {}
+        for item in items:
+            if not isinstance(item, dict):
+                continue
+            name = _normalize(item.get("source_name") or item.get("name") or "")
+            place_id = str(item.get("place_id") or "").strip()
+            if name and place_id:
+                found.setdefault(name, set()).add(place_id)
+        # The reviews file has no city; a name shared by places in different cities is ambiguous.
+        return {name: next(iter(ids)) for name, ids in found.items() if len(ids) == 1}
+
+    def lookup(self, place: Dict[str, Any]) -> str:
+        """A known place_id for `place`, or "" when Text Search is needed."""
+        place_id = self.names.get(name_key(place.get("name") or "", place.get("city") or ""), "")
+        source = "map"
+        if not place_id:
+            place_id = google_place_id(place)
+            source = "id"
+        if not place_id:
+            place_id = self._reviews.get(_normalize(place.get("name") or ""), "")
+            source = "reviews"
+        if place_id:
+            self.sources[source] += 1
+        return place_id
+
+    def remember(self, place: Dict[str, Any], place_id: str) -> None:
+        """Record a Text Search hit."""
+        self.sources["search"] += 1
+        key = name_key(place.get("name") or "", place.get("city") or "")
+        if self.names.get(key) != place_id:
+            self.names[key] = place_id
+            self._dirty = True
+
+    def forget(self, place: Dict[str, Any]) -> None:
+        """Drop the stored id after its Details call failed, so it is searched again."""
+        self.stale += 1
+        key = name_key(place.get("name") or "", place.get("city") or "")
+        if self.names.pop(key, None) is not None:
+            self._dirty = True
+        self._reviews.pop(_normalize(place.get("name") or ""), None)
+
+    def save(self) -> None:
+        if self.path is None or not self._dirty:
+            return
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.path.write_text(
+            json.dumps(dict(sorted(self.names.items())), ensure_ascii=False, indent=2), encoding="utf-8"
+        )
+        self._dirty = False
+
+    def summary(self) -> str:
+        parts = "、".join(f"{label} {self.sources[source]}" for source, label in _SOURCE_LABELS.items())
+        stale = f"，失效改搜尋 {self.stale}" if self.stale else ""
+        return f"place_id 來源：{parts}{stale}"
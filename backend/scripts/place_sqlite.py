@@ -0,0 +1,369 @@
+"""
+SQLite storage mode for places and reviews, with a JSON import/export layer.
+
+The scripts keep working on plain dicts; this module only changes where they
+are persisted. Each place keeps its full JSON payload (so exports reproduce the
+exact db.json / training_places_export.json shape the Dart server reads) next
+to indexed columns for id, normalized name and city, plus tag / subtag /
+attribute tables for filtering.
+
+Enable it for the pipeline scripts with:
+  PLACE_STORE_BACKEND=sqlite
+  PLACES_SQLITE_PATH=backend/data/places.sqlite3   # optional
+
+Usage:
+  python3 backend/scripts/place_sqlite.py import            # db.json + places_with_reviews.jsonl -> sqlite
+  python3 backend/scripts/place_sqlite.py import --places backend/data/training_places_export.json
+  python3 backend/scripts/place_sqlite.py export            # sqlite -> db.json (keeps users) + places_with_reviews.jsonl
+  python3 backend/scripts/place_sqlite.py export --format training --out backend/data/training_places_export.json
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import sqlite3
+from pathlib import Path
+from typing import Any, Dict, Hashable, Iterable, Iterator, List
+
+from place_store import PLACES_SQLITE_PATH, MergeKeyFn, PlaceDict, PlaceStore, review_items_exist
+from review_store import read_review_items, write_review_items
+
+ROOT = Path(__file__).resolve().parents[1]
+DB_PATH = ROOT / "data" / "db.json"
+REVIEWS_PATH = ROOT / "data" / "places_with_reviews.jsonl"
+TRAINING_EXPORT_PATH = ROOT / "data" / "training_places_export.json"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS places (
+  position INTEGER PRIMARY KEY,
+  id TEXT NOT NULL DEFAULT '',
+  name TEXT NOT NULL DEFAULT '',
+  normalized_name TEXT NOT NULL DEFAULT '',
+  city TEXT NOT NULL DEFAULT '',
+  address TEXT NOT NULL DEFAULT '',
+  lat REAL,
+  lng REAL,
+  payload TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_places_id ON places(id);
+CREATE INDEX IF NOT EXISTS idx_places_normalized_name ON places(normalized_name);
+CREATE INDEX IF NOT EXISTS idx_places_city ON places(city);
+
+CREATE TABLE IF NOT EXISTS place_tags (
+  position INTEGER NOT NULL REFERENCES places(position) ON DELETE CASCADE,
+  tag TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_place_tags_position ON place_tags(position);
+CREATE INDEX IF NOT EXISTS idx_place_tags_tag ON place_tags(tag);
+
+CREATE TABLE IF NOT EXISTS place_subtags (
+  position INTEGER NOT NULL REFERENCES places(position) ON DELETE CASCADE,
+  subtag TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_place_subtags_position ON place_subtags(position);
+CREATE INDEX IF NOT EXISTS idx_place_subtags_subtag ON place_subtags(subtag);
+
+CREATE TABLE IF NOT EXISTS place_attributes (
+  position INTEGER NOT NULL REFERENCES places(position) ON DELETE CASCADE,
+  attribute TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_place_attributes_position ON place_attributes(position);
+CREATE INDEX IF NOT EXISTS idx_place_attributes_attribute ON place_attributes(attribute);
+
+CREATE TABLE IF NOT EXISTS reviews (
+  position INTEGER PRIMARY KEY,
+  place_id TEXT NOT NULL DEFAULT '',
+  source_name TEXT NOT NULL DEFAULT '',
+  payload TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_reviews_place_id ON reviews(place_id);
+CREATE INDEX IF NOT EXISTS idx_reviews_source_name ON reviews(source_name);
+"""
+
+_LABEL_TABLES = (
+    ("place_tags", "tag", "tags"),
+    ("place_subtags", "subtag", "subtags"),
+    ("place_attributes", "attribute", "attributes"),
+)
+
+
+def _normalize_name(value: str) -> str:
+    # Same normalization as fetch_places_from_google._normalize_name (first merge-key element).
+    return " ".join((value or "").strip().split()).lower()
+
+
+def _as_float(value: Any) -> float | None:
+    try:
+        return float(value) if value is not None else None
+    except (TypeError, ValueError):
+        return None
+
+
+def _label_list(value: Any) -> list[str]:
+    if isinstance(value, list):
+        return [str(item).strip() for item in value if str(item).strip()]
+    return []
+
+
+def connect(path: Path) -> sqlite3.Connection:
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    conn = sqlite3.connect(str(path), timeout=30)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.execute("PRAGMA foreign_keys=ON")
+    conn.executescript(SCHEMA)
+    return conn
+
+
+def _write_place_row(conn: sqlite3.Connection, position: int, place: PlaceDict) -> None:
+    conn.execute(
+        """
+        INSERT INTO places (position, id, name, normalized_name, city, address, lat, lng, payload)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+        ON CONFLICT(position) DO UPDATE SET
+          id=excluded.id, name=excluded.name, normalized_name=excluded.normalized_name,
+          city=excluded.city, address=excluded.address, lat=excluded.lat, lng=excluded.lng,
+          payload=excluded.payload
+        """,
+        (
+            position,
+            str(place.get("id") or "").strip(),
+            str(place.get("name") or ""),
+            _normalize_name(str(place.get("name") or "")),
+            str(place.get("city") or "").strip(),
+            str(place.get("address") or ""),
+            _as_float(place.get("lat")),
+            _as_float(place.get("lng")),
+            json.dumps(place, ensure_ascii=False),
+        ),
+    )
+    for table, column, field in _LABEL_TABLES:
+        conn.execute(f"DELETE FROM {table} WHERE position = ?", (position,))
+        conn.executemany(
+            f"INSERT INTO {table} (position, {column}) VALUES (?, ?)",
+            [(position, label) for label in _label_list(place.get(field))],
+        )
+
+
+class SqlitePlaceStore(PlaceStore):
+    """SQLite-backed PlaceStore.
+
+    Loads all places, or only one city's rows when `city` is given; id and
+    merge-key lookups that miss a partial load fall back to indexed queries.
+    `save()` writes only dirty rows in a single transaction.
+    """
+
+    def __init__(
+        self,
+        conn: sqlite3.Connection,
+        path: Path,
+        *,
+        merge_key: MergeKeyFn | None = None,
+        city: str | None = None,
+    ) -> None:
+        self.conn = conn
+        self._partial = bool((city or "").strip())
+        if self._partial:
+            rows = conn.execute(
+                "SELECT position, payload FROM places WHERE city = ? ORDER BY position",
+                ((city or "").strip(),),
+            ).fetchall()
+        else:
+            rows = conn.execute("SELECT position, payload FROM places ORDER BY position").fetchall()
+        self._positions: List[int] = [position for position, _ in rows]
+        places = [json.loads(payload) for _, payload in rows]
+        super().__init__(path, {"places": places}, merge_key=merge_key)
+        self._structure_changed = False
+
+    @classmethod
+    def open(
+        cls,
+        path: Path,
+        *,
+        merge_key: MergeKeyFn | None = None,
+        city: str | None = None,
+    ) -> "SqlitePlaceStore":
+        return cls(connect(path), path, merge_key=merge_key, city=city)
+
+    def _adopt(self, position: int, payload: str) -> PlaceDict:
+        place = json.loads(payload)
+        slot = len(self.places)
+        self.places.append(place)
+        self._spans.append(None)
+        self._positions.append(position)
+        self._slot_by_obj[id(place)] = slot
+        self._index(slot, place)
+        return place
+
+    def get_by_id(self, place_id: str) -> PlaceDict | None:
+        place_id = (place_id or "").strip()
+        hit = self.by_id.get(place_id)
+        if hit is not None or not self._partial or not place_id:
+            return hit
+        row = self.conn.execute(
+            "SELECT position, payload FROM places WHERE id = ? ORDER BY position LIMIT 1",
+            (place_id,),
+        ).fetchone()
+        return self._adopt(*row) if row is not None else None
+
+    def get_by_merge_key(self, key: Hashable) -> PlaceDict | None:
+        hit = super().get_by_merge_key(key)
+        if hit is not None or not self._partial:
+            return hit
+        name = key[0] if isinstance(key, tuple) and key else key
+        if not name:
+            return None
+        loaded = set(self._positions)
+        rows = self.conn.execute(
+            "SELECT position, payload FROM places WHERE normalized_name = ? ORDER BY position",
+            (str(name),),
+        ).fetchall()
+        for position, payload in rows:
+            if position in loaded:
+                continue
+            place = self._adopt(position, payload)
+            if self._merge_key(place) == key:
+                return place
+        return None
+
+    def add(self, place: PlaceDict) -> PlaceDict:
+        self._positions.append(-1)
+        return super().add(place)
+
+    def replace_all(self, places: Iterable[PlaceDict]) -> None:
+        super().replace_all(places)
+        self._positions = [-1] * len(self.places)
+
+    def save(self, path: Path | None = None, *, force: bool = False) -> bool:
+        if path is not None and Path(path) != self.path:
+            raise ValueError("SqlitePlaceStore 只能寫回原本的資料庫，請改用 place_sqlite.py export")
+        if not self.is_dirty and not force:
+            return False
+        self._stamp_dirty()
+        with self.conn:
+            if self._structure_changed:
+                self.conn.execute("DELETE FROM places")
+            next_position = self.conn.execute(
+                "SELECT COALESCE(MAX(position), -1) + 1 FROM places"
+            ).fetchone()[0]
+            for slot in sorted(self._dirty):
+                position = self._positions[slot]
+                if position < 0:
+                    position = next_position
+                    next_position += 1
+                    self._positions[slot] = position
+                _write_place_row(self.conn, position, self.places[slot])
+        self._dirty.clear()
+        self._structure_changed = False
+        return True
+
+
+# -- reviews ---------------------------------------------------------------
+
+
+def iter_review_items(conn: sqlite3.Connection) -> Iterator[Dict[str, Any]]:
+    for (payload,) in conn.execute("SELECT payload FROM reviews ORDER BY position"):
+        yield json.loads(payload)
+
+
+def load_review_items(conn: sqlite3.Connection) -> list[Dict[str, Any]]:
+    return list(iter_review_items(conn))
+
+
+def save_review_items(conn: sqlite3.Connection, items: list[Dict[str, Any]]) -> int:
+    """Replace the review list, touching only rows whose payload changed."""
+    existing = dict(conn.execute("SELECT position, payload FROM reviews"))
+    written = 0
+    with conn:
+        for position, item in enumerate(items):
+            payload = json.dumps(item, ensure_ascii=False)
+            if existing.get(position) == payload:
+                continue
+            conn.execute(
+                """
+                INSERT INTO reviews (position, place_id, source_name, payload) VALUES (?, ?, ?, ?)
+                ON CONFLICT(position) DO UPDATE SET
+                  place_id=excluded.place_id, source_name=excluded.source_name, payload=excluded.payload
+                """,
+                (
+                    position,
+                    str(item.get("place_id") or "").strip(),
+                    str(item.get("source_name") or item.get("name") or "").strip(),
+                    payload,
+                ),
+            )
+            written += 1
+        conn.execute("DELETE FROM reviews WHERE position >= ?", (len(items),))
+    return written
+
+
+# -- import / export -------------------------------------------------------
+
+
+def import_json(sqlite_path: Path, places_path: Path | None, reviews_path: Path | None) -> None:
+    conn = connect(sqlite_path)
+    if places_path is not None and places_path.exists():
+        data = json.loads(places_path.read_text(encoding="utf-8"))
+        places = data.get("places") if isinstance(data, dict) else None
+        if not isinstance(places, list):
+            raise SystemExit(f"{places_path} 缺少 places 陣列")
+        store = SqlitePlaceStore(conn, sqlite_path)
+        store.replace_all(place for place in places if isinstance(place, dict))
+        store.save()
+        print(f"已匯入景點 {len(store)} 筆：{places_path} -> {sqlite_path}")
+    if reviews_path is not None and review_items_exist(reviews_path):
+        items = list(read_review_items(reviews_path))
+        save_review_items(conn, items)
+        print(f"已匯入評論 {len(items)} 筆：{reviews_path} -> {sqlite_path}")
+    conn.close()
+
+
+def export_json(sqlite_path: Path, fmt: str, out_path: Path) -> None:
+    conn = connect(sqlite_path)
+    if fmt == "reviews":
+        items = load_review_items(conn)
+        write_review_items(out_path, items)
+        print(f"已匯出評論 {len(items)} 筆 -> {out_path}")
+        conn.close()
+        return
+
+    places = [json.loads(payload) for (payload,) in conn.execute("SELECT payload FROM places ORDER BY position")]
+    conn.close()
+    if fmt == "training":
+        # Same compact layout as the server's jsonEncode() export.
+        text = json.dumps({"places": places}, ensure_ascii=False, separators=(",", ":"))
+    else:
+        db: Dict[str, Any] = {}
+        if out_path.exists():
+            db = json.loads(out_path.read_text(encoding="utf-8"))
+        db.setdefault("users", [])
+        db["places"] = places
+        text = json.dumps(db, ensure_ascii=False, indent=2) + "\n"
+    out_path.write_text(text, encoding="utf-8")
+    print(f"已匯出景點 {len(places)} 筆 ({fmt}) -> {out_path}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="SQLite 景點／評論資料庫匯入匯出")
+    parser.add_argument("action", choices=["import", "export"])
+    parser.add_argument("--sqlite", type=Path, default=PLACES_SQLITE_PATH)
+    parser.add_argument("--places", type=Path, default=DB_PATH, help="import 用的 places JSON")
+    parser.add_argument("--reviews", type=Path, default=REVIEWS_PATH, help="import 用的評論檔（.jsonl 或 JSON 陣列）")
+    parser.add_argument("--format", choices=["db", "training", "reviews", "all"], default="all")
+    parser.add_argument("--out", type=Path, help="export 輸出路徑（--format all 時忽略）")
+    args = parser.parse_args()
+
+    if args.action == "import":
+        import_json(args.sqlite, args.places, args.reviews)
+        return
+    if args.format == "all":
+        export_json(args.sqlite, "db", DB_PATH)
+        export_json(args.sqlite, "reviews", REVIEWS_PATH)
+        return
+    default_out = {"db": DB_PATH, "training": TRAINING_EXPORT_PATH, "reviews": REVIEWS_PATH}[args.format]
+    export_json(args.sqlite, args.format, args.out or default_out)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,384 @@
+"""
+Shared place store for the scripts in backend/scripts.
+
+Loads db.json (or any `{"places": [...]}` export such as
+training_places_export.json) once, keeps indexes by id, merge key and city,
+and tracks which places were touched so `save()` only re-serializes changed
+records. Untouched places are written back from their original JSON text.
+A changed place that carries a `fingerprint` (place_diff.py) is restamped as
+it is saved, whichever script changed it, so a stored fingerprint is never stale.
+
+Usage:
+  from place_store import PlaceStore
+
+  store = PlaceStore.load(DB_PATH)
+  place = store.get_by_id("ChIJ...")
+  place["rating"] = 4.5
+  store.mark_dirty(place)
+  store.save()
+
+Optional env:
+  PLACE_STORE_BACKEND=json|sqlite   # sqlite: see place_sqlite.py
+  PLACES_SQLITE_PATH=backend/data/places.sqlite3
+"""
+from __future__ import annotations
+
+import json
+import os
+import re
+from pathlib import Path
+from typing import Any, Callable, Dict, Hashable, Iterable, Iterator, List
+
+from place_diff import place_fingerprint
+
+PlaceDict = Dict[str, Any]
+MergeKeyFn = Callable[[PlaceDict], Hashable]
+
+ROOT = Path(__file__).resolve().parents[1]
+PLACE_STORE_BACKEND = os.environ.get("PLACE_STORE_BACKEND", "json").strip().lower()
+PLACES_SQLITE_PATH = Path(
+    os.environ.get("PLACES_SQLITE_PATH", str(ROOT / "data" / "places.sqlite3"))
+)
+
+_DECODER = json.JSONDecoder()
+_WHITESPACE = re.compile(r"[ \t\n\r]*")
+_PLACES_KEY = "places"
+_PLACE_INDENT = "    "
+_VALUE_INDENT = "  "
+
+
+def _skip_ws(text: str, idx: int) -> int:
+    return _WHITESPACE.match(text, idx).end()
+
+
+def _indent_tail(text: str, prefix: str) -> str:
+    # json.dumps escapes newlines inside strings, so every raw newline is structural.
+    return text.replace("\n", "\n" + prefix)
+
+
+def _decode_places_array(text: str, idx: int) -> tuple[list[Any], list[str], int]:
+    items: list[Any] = []
+    spans: list[str] = []
+    idx = _skip_ws(text, idx + 1)
+    if text[idx] == "]":
+        return items, spans, idx + 1
+    while True:
+        value, end = _DECODER.raw_decode(text, idx)
+        items.append(value)
+        spans.append(text[idx:end])
+        idx = _skip_ws(text, end)
+        if text[idx] == ",":
+            idx = _skip_ws(text, idx + 1)
+            continue
+        if text[idx] == "]":
+            return items, spans, idx + 1
+        raise ValueError(f"places 陣列格式錯誤 (offset {idx})")
+
+
+def _decode_document(text: str) -> tuple[Dict[str, Any], list[str] | None]:
+    """Parse a db.json document, keeping the raw text of each place record."""
+    idx = _skip_ws(text, 0)
+    if not text.startswith("{", idx):
+        raise ValueError("JSON 根節點必須是 object")
+    data: Dict[str, Any] = {}
+    spans: list[str] | None = None
+    idx = _skip_ws(text, idx + 1)
+    if text.startswith("}", idx):
+        return data, spans
+    while True:
+        key, idx = _DECODER.raw_decode(text, idx)
+        idx = _skip_ws(text, idx)
+        if not text.startswith(":", idx):
+            raise ValueError(f"JSON object 格式錯誤 (offset {idx})")
+        idx = _skip_ws(text, idx + 1)
+        if key == _PLACES_KEY and text.startswith("[", idx):
+            value, spans, idx = _decode_places_array(text, idx)
+        else:
+            value, idx = _DECODER.raw_decode(text, idx)
+        data[key] = value
+        idx = _skip_ws(text, idx)
+        if text.startswith(",", idx):
+            idx = _skip_ws(text, idx + 1)
+            continue
+        if text.startswith("}", idx):
+            return data, spans
+        raise ValueError(f"JSON object 格式錯誤 (offset {idx})")
+
+
+def _city_key(place: PlaceDict) -> str:
+    return str(place.get("city") or "").strip()
+
+
+def _has_merge_name(key: Hashable) -> bool:
+    if isinstance(key, tuple) and key:
+        return bool(key[0])
+    return bool(key)
+
+
+class PlaceStore:
+    """In-memory view over a places document with indexes and dirty tracking.
+
+    Callers mutate the place dicts in place and call `mark_dirty(place)`
+    afterwards; that re-indexes the place and schedules it for serialization.
+    """
+
+    def __init__(
+        self,
+        path: Path,
+        data: Dict[str, Any],
+        spans: list[str] | None = None,
+        *,
+        merge_key: MergeKeyFn | None = None,
+    ) -> None:
+        self.path = Path(path)
+        self.data = data
+        places = data.get(_PLACES_KEY)
+        if not isinstance(places, list):
+            places = []
+            spans = None
+        self.places: List[Any] = places
+        self._spans: list[str | None] = list(spans) if spans is not None else [None] * len(places)
+        self._slot_by_obj: dict[int, int] = {}
+        self._dirty: set[int] = set()
+        self._structure_changed = spans is None
+        self._merge_key = merge_key
+        self._keys_by_slot: dict[int, tuple[Any, Any, Any]] = {}
+        self.by_id: dict[str, PlaceDict] = {}
+        self.by_merge_key: dict[Hashable, PlaceDict] = {}
+        self.by_city: dict[str, list[PlaceDict]] = {}
+        self._reindex_all()
+
+    @classmethod
+    def load(cls, path: Path, *, merge_key: MergeKeyFn | None = None) -> "PlaceStore":
+        path = Path(path)
+        text = path.read_text(encoding="utf-8")
+        data, spans = _decode_document(text)
+        return cls(path, data, spans, merge_key=merge_key)
+
+    # -- indexes ---------------------------------------------------------
+
+    def _reindex_all(self) -> None:
+        self._slot_by_obj.clear()
+        self._keys_by_slot.clear()
+        self.by_id.clear()
+        self.by_merge_key.clear()
+        self.by_city.clear()
+        for slot, place in enumerate(self.places):
+            self._slot_by_obj[id(place)] = slot
+            if isinstance(place, dict):
+                self._index(slot, place)
+
+    def _keys_for(self, place: PlaceDict) -> tuple[Any, Any, Any]:
+        place_id = str(place.get("id") or "").strip()
+        merge_key = self._merge_key(place) if self._merge_key else None
+        return place_id, merge_key, _city_key(place)
+
+    def _index(self, slot: int, place: PlaceDict, keys: tuple[Any, Any, Any] | None = None) -> None:
+        place_id, merge_key, city = keys or self._keys_for(place)
+        if place_id:
+            self.by_id[place_id] = place
+        if merge_key is not None and _has_merge_name(merge_key):
+            self.by_merge_key[merge_key] = place
+        self.by_city.setdefault(city, []).append(place)
+        self._keys_by_slot[slot] = (place_id, merge_key, city)
+
+    def _unindex(self, slot: int, place: PlaceDict) -> None:
+        keys = self._keys_by_slot.pop(slot, None)
+        if keys is None:
+            return
+        place_id, merge_key, city = keys
+        if place_id and self.by_id.get(place_id) is place:
+            del self.by_id[place_id]
+        if merge_key is not None and self.by_merge_key.get(merge_key) is place:
+            del self.by_merge_key[merge_key]
+        bucket = self.by_city.get(city)
+        if bucket is not None:
+            bucket[:] = [item for item in bucket if item is not place]
+            if not bucket:
+                del self.by_city[city]
+
+    def get_by_id(self, place_id: str) -> PlaceDict | None:
+        return self.by_id.get((place_id or "").strip())
+
+    def get_by_merge_key(self, key: Hashable) -> PlaceDict | None:
+        if self._merge_key is None:
+            raise RuntimeError("PlaceStore 未設定 merge_key，無法以 merge key 查詢")
+        return self.by_merge_key.get(key)
+
+    def in_city(self, city: str) -> list[PlaceDict]:
+        return list(self.by_city.get((city or "").strip(), []))
+
+    def __iter__(self) -> Iterator[Any]:
+        return iter(self.places)
+
+    def __len__(self) -> int:
+        return len(self.places)
+
+    # -- mutation --------------------------------------------------------
+
+    def mark_dirty(self, place: PlaceDict) -> None:
+        slot = self._slot_by_obj.get(id(place))
+        if slot is None or self.places[slot] is not place:
+            raise KeyError("place 不屬於此 PlaceStore，請改用 add()")
+        keys = self._keys_for(place)
+        if keys != self._keys_by_slot.get(slot):
+            self._unindex(slot, place)
+            self._index(slot, place, keys)
+        self._dirty.add(slot)
+
+    def add(self, place: PlaceDict) -> PlaceDict:
+        slot = len(self.places)
+        self.places.append(place)
+        self._spans.append(None)
+        self._slot_by_obj[id(place)] = slot
+        self._index(slot, place)
+        self._dirty.add(slot)
+        return place
+
+    def replace_all(self, places: Iterable[PlaceDict]) -> None:
+        self.places[:] = list(places)
+        self._spans = [None] * len(self.places)
+        self._dirty = set(range(len(self.places)))
+        self._structure_changed = True
+        self._reindex_all()
+
+    @property
+    def dirty_count(self) -> int:
+        return len(self._dirty)
+
+    @property
+    def is_dirty(self) -> bool:
+        return self._structure_changed or bool(self._dirty)
+
+    # -- persistence -----------------------------------------------------
+
+    def _stamp_dirty(self) -> None:
+        for slot in self._dirty:
+            place = self.places[slot]
+            if isinstance(place, dict) and "fingerprint" in place:
+                place["fingerprint"] = place_fingerprint(place)
+
+    def _place_chunk(self, slot: int) -> str:
+        span = self._spans[slot]
+        if span is not None and slot not in self._dirty:
+            return span
+        text = json.dumps(self.places[slot], ensure_ascii=False, indent=2)
+        return _indent_tail(text, _PLACE_INDENT)
+
+    def _render(self, chunks: list[str]) -> str:
+        entries: list[str] = []
+        items = dict(self.data)
+        items[_PLACES_KEY] = self.places
+        for key, value in items.items():
+            if key == _PLACES_KEY:
+                if chunks:
+                    body = (
+                        "[\n" + _PLACE_INDENT
+                        + (",\n" + _PLACE_INDENT).join(chunks)
+                        + "\n" + _VALUE_INDENT + "]"
+                    )
+                else:
+                    body = "[]"
+            else:
+                body = _indent_tail(json.dumps(value, ensure_ascii=False, indent=2), _VALUE_INDENT)
+            entries.append(f"{_VALUE_INDENT}{json.dumps(key, ensure_ascii=False)}: {body}")
+        if not entries:
+            return "{}\n"
+        return "{\n" + ",\n".join(entries) + "\n}\n"
+
+    def save(self, path: Path | None = None, *, force: bool = False) -> bool:
+        """Write the document if anything changed; returns whether it was written."""
+        target = Path(path) if path is not None else self.path
+        if not force and not self.is_dirty and target == self.path:
+            return False
+        self._stamp_dirty()
+        chunks = [self._place_chunk(slot) for slot in range(len(self.places))]
+        text = self._render(chunks)
+        tmp_path = target.with_name(target.name + ".tmp")
+        tmp_path.write_text(text, encoding="utf-8")
+        os.replace(tmp_path, target)
+        if target == self.path:
+            self._spans = list(chunks)
+            self._dirty.clear()
+            self._structure_changed = False
+        return True
+
+
+
+def _use_sqlite() -> bool:
+    return PLACE_STORE_BACKEND == "sqlite"
+
+
+def open_place_store(
+    path: Path,
+    *,
+    merge_key: MergeKeyFn | None = None,
+    city: str | None = None,
+) -> PlaceStore:
+    """Open the configured place store; `city` lets the SQLite mode load one city only."""
+    if _use_sqlite():
+        from place_sqlite import SqlitePlaceStore
+
+        return SqlitePlaceStore.open(PLACES_SQLITE_PATH, merge_key=merge_key, city=city)
+    if not Path(path).exists():
+        return PlaceStore(path, {}, merge_key=merge_key)
+    return PlaceStore.load(path, merge_key=merge_key)
+
+
+def review_items_exist(path: Path) -> bool:
+    path = Path(path)
+    return _use_sqlite() or path.exists() or (path.suffix == ".jsonl" and path.with_suffix(".json").exists())
+
+
+def iter_review_items(path: Path) -> Iterator[Dict[str, Any]]:
+    """Stream review items from places_with_reviews.jsonl / .json (or the SQLite reviews table)."""
+    if _use_sqlite():
+        from place_sqlite import connect, iter_review_items as iter_sqlite_reviews
+
+        conn = connect(PLACES_SQLITE_PATH)
+        try:
+            yield from iter_sqlite_reviews(conn)
+        finally:
+            conn.close()
+        return
+    from review_store import read_review_items
+
+    yield from read_review_items(path)
+
+
+def load_review_items(path: Path) -> list[Dict[str, Any]]:
+    """Read all review items into a list; prefer `iter_review_items` for one pass."""
+    return [item for item in iter_review_items(path) if isinstance(item, dict)]
+
+
+def save_review_items(path: Path, items: list[Dict[str, Any]]) -> None:
+    """Replace every stored review item."""
+    if _use_sqlite():
+        from place_sqlite import connect, save_review_items as save_sqlite_reviews
+
+        conn = connect(PLACES_SQLITE_PATH)
+        try:
+            save_sqlite_reviews(conn, items)
+        finally:
+            conn.close()
+        return
+    from review_store import write_review_items
+
+    write_review_items(path, items)
+
+
+def append_review_items(path: Path, items: list[Dict[str, Any]]) -> None:
+    """Add freshly fetched items; each replaces a stored item with the same place_id or source_name.
+
+    A .jsonl store only appends lines; the JSON array and SQLite backends are rewritten.
+    """
+    if not items:
+        return
+    if not _use_sqlite() and Path(path).suffix == ".jsonl":
+        from review_store import ReviewStore
+
+        ReviewStore.open(path).append(items)
+        return
+    from review_store import merge_review_items
+
+    save_review_items(path, merge_review_items(load_review_items(path), items))
@@ -0,0 +1,291 @@
+"""
+Persistent Google Places quota ledger shared by every script that calls the API.
+
+MAX_REQUESTS only limits one process and is forgotten at exit. The ledger is a
+SQLite file that all callers (fetch_places_from_google.py, crawl_shards.py
+shards, fetch_places_with_reviews.py) write to:
+
+  - every paid request is counted by quota day, script and endpoint;
+  - the daily / monthly budgets live in the file (or come from env), and a
+    request that would exceed them raises `QuotaExhausted` (a BudgetExhausted,
+    so the crawlers stop the same way as when MAX_REQUESTS runs out);
+  - a token bucket row limits the combined QPS of all processes.
+
+Writes use `BEGIN IMMEDIATE`, so concurrent processes serialize on SQLite's
+file lock and never double-spend the last requests of a day. Quota days follow
+Google's reset at midnight Pacific time.
+
+Usage (report / settings):
+  python3 backend/scripts/quota_ledger.py               # 今日與本月用量（依腳本、端點）
+  python3 backend/scripts/quota_ledger.py --days 7
+  python3 backend/scripts/quota_ledger.py --set-daily 900 --set-monthly 20000   # 0 = 不限
+
+Optional env:
+  GOOGLE_QUOTA_LEDGER=backend/data/google_quota.sqlite3   # 設為 off 停用
+  GOOGLE_DAILY_QUOTA=900      # 覆寫 ledger 內的每日上限
+  GOOGLE_MONTHLY_QUOTA=20000  # 覆寫 ledger 內的每月上限
+  GOOGLE_GLOBAL_QPS=10        # 所有行程合計的每秒請求上限，0 = 不限
+  GOOGLE_QUOTA_WAIT=0         # 額度用完時最多等待幾秒（等其他行程或跨日），0 = 立即停止
+  GOOGLE_QUOTA_TIMEZONE=America/Los_Angeles
+  GOOGLE_QUOTA_SCRIPT=...     # 用量報表中的腳本名稱（預設為呼叫的腳本）
+"""
+from __future__ import annotations
+
+import argparse
+import os
+import sqlite3
+import sys
+import threading
+import time
+from datetime import date, datetime, timedelta, timezone
+from pathlib import Path
+from typing import Any, Dict, List, Tuple
+
+from google_places_client import BudgetExhausted
+
+ROOT = Path(__file__).resolve().parents[1]
+_LEDGER_SETTING = os.environ.get("GOOGLE_QUOTA_LEDGER", "").strip()
+LEDGER_PATH = (
+    None
+    if _LEDGER_SETTING.lower() in {"off", "0", "none"}
+    else Path(_LEDGER_SETTING or str(ROOT / "data" / "google_quota.sqlite3"))
+)
+GLOBAL_QPS = float(os.environ.get("GOOGLE_GLOBAL_QPS", "10") or 0)
+QUOTA_WAIT = float(os.environ.get("GOOGLE_QUOTA_WAIT", "0") or 0)
+QUOTA_TIMEZONE = os.environ.get("GOOGLE_QUOTA_TIMEZONE", "America/Los_Angeles").strip()
+# How often a caller waiting for quota re-checks the ledger.
+_WAIT_POLL_SECONDS = 5.0
+
+
+def _env_limit(name: str) -> int | None:
+    raw = os.environ.get(name, "").strip()
+    return max(0, int(raw)) if raw else None
+
+
+def _quota_tz() -> Any:
+    try:
+        from zoneinfo import ZoneInfo
+
+        return ZoneInfo(QUOTA_TIMEZONE)
+    except Exception:  # zoneinfo / tzdata missing, or an unknown zone name
+        return timezone.utc
+
+
+class QuotaExhausted(BudgetExhausted):
+    """The shared daily or monthly quota is used up."""
+
+
+class QuotaLedger:
+    """Cross-process request ledger; thread-safe within a process."""
+
+    def __init__(self, path: Path, *, script: str, qps: float = GLOBAL_QPS, wait: float = QUOTA_WAIT) -> None:
+        self.path = Path(path)
+        self.script = script
+        self.qps = float(qps)
+        self.wait = max(0.0, float(wait))
+        self.recorded = 0
+        self._tz = _quota_tz()
+        self._lock = threading.Lock()
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        # isolation_level=None: transactions are opened explicitly with BEGIN IMMEDIATE.
+        self._conn = sqlite3.connect(str(self.path), timeout=30, isolation_level=None, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS usage (
+                day TEXT NOT NULL,
+                script TEXT NOT NULL,
+                endpoint TEXT NOT NULL,
+                requests INTEGER NOT NULL,
+                PRIMARY KEY (day, script, endpoint)
+            );
+            CREATE TABLE IF NOT EXISTS settings (
+                name TEXT PRIMARY KEY,
+                value INTEGER NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS bucket (
+                name TEXT PRIMARY KEY,
+                tokens REAL NOT NULL,
+                updated REAL NOT NULL
+            );
+            """
+        )
+
+    @classmethod
+    def open(cls, script: str, path: Path | None = LEDGER_PATH) -> "QuotaLedger | None":
+        """The shared ledger, or None when GOOGLE_QUOTA_LEDGER=off."""
+        script = os.environ.get("GOOGLE_QUOTA_SCRIPT", "").strip() or script
+        return cls(path, script=script) if path is not None else None
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+    # -- quota -------------------------------------------------------------
+
+    def today(self) -> date:
+        return datetime.now(self._tz).date()
+
+    def limits(self) -> Tuple[int | None, int | None]:
+        """(daily, monthly); env overrides the stored settings, 0 / unset = unlimited."""
+        with self._lock:
+            stored = dict(self._conn.execute("SELECT name, value FROM settings"))
+        daily = _env_limit("GOOGLE_DAILY_QUOTA")
+        monthly = _env_limit("GOOGLE_MONTHLY_QUOTA")
+        daily = stored.get("daily") if daily is None else daily
+        monthly = stored.get("monthly") if monthly is None else monthly
+        return daily or None, monthly or None
+
+    def set_limits(self, *, daily: int | None = None, monthly: int | None = None) -> None:
+        with self._lock:
+            for name, value in (("daily", daily), ("monthly", monthly)):
+                if value is not None:
+                    self._conn.execute(
+                        "INSERT INTO settings (name, value) VALUES (?, ?) "
+                        "ON CONFLICT(name) DO UPDATE SET value = excluded.value",
+                        (name, max(0, int(value))),
+                    )
+
+    def _used(self, day: date) -> Tuple[int, int]:
+        month_start = day.replace(day=1).isoformat()
+        day_used = self._conn.execute(
+            "SELECT COALESCE(SUM(requests), 0) FROM usage WHERE day = ?", (day.isoformat(),)
+        ).fetchone()[0]
+        month_used = self._conn.execute(
+            "SELECT COALESCE(SUM(requests), 0) FROM usage WHERE day >= ? AND day <= ?",
+            (month_start, day.isoformat()),
+        ).fetchone()[0]
+        return int(day_used), int(month_used)
+
+    def _try_reserve(self, endpoint: str) -> str:
+        """Record one request if the quota allows it; returns "" on success, else the reason."""
+        day = self.today()
+        daily, monthly = self.limits()
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                day_used, month_used = self._used(day)
+                if daily is not None and day_used >= daily:
+                    reason = f"今日額度已用完（{day_used}/{daily}）"
+                elif monthly is not None and month_used >= monthly:
+                    reason = f"本月額度已用完（{month_used}/{monthly}）"
+                else:
+                    reason = ""
+                    self._conn.execute(
+                        "INSERT INTO usage (day, script, endpoint, requests) VALUES (?, ?, ?, 1) "
+                        "ON CONFLICT(day, script, endpoint) DO UPDATE SET requests = requests + 1",
+                        (day.isoformat(), self.script, endpoint),
+                    )
+                    self.recorded += 1
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+        return reason
+
+    def reserve(self, endpoint: str) -> None:
+        """Count one paid request against the shared quota, waiting up to GOOGLE_QUOTA_WAIT seconds."""
+        deadline = time.monotonic() + self.wait
+        while True:
+            reason = self._try_reserve(endpoint)
+            if not reason:
+                return
+            if time.monotonic() >= deadline:
+                raise QuotaExhausted(f"{reason}，停止以避免超額（見 quota_ledger.py）")
+            time.sleep(min(_WAIT_POLL_SECONDS, max(0.0, deadline - time.monotonic())))
+
+    # -- rate limit --------------------------------------------------------
+
+    def throttle(self) -> None:
+        """Take one token from the bucket shared by all processes; blocks until one is free."""
+        if self.qps <= 0:
+            return
+        capacity = max(1.0, self.qps)
+        while True:
+            with self._lock:
+                self._conn.execute("BEGIN IMMEDIATE")
+                try:
+                    now = time.time()
+                    row = self._conn.execute("SELECT tokens, updated FROM bucket WHERE name = 'places'").fetchone()
+                    tokens, updated = row if row is not None else (capacity, now)
+                    tokens = min(capacity, tokens + max(0.0, now - updated) * self.qps)
+                    acquired = tokens >= 1
+                    if acquired:
+                        tokens -= 1
+                    self._conn.execute(
+                        "INSERT INTO bucket (name, tokens, updated) VALUES ('places', ?, ?) "
+                        "ON CONFLICT(name) DO UPDATE SET tokens = excluded.tokens, updated = excluded.updated",
+                        (tokens, now),
+                    )
+                    self._conn.execute("COMMIT")
+                except BaseException:
+                    self._conn.execute("ROLLBACK")
+                    raise
+            if acquired:
+                return
+            time.sleep((1 - tokens) / self.qps)
+
+    # -- reporting ---------------------------------------------------------
+
+    def usage(self, since: str) -> List[Tuple[str, str, str, int]]:
+        """(day, script, endpoint, requests) rows from ISO day `since` on."""
+        with self._lock:
+            return list(
+                self._conn.execute(
+                    "SELECT day, script, endpoint, requests FROM usage WHERE day >= ? ORDER BY day, script, endpoint",
+                    (since,),
+                )
+            )
+
+    def summary(self) -> str:
+        daily, monthly = self.limits()
+        with self._lock:
+            day_used, month_used = self._used(self.today())
+        return (
+            f"共用額度：本次記錄 {self.recorded} 次，今日 {day_used}/{daily or '不限'}，"
+            f"本月 {month_used}/{monthly or '不限'}"
+        )
+
+    def report(self, days: int = 1) -> List[str]:
+        today = self.today()
+        window_start = (today - timedelta(days=max(1, days) - 1)).isoformat()
+        month_start = today.replace(day=1).isoformat()
+        lines = [self.summary()]
+        per_day: Dict[str, Dict[str, int]] = {}
+        month_scripts: Dict[str, int] = {}
+        for day, script, endpoint, count in self.usage(min(window_start, month_start)):
+            if day >= window_start:
+                per_day.setdefault(day, {})[f"{script}/{endpoint}"] = count
+            if day >= month_start:
+                month_scripts[script] = month_scripts.get(script, 0) + count
+        for day, counts in sorted(per_day.items()):
+            detail = "、".join(f"{name} {count}" for name, count in sorted(counts.items()))
+            lines.append(f"  {day}：{sum(counts.values())} 次（{detail}）")
+        if month_scripts:
+            lines.append("  本月依腳本：" + "、".join(f"{name} {count}" for name, count in sorted(month_scripts.items())))
+        return lines
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Google Places 共用額度：用量報表與上限設定")
+    parser.add_argument("--days", type=int, default=1, help="列出最近幾天的每日用量")
+    parser.add_argument("--set-daily", type=int, default=None, help="寫入每日上限（0 = 不限）")
+    parser.add_argument("--set-monthly", type=int, default=None, help="寫入每月上限（0 = 不限）")
+    args = parser.parse_args()
+
+    ledger = QuotaLedger.open("quota_ledger")
+    if ledger is None:
+        sys.exit("GOOGLE_QUOTA_LEDGER=off，未啟用共用額度")
+    try:
+        if args.set_daily is not None or args.set_monthly is not None:
+            ledger.set_limits(daily=args.set_daily, monthly=args.set_monthly)
+        print(f"額度檔 {ledger.path}（配額日以 {QUOTA_TIMEZONE} 計）")
+        for line in ledger.report(args.days):
+            print(line)
+    finally:
+        ledger.close()
+
+
+if __name__ == "__main__":
+    main()
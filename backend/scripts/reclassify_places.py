@@ -3,252 +3,87 @@
 
 Usage:
   python3 backend/scripts/reclassify_places.py
+  PLACES_DB_PATH=backend/data/training_places_export.json python3 backend/scripts/reclassify_places.py
 
 Optional env:
   PLACES_DB_PATH=backend/data/db.json
   RECLASSIFY_CITY=臺中市
   RECLASSIFY_MODE=replace|merge   # default: replace
+  RECLASSIFY_INCREMENTAL=1        # only re-evaluate places whose fingerprint changed
+  RECLASSIFY_STATE_PATH=backend/data/reclassify_state.json
+  RECLASSIFY_WORKERS=4            # 分類使用的行程數（預設依 CPU 數與景點數自動決定）
+  RECLASSIFY_CHUNK_SIZE=500       # 每個工作批次的景點數
+  RECLASSIFY_RULES_PATH=backend/data/classification_rules.json
 
 This script recalculates tags from existing place text, with a finer-grained
 tag layer mixed into the main `tags` list so current app logic stays compatible.
 It also writes `subtags` / `attributes` into db.json for offline training use.
+The keywords, fine -> broad mappings and attribute rules live in
+classification_rules.json (see classification_rules.py).
+Only places whose tags / subtags / attributes actually change get a new
+`updatedAt` and are written back.
+
+Incremental mode keeps a fingerprint per place in RECLASSIFY_STATE_PATH: a hash
+of the fields `_classify_place` reads (name, city, address, description, tags,
+source), the mode, and RULESET_VERSION, a hash of the rule file. A place
+whose fingerprint matches the stored one is skipped. A rule change alters
+RULESET_VERSION, so every place is re-evaluated once, but only those whose
+result differs are re-stamped.
+
+PLACES_DB_PATH can point at any places file (db.json, the training export);
+with PLACE_STORE_BACKEND=sqlite and RECLASSIFY_CITY only that city is loaded
+from the store. Large selections are split into chunks classified in a
+process pool (the keyword tables are compiled once per worker, at import) and
+the results are applied in the original order; throughput and per-worker
+timings are printed at the end. By default the pool uses every CPU, but only
+when the selection is large enough to repay starting it (the run says so when
+it is skipped); an explicit RECLASSIFY_WORKERS is always used.
 """
 
 from __future__ import annotations
 
+import hashlib
 import json
+import multiprocessing
 import os
 import re
+import time
 import unicodedata
-from copy import deepcopy
+from concurrent.futures import ProcessPoolExecutor
 from datetime import datetime, timezone
 from pathlib import Path
 from typing import Any
 
+from classification_rules import RULES_PATH, CompiledRules, load_rules
+from place_store import open_place_store
+
 
 ROOT = Path(__file__).resolve().parents[1]
 DB_PATH = Path(os.getenv("PLACES_DB_PATH", ROOT / "data" / "db.json")).resolve()
 RECLASSIFY_CITY = os.getenv("RECLASSIFY_CITY", "").strip()
 RECLASSIFY_MODE = os.getenv("RECLASSIFY_MODE", "replace").strip().lower()
-
-
-BROAD_KEYWORDS: list[tuple[str, str]] = [
-    ("觀光工廠", "creative_park"),
-    ("工廠", "creative_park"),
-    ("酒廠", "creative_park"),
-    ("文創", "creative_park"),
-    ("園區", "creative_park"),
-    ("夜市", "night_market"),
-    ("商圈", "department_store"),
-    ("水族館", "aquarium"),
-    ("海生館", "aquarium"),
-    ("博物館", "museum"),
-    ("美術館", "museum"),
-    ("文化館", "museum"),
-    ("展覽館", "museum"),
-    ("歌劇院", "concert_hall"),
-    ("劇院", "concert_hall"),
-    ("音樂廳", "concert_hall"),
-    ("演藝", "concert_hall"),
-    ("藝文中心", "concert_hall"),
-    ("電影院", "cinema"),
-    ("影城", "cinema"),
-    ("遊樂園", "amusement"),
-    ("主題樂園", "amusement"),
-    ("動物園", "zoo"),
-    ("野生動物", "zoo"),
-    ("咖啡", "cafe"),
-    ("餐廳", "restaurant"),
-    ("美食", "restaurant"),
-    ("餐飲", "restaurant"),
-    ("小吃", "street_food"),
-    ("路邊攤", "street_food"),
-    ("小吃街", "street_food"),
-    ("百貨", "department_store"),
-    ("商場", "department_store"),
-    ("購物", "department_store"),
-    ("手作", "handcraft_shop"),
-    ("工藝", "handcraft_shop"),
-    ("陶藝", "handcraft_shop"),
-    ("金工", "handcraft_shop"),
-    ("銀飾", "handcraft_shop"),
-    ("銀黏土", "handcraft_shop"),
-    ("農場", "farm"),
-    ("牧場", "farm"),
-    ("休閒農場", "farm"),
-    ("露營", "camping"),
-    ("野營", "camping"),
-    ("自行車", "bike"),
-    ("腳踏車", "bike"),
-    ("單車", "bike"),
-    ("水上活動", "water_sport"),
-    ("潛水", "water_sport"),
-    ("戲水", "water_sport"),
-    ("衝浪", "water_sport"),
-    ("划船", "water_sport"),
-    ("球場", "ball_sport"),
-    ("球類", "ball_sport"),
-    ("溫泉", "hot_spring"),
-    ("湯屋", "hot_spring"),
-    ("瀑布", "waterfall"),
-    ("海灘", "beach"),
-    ("沙灘", "beach"),
-    ("海水浴場", "beach"),
-    ("海岸", "beach"),
-    ("湖", "lake_river"),
-    ("河", "lake_river"),
-    ("溪", "lake_river"),
-    ("潟湖", "lake_river"),
-    ("水庫", "lake_river"),
-    ("古厝", "heritage"),
-    ("古蹟", "heritage"),
-    ("老街", "heritage"),
-    ("歷史建築", "heritage"),
-    ("文史", "heritage"),
-    ("砲台", "heritage"),
-    ("城堡", "heritage"),
-    ("城門", "heritage"),
-    ("城牆", "heritage"),
-    ("故居", "heritage"),
-    ("紀念館", "heritage"),
-    ("自然", "national_park"),
-    ("生態", "national_park"),
-    ("山", "national_park"),
-    ("步道", "national_park"),
-    ("森林", "national_park"),
-    ("森林遊樂區", "national_park"),
-    ("風景區", "national_park"),
-    ("濕地", "national_park"),
-    ("宗教", "temple"),
-    ("廟", "temple"),
-    ("寺", "temple"),
-    ("宮", "temple"),
-]
-
-FINE_KEYWORDS: list[tuple[str, str]] = [
-    ("大學", "campus"),
-    ("校園", "campus"),
-    ("教堂", "church_landmark"),
-    ("路思義", "church_landmark"),
-    ("觀景台", "viewpoint"),
-    ("展望台", "viewpoint"),
-    ("觀景平台", "viewpoint"),
-    ("夕陽", "sunset_spot"),
-    ("日落", "sunset_spot"),
-    ("濕地", "wetland"),
-    ("老街", "old_street"),
-    ("古厝", "traditional_settlement"),
-    ("聚落", "traditional_settlement"),
-    ("眷村", "traditional_settlement"),
-    ("古宅", "historic_building"),
-    ("古蹟", "historic_building"),
-    ("歷史建築", "historic_building"),
-    ("故居", "memorial_site"),
-    ("紀念館", "memorial_site"),
-    ("紀念園區", "memorial_site"),
-    ("砲台", "fort_site"),
-    ("古堡", "fort_site"),
-    ("城門", "fort_site"),
-    ("城牆", "fort_site"),
-    ("文創", "cultural_district"),
-    ("藝術村", "cultural_district"),
-    ("文化園區", "cultural_district"),
-    ("創意園區", "cultural_district"),
-    ("糖廠", "industrial_heritage"),
-    ("酒廠", "industrial_heritage"),
-    ("鐵道", "industrial_heritage"),
-    ("車站", "industrial_heritage"),
-    ("鐘樓", "landmark_architecture"),
-    ("建築", "landmark_architecture"),
-    ("商圈", "business_district"),
-    ("百貨", "shopping_mall"),
-    ("購物中心", "shopping_mall"),
-    ("購物廣場", "shopping_mall"),
-    ("outlet", "outlet"),
-    ("mall", "shopping_mall"),
-    ("植物園", "botanical_garden"),
-    ("市場", "market"),
-    ("夜市", "market"),
-    ("漁市", "market"),
-    ("彩繪", "street_art"),
-    ("河濱", "riverside"),
-    ("廊道", "riverside"),
-    ("溪", "riverside"),
-    ("森林", "forest"),
-    ("林場", "forest"),
-    ("山", "mountain"),
-    ("步道", "trail"),
-    ("鐵馬道", "bike_trail"),
-    ("自行車道", "bike_trail"),
-    ("藥局", "lifestyle_store"),
-    ("歌劇院", "theater"),
-    ("劇院", "theater"),
-    ("美術館", "art_museum"),
-    ("科學博物館", "science_museum"),
-    ("科博館", "science_museum"),
-    ("歷史博物館", "history_museum"),
-    ("文物館", "history_museum"),
-    ("鐵道館", "railway_museum"),
-    ("探索館", "interactive_museum"),
-    ("體驗館", "interactive_museum"),
-    ("博物館", "exhibition_space"),
-    ("甜點", "dessert_shop"),
-    ("冰淇淋", "dessert_shop"),
-    ("蛋糕", "dessert_shop"),
-    ("早午餐", "brunch"),
-    ("茶坊", "tea_house"),
-    ("茶屋", "tea_house"),
-    ("茶館", "tea_house"),
-    ("火鍋", "hotpot"),
-    ("燒肉", "bbq_restaurant"),
-    ("夜食", "night_food"),
-    ("宵夜", "night_food"),
-    ("小吃", "local_food"),
-    ("麵", "local_food"),
-    ("肉圓", "local_food"),
-]
-
-FINE_TO_BROAD: dict[str, set[str]] = {
-    "campus": {"heritage", "national_park"},
-    "church_landmark": {"heritage"},
-    "viewpoint": {"national_park"},
-    "sunset_spot": {"national_park", "beach", "lake_river"},
-    "wetland": {"national_park", "lake_river"},
-    "old_street": {"heritage", "street_food"},
-    "traditional_settlement": {"heritage"},
-    "historic_building": {"heritage"},
-    "memorial_site": {"heritage"},
-    "fort_site": {"heritage"},
-    "cultural_district": {"heritage", "creative_park"},
-    "industrial_heritage": {"heritage", "creative_park"},
-    "landmark_architecture": {"heritage"},
-    "business_district": {"department_store", "street_food"},
-    "shopping_mall": {"department_store"},
-    "outlet": {"department_store"},
-    "botanical_garden": {"national_park"},
-    "market": {"street_food"},
-    "street_art": {"creative_park", "heritage"},
-    "riverside": {"lake_river", "national_park"},
-    "forest": {"national_park"},
-    "mountain": {"national_park"},
-    "trail": {"national_park"},
-    "bike_trail": {"bike", "national_park"},
-    "lifestyle_store": set(),
-    "theater": {"concert_hall"},
-    "art_museum": {"museum"},
-    "science_museum": {"museum"},
-    "history_museum": {"museum", "heritage"},
-    "railway_museum": {"museum", "heritage"},
-    "interactive_museum": {"museum"},
-    "exhibition_space": {"museum"},
-    "dessert_shop": {"cafe", "restaurant"},
-    "brunch": {"cafe", "restaurant"},
-    "tea_house": {"cafe"},
-    "hotpot": {"restaurant"},
-    "bbq_restaurant": {"restaurant"},
-    "night_food": {"restaurant", "street_food", "night_market"},
-    "local_food": {"restaurant", "street_food"},
-}
+RECLASSIFY_INCREMENTAL = os.getenv("RECLASSIFY_INCREMENTAL", "").strip().lower() in {"1", "true", "yes"}
+RECLASSIFY_STATE_PATH = Path(
+    os.getenv("RECLASSIFY_STATE_PATH", ROOT / "data" / "reclassify_state.json")
+).resolve()
+
+# 0 = auto: one worker per CPU when the pool pays off, see _pool_pays_off.
+RECLASSIFY_WORKERS = max(0, int(os.getenv("RECLASSIFY_WORKERS", "0") or 0))
+RECLASSIFY_CHUNK_SIZE = max(1, int(os.getenv("RECLASSIFY_CHUNK_SIZE", "500") or 500))
+
+# Measured with CPython 3.11 on Linux: classifying a place takes ~25 us, sending it to a
+# worker and the result back ~8 us, and starting the pool ~6 ms with fork or ~140 ms with
+# spawn (each worker imports this module and compiles the rules). With fork, 4 workers
+# break even at about 560 places and 2 workers at about 1300.
+_CLASSIFY_SECONDS = 25e-6
+_TRANSFER_SECONDS = 8e-6
+_POOL_START_SECONDS = 0.006 if multiprocessing.get_all_start_methods()[0] == "fork" else 0.14
+# The only fields _classify_place reads; workers are sent just these.
+_CLASSIFY_FIELDS = ("name", "city", "address", "description", "tags", "source")
+
+# Bump when the logic in _classify_place changes; the rule file itself is hashed
+# into RULESET_VERSION.
+CLASSIFIER_REVISION = 1
 
 
 def _normalize_text(text: str) -> str:
@@ -262,87 +97,59 @@ def _utc_now_iso() -> str:
     return datetime.now(timezone.utc).replace(microsecond=0).isoformat()
 
 
-def _load_db(path: Path) -> dict[str, Any]:
-    return json.loads(path.read_text(encoding="utf-8"))
+# Compiled once per process (each pool worker compiles its own copy at import).
+RULES = load_rules(RULES_PATH)
+CLASSIFIER = CompiledRules(RULES, normalize=_normalize_text)
+BROAD_KEYWORDS: list[tuple[str, str]] = list(RULES.broad_keywords)
+FINE_KEYWORDS: list[tuple[str, str]] = list(RULES.fine_keywords)
 
 
-def _save_db(path: Path, data: dict[str, Any]) -> None:
-    path.write_text(
-        json.dumps(data, ensure_ascii=False, indent=2) + "\n",
-        encoding="utf-8",
-    )
+def _ruleset_version() -> str:
+    payload = json.dumps({"revision": CLASSIFIER_REVISION, "rules": RULES.digest})
+    return hashlib.sha1(payload.encode("utf-8")).hexdigest()[:16]
+
+
+RULESET_VERSION = _ruleset_version()
+
+
+def _place_key(place: dict[str, Any]) -> str:
+    place_id = str(place.get("id") or "").strip()
+    return place_id or f"{place.get('name', '')}|{place.get('city', '')}"
 
 
-def _derive_attributes(tags: set[str], subtags: set[str], text: str) -> list[str]:
-    attrs: set[str] = set()
-    indoor_tags = {
-        "museum",
-        "cinema",
-        "aquarium",
-        "department_store",
-        "restaurant",
-        "cafe",
-        "concert_hall",
-    }
-    outdoor_tags = {
-        "national_park",
-        "beach",
-        "waterfall",
-        "lake_river",
-        "bike",
-        "camping",
-        "farm",
-        "hot_spring",
-    }
-    if tags & indoor_tags:
-        attrs.add("indoor")
-        attrs.add("rainy_day_ok")
-    if tags & outdoor_tags or subtags & {"viewpoint", "wetland", "riverside", "trail"}:
-        attrs.add("outdoor")
-    if tags & {"zoo", "aquarium", "farm", "amusement"}:
-        attrs.add("family_friendly")
-        attrs.add("kid_friendly")
-    if tags & {"cafe", "restaurant", "beach", "waterfall"} or subtags & {
-        "viewpoint",
-        "campus",
-        "church_landmark",
-        "dessert_shop",
-        "sunset_spot",
-    }:
-        attrs.add("couple_friendly")
-    if tags & {"heritage", "museum", "creative_park"} or subtags & {
-        "viewpoint",
-        "old_street",
-        "street_art",
-        "campus",
-        "historic_building",
-        "landmark_architecture",
-        "cultural_district",
-    }:
-        attrs.add("photo_spot")
-    if tags & {"night_market", "cinema", "restaurant", "cafe"}:
-        attrs.add("night_activity")
-    if subtags & {"old_street", "business_district", "market", "campus", "cultural_district", "shopping_mall"}:
-        attrs.add("walkable")
-    if subtags & {"historic_building", "church_landmark", "landmark_architecture", "fort_site"}:
-        attrs.add("architecture_viewing")
-        attrs.add("short_stay_ok")
-    if subtags & {"old_street", "market", "night_food", "local_food"}:
-        attrs.add("street_food_nearby")
-    if subtags & {"business_district", "shopping_mall", "outlet"}:
-        attrs.add("shopping_nearby")
-    if subtags & {"sunset_spot", "viewpoint", "wetland", "beach"}:
-        attrs.add("sunset_best")
-        attrs.add("rain_sensitive")
-    if subtags & {"trail", "bike_trail", "mountain", "forest", "wetland"}:
-        attrs.add("high_walking_load")
-    if subtags & {"botanical_garden", "shopping_mall", "market", "cultural_district", "interactive_museum"}:
-        attrs.add("half_day_candidate")
-    if subtags & {"campus", "old_street", "botanical_garden", "market"}:
-        attrs.add("elder_friendly")
-    if "預約" in text or "reservation" in text:
-        attrs.add("requires_reservation")
-    return sorted(attrs)
+def _fingerprint(place: dict[str, Any], mode: str) -> str:
+    """Hash of everything _classify_place reads from `place`, plus the mode and ruleset."""
+    inputs = [
+        place.get("name", ""),
+        place.get("city", ""),
+        place.get("address", ""),
+        place.get("description", ""),
+        [str(tag) for tag in (place.get("tags") or [])],
+        str(place.get("source", "")),
+        mode,
+        RULESET_VERSION,
+    ]
+    payload = json.dumps(inputs, ensure_ascii=False)
+    return hashlib.sha1(payload.encode("utf-8")).hexdigest()[:16]
+
+
+def _load_state(path: Path) -> dict[str, str]:
+    if not path.exists():
+        return {}
+    try:
+        raw = json.loads(path.read_text(encoding="utf-8"))
+    except ValueError:
+        return {}
+    places = raw.get("places") if isinstance(raw, dict) else None
+    return {str(key): str(value) for key, value in places.items()} if isinstance(places, dict) else {}
+
+
+def _save_state(path: Path, fingerprints: dict[str, str]) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    state = {"rulesetVersion": RULESET_VERSION, "places": dict(sorted(fingerprints.items()))}
+    tmp_path = path.with_name(path.name + ".tmp")
+    tmp_path.write_text(json.dumps(state, ensure_ascii=False, indent=2), encoding="utf-8")
+    os.replace(tmp_path, path)
 
 
 def _classify_place(place: dict[str, Any]) -> tuple[list[str], list[str], list[str]]:
@@ -356,94 +163,146 @@ def _classify_place(place: dict[str, Any]) -> tuple[list[str], list[str], list[s
         ]
     )
     text = _normalize_text(raw_text)
-    broad_tags: set[str] = set()
-    fine_tags: set[str] = set()
+    broad, fine, signals = CLASSIFIER.match(text)
+    combined = [tag for tag in CLASSIFIER.tags(broad | fine) if tag != "other"]
+    combined_mask = broad | fine
     source = str(place.get("source", "")).strip()
-    existing_tags = {
-        _normalize_text(str(tag))
-        for tag in (place.get("tags") or [])
-        if str(tag).strip()
-    }
-    explicit_heritage_keywords = {
-        _normalize_text(keyword)
-        for keyword in (
-            "老街",
-            "古蹟",
-            "古厝",
-            "歷史建築",
-            "故事館",
-            "故事屋",
-            "紀念館",
-            "故居",
-            "遺址",
-            "砲台",
-            "古堡",
-            "城門",
-            "城牆",
-            "鐵道",
-            "糖廠",
-            "碾米廠",
-            "車站古蹟",
-            "文化資產",
-            "文史",
-        )
-    }
-    craft_keywords = {
-        _normalize_text(keyword)
-        for keyword in (
-            "手作",
-            "diy",
-            "工藝",
-            "工坊",
-            "金工",
-            "銀飾",
-            "銀黏土",
-            "陶藝",
-            "體驗課",
-            "體驗教學",
-        )
-    }
-    has_explicit_heritage = any(keyword in text for keyword in explicit_heritage_keywords)
-    has_craft_signal = any(keyword in text for keyword in craft_keywords)
-
-    for keyword, tag in BROAD_KEYWORDS:
-        if _normalize_text(keyword) in text:
-            broad_tags.add(tag)
-
-    for keyword, fine_tag in FINE_KEYWORDS:
-        if _normalize_text(keyword) in text:
-            fine_tags.add(fine_tag)
-            broad_tags.update(FINE_TO_BROAD.get(fine_tag, set()))
-
-    if has_craft_signal:
-        broad_tags.add("handcraft_shop")
-        broad_tags.add("creative_park")
-    if has_craft_signal and not has_explicit_heritage:
-        broad_tags.discard("heritage")
-    if not broad_tags and existing_tags and source != "google_place_discovery":
-        broad_tags.update(existing_tags)
-
-    combined = sorted(tag for tag in (broad_tags | fine_tags) if tag and tag != "other")
-    if not combined:
-        combined = sorted(existing_tags) or ["other"]
-    subtags = sorted(fine_tags)
-    attributes = _derive_attributes(set(combined), set(subtags), text)
+    if not broad or not combined:
+        existing_tags = {
+            _normalize_text(str(tag))
+            for tag in (place.get("tags") or [])
+            if str(tag).strip()
+        }
+        if not broad and existing_tags and source != "google_place_discovery":
+            combined = sorted(tag for tag in {*combined, *existing_tags} if tag and tag != "other")
+        if not combined:
+            combined = sorted(existing_tags) or ["other"]
+        combined_mask = CLASSIFIER.tag_mask(combined)
+    subtags = CLASSIFIER.tags(fine)
+    attributes = CLASSIFIER.attributes(CLASSIFIER.derive(combined_mask, fine, signals))
     return combined, subtags, attributes
 
 
+Classification = tuple[list[str], list[str], list[str]]
+
+
+def _classify_chunk(chunk: list[dict[str, Any]]) -> tuple[list[Classification], int, float]:
+    # Runs in a worker process; returns the results with the worker pid and CPU time.
+    started = time.process_time()
+    results = [_classify_place(place) for place in chunk]
+    return results, os.getpid(), time.process_time() - started
+
+
+class ClassifyStats:
+    def __init__(self) -> None:
+        self.places = 0
+        self.seconds = 0.0
+        self.workers = 1
+        self.note = ""  # why the pool was skipped or sized down
+        self.per_worker: dict[int, list[float]] = {}  # pid -> [chunks, places, cpu seconds]
+
+    def record(self, pid: int, places: int, seconds: float) -> None:
+        entry = self.per_worker.setdefault(pid, [0, 0, 0.0])
+        entry[0] += 1
+        entry[1] += places
+        entry[2] += seconds
+
+    def lines(self) -> list[str]:
+        rate = self.places / self.seconds if self.seconds > 0 else 0.0
+        lines = [
+            f"Classified {self.places} places in {self.seconds:.2f}s "
+            f"({rate:.0f} places/s, workers={self.workers})"
+        ]
+        if self.note:
+            lines.append(f"  {self.note}")
+        for pid, (chunks, places, seconds) in sorted(self.per_worker.items()):
+            lines.append(
+                f"  worker {pid}: {int(chunks)} chunks, {int(places)} places, {seconds:.2f}s cpu"
+            )
+        return lines
+
+
+def _pool_pays_off(count: int, workers: int) -> bool:
+    saved = count * (_CLASSIFY_SECONDS * (1 - 1 / workers) - _TRANSFER_SECONDS)
+    return saved > _POOL_START_SECONDS
+
+
+def classify_places(
+    places: list[dict[str, Any]],
+    workers: int = RECLASSIFY_WORKERS,
+    chunk_size: int = RECLASSIFY_CHUNK_SIZE,
+) -> tuple[list[Classification], ClassifyStats]:
+    """`_classify_place` for every place, in order; large inputs fan out to a process pool.
+
+    `workers=0` picks one worker per CPU if the pool pays off for this many places.
+    """
+    stats = ClassifyStats()
+    started = time.perf_counter()
+    chunk_count = max(1, -(-len(places) // chunk_size))
+    if workers > 0:
+        if workers > chunk_count:
+            stats.note = f"workers capped at {chunk_count}: only {chunk_count} chunks of {chunk_size} places"
+        workers = min(workers, chunk_count)
+    else:
+        cpus = os.cpu_count() or 1
+        workers = min(cpus, chunk_count)
+        if cpus > 1 and (workers <= 1 or not _pool_pays_off(len(places), workers)):
+            stats.note = (
+                f"process pool skipped: {len(places)} places are too few to repay starting workers "
+                "(set RECLASSIFY_WORKERS to force it)"
+            )
+            workers = 1
+    if workers <= 1:
+        cpu_started = time.process_time()
+        results = [_classify_place(place) for place in places]
+        stats.record(os.getpid(), len(places), time.process_time() - cpu_started)
+    else:
+        slim = [{field: place[field] for field in _CLASSIFY_FIELDS if field in place} for place in places]
+        chunks = [slim[i : i + chunk_size] for i in range(0, len(slim), chunk_size)]
+        results = []
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            for chunk_results, pid, seconds in pool.map(_classify_chunk, chunks):
+                results.extend(chunk_results)
+                stats.record(pid, len(chunk_results), seconds)
+    stats.places = len(places)
+    stats.workers = workers
+    stats.seconds = time.perf_counter() - started
+    return results, stats
+
+
+def _apply_classification(
+    place: dict[str, Any], tags: list[str], subtags: list[str], attributes: list[str]
+) -> bool:
+    """Write the result into `place`; True when tags, subtags or attributes changed."""
+    before = (place.get("tags"), place.get("subtags"), place.get("attributes"))
+    place["tags"] = tags
+    if subtags:
+        place["subtags"] = subtags
+    else:
+        place.pop("subtags", None)
+    if attributes:
+        place["attributes"] = attributes
+    else:
+        place.pop("attributes", None)
+    return (place.get("tags"), place.get("subtags"), place.get("attributes")) != before
+
+
 def main() -> None:
     if RECLASSIFY_MODE not in {"replace", "merge"}:
         raise SystemExit("RECLASSIFY_MODE must be replace or merge")
-    data = _load_db(DB_PATH)
-    places = data.get("places")
-    if not isinstance(places, list):
+    store = open_place_store(DB_PATH, city=RECLASSIFY_CITY)
+    if not isinstance(store.data.get("places"), list):
         raise SystemExit("db.json missing places array")
+    places = store.in_city(RECLASSIFY_CITY) if RECLASSIFY_CITY else store.places
+
+    fingerprints = _load_state(RECLASSIFY_STATE_PATH) if RECLASSIFY_INCREMENTAL else {}
 
-    processed = 0
     changed = 0
+    skipped = 0
     with_subtags = 0
     with_attributes = 0
     city_filtered = 0
+    selected: list[tuple[str, dict[str, Any]]] = []
 
     for place in places:
         if not isinstance(place, dict):
@@ -452,41 +311,49 @@ def main() -> None:
         if RECLASSIFY_CITY and city != RECLASSIFY_CITY:
             continue
         city_filtered += 1
-        processed += 1
-        before = deepcopy(place)
+        key = _place_key(place)
+        if RECLASSIFY_INCREMENTAL and fingerprints.get(key) == _fingerprint(place, RECLASSIFY_MODE):
+            skipped += 1
+            continue
+        selected.append((key, place))
+
+    results, stats = classify_places([place for _, place in selected])
+    processed = len(selected)
+
+    for (key, place), (new_tags, subtags, attributes) in zip(selected, results):
         existing_tags = [
             str(tag).strip()
             for tag in (place.get("tags") or [])
             if str(tag).strip()
         ]
-        new_tags, subtags, attributes = _classify_place(place)
         if RECLASSIFY_MODE == "merge":
             merged_tags = sorted({*existing_tags, *new_tags})
         else:
             merged_tags = new_tags
-        place["tags"] = merged_tags
-        if subtags:
-            place["subtags"] = subtags
-            with_subtags += 1
-        else:
-            place.pop("subtags", None)
-        if attributes:
-            place["attributes"] = attributes
-            with_attributes += 1
-        else:
-            place.pop("attributes", None)
-        place["updatedAt"] = _utc_now_iso()
-        if place != before:
+        with_subtags += bool(subtags)
+        with_attributes += bool(attributes)
+        if _apply_classification(place, merged_tags, subtags, attributes):
+            place["updatedAt"] = _utc_now_iso()
             changed += 1
-
-    _save_db(DB_PATH, data)
+            store.mark_dirty(place)
+        if RECLASSIFY_INCREMENTAL:
+            # Fingerprint the result, so the next run skips the place until its text or the rules change.
+            fingerprints[key] = _fingerprint(place, RECLASSIFY_MODE)
+
+    store.save()
+    if RECLASSIFY_INCREMENTAL:
+        _save_state(RECLASSIFY_STATE_PATH, fingerprints)
     scope = RECLASSIFY_CITY or "all"
+    incremental = f", unchanged_skipped={skipped}, ruleset={RULESET_VERSION}" if RECLASSIFY_INCREMENTAL else ""
     print(
         f"Reclassified {processed} places (scope={scope}, mode={RECLASSIFY_MODE}, "
-        f"changed={changed}, subtags={with_subtags}, attributes={with_attributes}, "
-        f"path={DB_PATH})"
+        f"changed={changed}, subtags={with_subtags}, attributes={with_attributes}{incremental}, "
+        f"path={store.path})"
     )
-    if processed == 0 and RECLASSIFY_CITY:
+    if processed:
+        for line in stats.lines():
+            print(line)
+    if city_filtered == 0 and RECLASSIFY_CITY:
         print(f"[warn] No places matched city filter: {RECLASSIFY_CITY}")
     elif city_filtered == 0:
         print("[warn] No places found to reclassify.")
@@ -0,0 +1,315 @@
+"""
+On-disk response cache for Google Places API calls.
+
+Responses are stored in a SQLite file keyed by a hash of the endpoint and the
+request parameters (API key excluded, `fields` normalized so field order does
+not matter). Each endpoint has its own TTL, and the file is kept under a size
+limit by evicting least-recently-used entries.
+
+Only final answers are cached (OK / ZERO_RESULTS / NOT_FOUND); transient
+statuses such as INVALID_REQUEST for a not-yet-valid page token are not.
+Paged searches are not cached at all: a page token expires within minutes, so
+a cached first page would hand the next run a stale next_page_token. Search
+responses that carry one are never stored, and `pagetoken` requests bypass
+the cache.
+
+Usage:
+  python3 backend/scripts/response_cache.py stats
+  python3 backend/scripts/response_cache.py prune   # 刪除過期項目
+  python3 backend/scripts/response_cache.py clear
+
+Optional env:
+  PLACES_CACHE=on|off|offline|refresh
+    on       先查快取，未命中才打 API（預設）
+    off      完全不使用快取
+    offline  只讀快取、不連網；未命中回傳 status=CACHE_MISS
+    refresh  不讀快取，但把新回應寫回快取
+  PLACES_CACHE_PATH=backend/data/places_http_cache.sqlite3
+  PLACES_CACHE_MAX_MB=512
+  PLACES_CACHE_TTL_DAYS="details=30,textsearch=7,findplacefromtext=90,nearbysearch=7"
+"""
+from __future__ import annotations
+
+import argparse
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+import zlib
+from pathlib import Path
+from typing import Any, Callable, Dict
+from urllib.parse import urlparse
+
+ROOT = Path(__file__).resolve().parents[1]
+CACHE_MODE = os.environ.get("PLACES_CACHE", "on").strip().lower()
+CACHE_PATH = Path(
+    os.environ.get("PLACES_CACHE_PATH", str(ROOT / "data" / "places_http_cache.sqlite3"))
+)
+CACHE_MAX_MB = float(os.environ.get("PLACES_CACHE_MAX_MB", "512"))
+
+if CACHE_MODE not in {"on", "off", "offline", "refresh"}:
+    CACHE_MODE = "on"
+
+DEFAULT_TTL_DAYS = {
+    "details": 30.0,
+    "textsearch": 7.0,
+    "findplacefromtext": 90.0,
+    "nearbysearch": 7.0,
+}
+FALLBACK_TTL_DAYS = 7.0
+CACHEABLE_STATUSES = {"OK", "ZERO_RESULTS", "NOT_FOUND"}
+CACHE_MISS_STATUS = "CACHE_MISS"
+_IGNORED_PARAMS = {"key"}
+_PAGE_TOKEN_PARAM = "pagetoken"
+
+Fetcher = Callable[[str, Dict[str, Any]], Dict[str, Any]]
+
+
+def _parse_ttl_days(raw: str) -> Dict[str, float]:
+    ttl = dict(DEFAULT_TTL_DAYS)
+    for part in (raw or "").split(","):
+        name, sep, value = part.partition("=")
+        if not sep:
+            continue
+        try:
+            ttl[name.strip().lower()] = float(value)
+        except ValueError:
+            continue
+    return ttl
+
+
+CACHE_TTL_DAYS = _parse_ttl_days(os.environ.get("PLACES_CACHE_TTL_DAYS", ""))
+
+
+def endpoint_of(url: str) -> str:
+    """`.../place/details/json` -> `details`."""
+    parts = [part for part in urlparse(url).path.split("/") if part]
+    if parts and parts[-1] in {"json", "xml"}:
+        parts = parts[:-1]
+    return parts[-1].lower() if parts else ""
+
+
+def cache_key(url: str, params: Dict[str, Any]) -> str:
+    normalized: Dict[str, str] = {}
+    for name, value in params.items():
+        if name in _IGNORED_PARAMS or value is None:
+            continue
+        text = str(value)
+        if name == "fields":
+            text = ",".join(sorted({field.strip() for field in text.split(",") if field.strip()}))
+        normalized[name] = text
+    payload = json.dumps(
+        [endpoint_of(url), sorted(normalized.items())],
+        ensure_ascii=False,
+        separators=(",", ":"),
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class ResponseCache:
+    """Thread-safe SQLite-backed response cache with per-endpoint TTL and LRU eviction."""
+
+    def __init__(
+        self,
+        path: Path = CACHE_PATH,
+        *,
+        mode: str = CACHE_MODE,
+        max_bytes: int | None = None,
+        ttl_days: Dict[str, float] | None = None,
+    ) -> None:
+        self.path = Path(path)
+        self.mode = mode
+        self.max_bytes = int(max_bytes if max_bytes is not None else CACHE_MAX_MB * 1024 * 1024)
+        self.ttl_days = ttl_days or CACHE_TTL_DAYS
+        self.hits = 0
+        self.misses = 0
+        self.stores = 0
+        self._lock = threading.Lock()
+        self._conn: sqlite3.Connection | None = None
+        self._total_bytes = 0
+        if self.mode != "off":
+            self._open()
+
+    @property
+    def enabled(self) -> bool:
+        return self._conn is not None
+
+    @property
+    def offline(self) -> bool:
+        return self.mode == "offline"
+
+    def _open(self) -> None:
+        if self.offline and not self.path.exists():
+            conn = sqlite3.connect(":memory:", check_same_thread=False)
+        else:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            conn = sqlite3.connect(str(self.path), check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS responses (
+                key TEXT PRIMARY KEY,
+                endpoint TEXT NOT NULL,
+                created_at REAL NOT NULL,
+                accessed_at REAL NOT NULL,
+                size INTEGER NOT NULL,
+                body BLOB NOT NULL
+            )
+            """
+        )
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_responses_accessed ON responses(accessed_at)")
+        row = conn.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()
+        self._total_bytes = int(row[0])
+        self._conn = conn
+
+    def close(self) -> None:
+        with self._lock:
+            if self._conn is not None:
+                self._conn.commit()
+                self._conn.close()
+                self._conn = None
+
+    def _ttl_seconds(self, endpoint: str) -> float:
+        return self.ttl_days.get(endpoint, FALLBACK_TTL_DAYS) * 86400
+
+    def get(self, url: str, params: Dict[str, Any]) -> Dict[str, Any] | None:
+        if self._conn is None or self.mode == "refresh" or params.get(_PAGE_TOKEN_PARAM):
+            return None
+        key = cache_key(url, params)
+        endpoint = endpoint_of(url)
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT created_at, body FROM responses WHERE key = ?", (key,)
+            ).fetchone()
+            # Offline runs accept stale entries: an old answer beats no answer.
+            if row is None or (not self.offline and now - row[0] > self._ttl_seconds(endpoint)):
+                self.misses += 1
+                return None
+            data = json.loads(zlib.decompress(row[1]).decode("utf-8"))
+            if data.get("next_page_token"):
+                # Stored before paged searches were excluded; its token is long expired.
+                self.misses += 1
+                return None
+            if not self.offline:
+                self._conn.execute("UPDATE responses SET accessed_at = ? WHERE key = ?", (now, key))
+            self.hits += 1
+        return data
+
+    def put(self, url: str, params: Dict[str, Any], data: Dict[str, Any]) -> None:
+        if self._conn is None or self.offline:
+            return
+        if data.get("status") not in CACHEABLE_STATUSES:
+            return
+        if params.get(_PAGE_TOKEN_PARAM) or data.get("next_page_token"):
+            return
+        key = cache_key(url, params)
+        body = zlib.compress(json.dumps(data, ensure_ascii=False).encode("utf-8"))
+        now = time.time()
+        with self._lock:
+            old = self._conn.execute("SELECT size FROM responses WHERE key = ?", (key,)).fetchone()
+            self._conn.execute(
+                "INSERT OR REPLACE INTO responses (key, endpoint, created_at, accessed_at, size, body) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (key, endpoint_of(url), now, now, len(body), body),
+            )
+            self._total_bytes += len(body) - (old[0] if old else 0)
+            self.stores += 1
+            if self._total_bytes > self.max_bytes:
+                self._evict_locked()
+            self._conn.commit()
+
+    def _evict_locked(self) -> None:
+        # Trim to 90% so a full cache does not evict on every insert.
+        target = int(self.max_bytes * 0.9)
+        rows = self._conn.execute(
+            "SELECT key, size FROM responses ORDER BY accessed_at ASC"
+        ).fetchall()
+        doomed = []
+        for key, size in rows:
+            if self._total_bytes <= target:
+                break
+            doomed.append((key,))
+            self._total_bytes -= size
+        self._conn.executemany("DELETE FROM responses WHERE key = ?", doomed)
+
+    def prune_expired(self) -> int:
+        if self._conn is None:
+            return 0
+        now = time.time()
+        removed = 0
+        with self._lock:
+            endpoints = [row[0] for row in self._conn.execute("SELECT DISTINCT endpoint FROM responses")]
+            for endpoint in endpoints:
+                cur = self._conn.execute(
+                    "DELETE FROM responses WHERE endpoint = ? AND created_at < ?",
+                    (endpoint, now - self._ttl_seconds(endpoint)),
+                )
+                removed += cur.rowcount
+            row = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()
+            self._total_bytes = int(row[0])
+            self._conn.commit()
+        return removed
+
+    def fetch(self, fetcher: Fetcher, url: str, params: Dict[str, Any]) -> Dict[str, Any]:
+        """Return a cached response or call `fetcher` and cache its result."""
+        cached = self.get(url, params)
+        if cached is not None:
+            return cached
+        if self.offline:
+            return {"status": CACHE_MISS_STATUS}
+        key_params = dict(params)  # fetchers add the API key to params in place
+        data = fetcher(url, params)
+        self.put(url, key_params, data)
+        return data
+
+    def summary(self) -> str:
+        if self.mode == "off":
+            return "快取：停用"
+        return (
+            f"快取({self.mode})：命中 {self.hits}、未命中 {self.misses}、"
+            f"寫入 {self.stores}，大小 {self._total_bytes / 1024 / 1024:.1f} MB"
+        )
+
+
+def _stats(cache: ResponseCache) -> None:
+    assert cache._conn is not None
+    rows = cache._conn.execute(
+        "SELECT endpoint, COUNT(*), COALESCE(SUM(size), 0) FROM responses GROUP BY endpoint ORDER BY endpoint"
+    ).fetchall()
+    print(f"cache={cache.path}")
+    for endpoint, count, size in rows:
+        ttl = cache.ttl_days.get(endpoint, FALLBACK_TTL_DAYS)
+        print(f"  {endpoint}: {count} 筆, {size / 1024:.1f} KB, ttl={ttl:g} 天")
+    print(f"  合計 {cache._total_bytes / 1024 / 1024:.1f} MB / 上限 {cache.max_bytes / 1024 / 1024:.0f} MB")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Google Places 回應快取維護")
+    parser.add_argument("command", choices=["stats", "prune", "clear"])
+    parser.add_argument("--path", type=Path, default=CACHE_PATH)
+    args = parser.parse_args()
+
+    cache = ResponseCache(args.path, mode="on")
+    try:
+        if args.command == "stats":
+            _stats(cache)
+        elif args.command == "prune":
+            print(f"已刪除過期項目 {cache.prune_expired()} 筆")
+        else:
+            assert cache._conn is not None
+            with cache._lock:
+                cache._conn.execute("DELETE FROM responses")
+                cache._conn.commit()
+                cache._total_bytes = 0
+            cache._conn.execute("VACUUM")
+            print(f"已清空 {cache.path}")
+    finally:
+        cache.close()
+
+
+if __name__ == "__main__":
+    main()
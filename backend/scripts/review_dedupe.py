@@ -0,0 +1,224 @@
+"""
+Near-duplicate review detection across the whole places_with_reviews.jsonl corpus.
+
+Exact-string dedupe misses templated or copy-pasted Google reviews that differ
+by a word, an emoji or punctuation. Each review is normalized (NFKC, lowercase,
+whitespace and punctuation removed) and cut into overlapping character
+shingles (3 characters by default, which suits Chinese text without
+segmentation). A one-permutation MinHash signature of the shingles is split into LSH bands, so
+a new review is only compared with earlier reviews that share a band; a
+candidate counts as a duplicate when the exact Jaccard similarity of the
+shingle sets reaches REVIEW_DUP_THRESHOLD. The first occurrence wins.
+
+Usage (dedupe the stored corpus in place):
+  python3 backend/scripts/review_dedupe.py
+  python3 backend/scripts/review_dedupe.py --dry-run
+
+Optional env:
+  REVIEW_DUP_THRESHOLD=0.8   # Jaccard 相似度門檻
+  REVIEW_SHINGLE_SIZE=3      # 字元 shingle 長度
+"""
+from __future__ import annotations
+
+import argparse
+import os
+import re
+import unicodedata
+import zlib
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Tuple
+
+REVIEW_DUP_THRESHOLD = float(os.environ.get("REVIEW_DUP_THRESHOLD", "0.8"))
+REVIEW_SHINGLE_SIZE = max(1, int(os.environ.get("REVIEW_SHINGLE_SIZE", "3")))
+
+# 16 bands x 4 rows: pairs at Jaccard 0.8 share a band with probability > 0.999,
+# pairs at 0.3 only ~12% of the time.
+NUM_PERM = 64
+BANDS = 16
+_ROWS = NUM_PERM // BANDS
+_SLOT_BITS = 6  # log2(NUM_PERM)
+_MASK64 = (1 << 64) - 1
+_VALUE_MASK = (1 << (64 - _SLOT_BITS)) - 1
+_MIX = 0x9E3779B97F4A7C15
+_EMPTY = 1 << 64
+_NON_WORD = re.compile(r"[\W_]+")
+
+
+def normalize_review(text: str) -> str:
+    return _NON_WORD.sub("", unicodedata.normalize("NFKC", text or "").lower())
+
+
+def shingles(text: str, size: int = REVIEW_SHINGLE_SIZE) -> frozenset[str]:
+    normalized = normalize_review(text)
+    if len(normalized) <= size:
+        return frozenset([normalized]) if normalized else frozenset()
+    return frozenset(normalized[i : i + size] for i in range(len(normalized) - size + 1))
+
+
+def minhash(shingle_set: Iterable[str]) -> Tuple[int, ...]:
+    """One-permutation MinHash: each shingle is hashed once into one of NUM_PERM slots.
+
+    Empty slots (short reviews) borrow the next filled slot's minimum, offset by
+    the distance, so two similar reviews still agree slot by slot.
+    """
+    slots = [_EMPTY] * NUM_PERM
+    for shingle in shingle_set:
+        h = (zlib.crc32(shingle.encode("utf-8")) * _MIX) & _MASK64
+        slot, value = h >> (64 - _SLOT_BITS), h & _VALUE_MASK
+        if value < slots[slot]:
+            slots[slot] = value
+    if all(value == _EMPTY for value in slots):
+        return ()
+    signature = list(slots)
+    carry, distance = 0, 0
+    # Walk the ring backwards twice so every empty slot has seen a filled one after it.
+    for step in range(2 * NUM_PERM - 1, -1, -1):
+        slot = step % NUM_PERM
+        if slots[slot] != _EMPTY:
+            carry, distance = slots[slot], 0
+            continue
+        distance += 1
+        if step < NUM_PERM:
+            signature[slot] = carry + distance * _EMPTY
+    return tuple(signature)
+
+
+def jaccard(left: frozenset[str], right: frozenset[str]) -> float:
+    if not left and not right:
+        return 1.0
+    return len(left & right) / len(left | right)
+
+
+class ReviewDeduper:
+    """Keeps the first of every group of near-identical reviews, fed one review at a time.
+
+    Reviews can be added on behalf of a places_with_reviews item (`claim()`); when
+    a later item with the same place_id or source_name is claimed, the earlier
+    item's reviews stop counting as copies, so a re-fetched place keeps its own
+    reviews. `seed()` loads stored items without counting them in the summary.
+    """
+
+    def __init__(self, threshold: float = REVIEW_DUP_THRESHOLD) -> None:
+        self.threshold = threshold
+        self._kept: List[frozenset[str]] = []
+        self._kept_owner: List[int | None] = []
+        self._exact: Dict[str, int] = {}
+        self._buckets: Dict[Tuple[int, Tuple[int, ...]], List[int]] = {}
+        self._owner_by_key: Dict[Tuple[str, str], int] = {}
+        self._retired: set[int] = set()
+        self._next_owner = 0
+        self.seeded = 0
+        self.kept = 0
+        self.dropped = 0
+        self.comparisons = 0
+
+    def claim(self, item: Dict[str, Any]) -> int:
+        """Owner token for `item`'s reviews; retires the item it replaces."""
+        owner = self._next_owner
+        self._next_owner += 1
+        place_id = str(item.get("place_id") or "").strip()
+        name = str(item.get("source_name") or item.get("name") or "").strip()
+        for key in (("id", place_id), ("name", name)):
+            if not key[1]:
+                continue
+            previous = self._owner_by_key.get(key)
+            if previous is not None:
+                self._retired.add(previous)
+            self._owner_by_key[key] = owner
+        return owner
+
+    def seed(self, item: Dict[str, Any]) -> None:
+        """Record the reviews of a stored item as earlier copies.
+
+        Every stored review is kept, even one close to another stored review: if
+        that other item is replaced later, this one must still catch copies.
+        """
+        owner = self.claim(item)
+        for text in item.get("reviews") or []:
+            if isinstance(text, str):
+                self._insert(text, owner, check=False)
+                self.seeded += 1
+
+    def add(self, text: str, owner: int | None = None) -> bool:
+        """Record `text`; returns False if it duplicates a review already kept."""
+        kept, compared = self._insert(text, owner)
+        self.comparisons += compared
+        if kept:
+            self.kept += 1
+        else:
+            self.dropped += 1
+        return kept
+
+    def _live(self, index: int) -> bool:
+        owner = self._kept_owner[index]
+        return owner is None or owner not in self._retired
+
+    def _insert(self, text: str, owner: int | None, check: bool = True) -> Tuple[bool, int]:
+        """(kept, Jaccard comparisons made)."""
+        normalized = normalize_review(text)
+        exact = self._exact.get(normalized)
+        if check and exact is not None and self._live(exact):
+            return False, 0
+        shingle_set = shingles(text)
+        signature = minhash(shingle_set) if shingle_set else ()
+        bands = [(band, signature[band * _ROWS : (band + 1) * _ROWS]) for band in range(BANDS)] if signature else []
+        candidates: set[int] = set()
+        if check:
+            for key in bands:
+                candidates.update(self._buckets.get(key, ()))
+        compared = 0
+        for index in candidates:
+            if not self._live(index):
+                continue
+            compared += 1
+            if jaccard(shingle_set, self._kept[index]) >= self.threshold:
+                return False, compared
+        index = len(self._kept)
+        self._kept.append(shingle_set)
+        self._kept_owner.append(owner)
+        self._exact[normalized] = index
+        for key in bands:
+            self._buckets.setdefault(key, []).append(index)
+        return True, compared
+
+    def summary(self) -> str:
+        seeded = f"，既有評論 {self.seeded} 則" if self.seeded else ""
+        return f"近似重複評論：保留 {self.kept} 則，略過 {self.dropped} 則（比對 {self.comparisons} 次{seeded}）"
+
+
+def dedupe_review_items(items: List[Dict[str, Any]], deduper: ReviewDeduper | None = None) -> ReviewDeduper:
+    """Drop near-duplicate reviews across `items` (places_with_reviews entries), in place and in list order."""
+    deduper = deduper or ReviewDeduper()
+    items = [item for item in items if isinstance(item, dict)]
+    # Claim the whole batch first: reviews of the items it replaces never count as copies.
+    owners = [deduper.claim(item) for item in items]
+    for item, owner in zip(items, owners):
+        reviews = item.get("reviews")
+        if isinstance(reviews, list) and reviews:
+            item["reviews"] = [text for text in reviews if isinstance(text, str) and deduper.add(text, owner)]
+    return deduper
+
+
+def main() -> None:
+    from place_store import load_review_items, save_review_items
+
+    root = Path(__file__).resolve().parents[1]
+    default_path = os.environ.get("PLACES_REVIEWS_PATH", str(root / "data" / "places_with_reviews.jsonl"))
+    parser = argparse.ArgumentParser(description="移除 places_with_reviews.jsonl 中跨景點的近似重複評論")
+    parser.add_argument("--path", default=default_path)
+    parser.add_argument("--dry-run", action="store_true", help="只統計，不寫回")
+    args = parser.parse_args()
+
+    path = Path(args.path)
+    items = load_review_items(path)
+    before = sum(len(item.get("reviews") or []) for item in items)
+    deduper = dedupe_review_items(items)
+    print(f"{path}：{len(items)} 個景點、{before} 則評論")
+    print(deduper.summary())
+    if deduper.dropped and not args.dry_run:
+        save_review_items(path, items)
+        print(f"已寫回 {path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,351 @@
+"""
+Append-only JSONL store for places_with_reviews items.
+
+One review item per line in places_with_reviews.jsonl. Fetchers append what
+they just fetched instead of rewriting the whole array; a later line for the
+same place_id or source_name supersedes the earlier one (the same rule the
+crawler used when merging the JSON array). A compact sidecar index
+(places_with_reviews.idx.json) maps place_id and source_name to the byte offset
+of their live line, so readers can
+
+  - stream only live items (`iter_items()`) without loading the file;
+  - fetch a single item by place_id / source_name with one seek (`get()`).
+
+The index records the JSONL size it covers and a digest of the bytes before
+that point: lines appended after it (for example by a run that was killed
+before saving the index) are indexed on open, and a missing or mismatched index
+is rebuilt with one pass over the file. A run killed in the middle of a line
+leaves a last line without its newline; the next process to open the store
+cuts it off before indexing or appending, and lines that still fail to decode
+are skipped. When superseded lines outnumber live ones the file is compacted.
+
+Several processes (crawl_shards.py shards, fetch_places_with_reviews.py) may
+write the same store. Appends, rewrites, compaction and index saves hold an
+exclusive flock on places_with_reviews.jsonl.lock and first re-sync with the
+file, so each process indexes what the others wrote; readers take the lock
+only to sync and open the file. The lock is a sidecar because rewrites and
+compaction replace the .jsonl itself.
+
+An old places_with_reviews.json array next to a missing .jsonl is imported on
+first open. `read_review_items` / `write_review_items` accept either format.
+"""
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, BinaryIO, Dict, Iterable, Iterator, List
+
+try:
+    import fcntl
+except ImportError:  # Windows: no cross-process locking
+    fcntl = None
+
+INDEX_VERSION = 1
+# Compact once superseded lines outnumber live ones and there are at least this many.
+COMPACT_MIN_DEAD = 500
+# The index stores a digest of the bytes just before the size it covers, to notice a replaced file.
+_TAIL_BYTES = 256
+
+
+def _item_keys(item: Dict[str, Any]) -> tuple[str, str]:
+    return (
+        str(item.get("place_id") or "").strip(),
+        str(item.get("source_name") or item.get("name") or "").strip(),
+    )
+
+
+def _dump_line(item: Dict[str, Any]) -> bytes:
+    return (json.dumps(item, ensure_ascii=False, separators=(",", ":")) + "\n").encode("utf-8")
+
+
+def _load_line(line: bytes) -> Dict[str, Any] | None:
+    """The item on a JSONL line; None for blank lines and lines that do not decode to an object."""
+    if not line.strip():
+        return None
+    try:
+        item = json.loads(line)
+    except ValueError:
+        return None
+    return item if isinstance(item, dict) else None
+
+
+def merge_review_items(existing: List[Dict[str, Any]], fresh: Iterable[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """`existing` with `fresh` items replacing those that share a place_id or source_name."""
+    by_name: Dict[str, Dict[str, Any]] = {}
+    by_id: Dict[str, Dict[str, Any]] = {}
+    for item in [*existing, *fresh]:
+        if not isinstance(item, dict):
+            continue
+        place_id, name = _item_keys(item)
+        by_name[name] = item
+        if place_id:
+            by_id[place_id] = item
+    # An item indexed under both its name and its place_id is listed once.
+    return list({id(item): item for item in {**by_name, **by_id}.values()}.values())
+
+
+class ReviewStore:
+    def __init__(self, path: Path) -> None:
+        self.path = Path(path)
+        self.index_path = self.path.with_suffix(".idx.json")
+        self.lock_path = self.path.with_name(self.path.name + ".lock")
+        self.by_id: Dict[str, int] = {}
+        self.by_name: Dict[str, int] = {}
+        self.lines = 0
+        self._size = 0
+        self._tail = ""
+        with self._locked():
+            self._load_index()
+
+    @classmethod
+    def open(cls, path: Path) -> "ReviewStore":
+        """Open the store, importing a legacy JSON array at the same path with a .json suffix."""
+        path = Path(path)
+        legacy = path.with_suffix(".json")
+        if not path.exists() and legacy.exists():
+            store = cls(path)
+            items = json.loads(legacy.read_text(encoding="utf-8"))
+            store.rewrite(item for item in (items if isinstance(items, list) else []) if isinstance(item, dict))
+            print(f"已將 {legacy} 轉為 {path}（{len(store)} 筆）")
+            return store
+        return cls(path)
+
+    # -- locking -----------------------------------------------------------
+
+    @contextmanager
+    def _locked(self) -> Iterator[None]:
+        """Exclusive cross-process lock; not re-entrant, so internal helpers never take it."""
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with self.lock_path.open("a") as lock:
+            if fcntl is not None:
+                fcntl.flock(lock.fileno(), fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(lock.fileno(), fcntl.LOCK_UN)
+
+    def _sync(self) -> None:
+        """Pick up what other processes wrote since this store last read or wrote the file (lock held)."""
+        size = self.path.stat().st_size if self.path.exists() else 0
+        if size == self._size and self._tail_digest(size) == self._tail:
+            return
+        self._load_index()
+
+    # -- index -------------------------------------------------------------
+
+    def _drop_partial_line(self) -> None:
+        """Cut off a last line without its newline, left by a writer killed mid-append (lock held)."""
+        if not self.path.exists():
+            return
+        with self.path.open("r+b") as fh:
+            end = fh.seek(0, os.SEEK_END)
+            position = end
+            while position > 0:
+                start = max(0, position - 4096)
+                fh.seek(start)
+                chunk = fh.read(position - start)
+                newline = chunk.rfind(b"\n")
+                if newline >= 0:
+                    position = start + newline + 1
+                    break
+                position = start
+            if position < end:
+                fh.truncate(position)
+                print(f"{self.path}：移除寫到一半的最後一行（{end - position} bytes）")
+
+    def _load_index(self) -> None:
+        self.by_id, self.by_name, self.lines, self._size, self._tail = {}, {}, 0, 0, ""
+        self._drop_partial_line()
+        size = self.path.stat().st_size if self.path.exists() else 0
+        index: Dict[str, Any] = {}
+        if self.index_path.exists():
+            try:
+                index = json.loads(self.index_path.read_text(encoding="utf-8"))
+            except ValueError:
+                index = {}
+        if (
+            index.get("version") == INDEX_VERSION
+            and 0 <= int(index.get("size", -1)) <= size
+            and index.get("tail") == self._tail_digest(int(index["size"]))
+        ):
+            self.by_id = {key: int(offset) for key, offset in index.get("byPlaceId", {}).items()}
+            self.by_name = {key: int(offset) for key, offset in index.get("byName", {}).items()}
+            self.lines = int(index.get("lines", 0))
+            self._size = int(index["size"])
+            self._tail = str(index["tail"])
+        if self._size < size:
+            self._scan_from(self._size)
+            self._save_index()
+
+    def _scan_from(self, offset: int) -> None:
+        """Index lines from byte `offset` on (a tail written after the index was saved, or the whole file)."""
+        if offset == 0:
+            self.by_id, self.by_name, self.lines = {}, {}, 0
+        with self.path.open("rb") as fh:
+            fh.seek(offset)
+            for line in fh:
+                item = _load_line(line)
+                if item is not None:
+                    self._index_line(item, offset)
+                offset += len(line)
+        self._size = offset
+
+    def _tail_digest(self, size: int) -> str:
+        if size <= 0 or not self.path.exists():
+            return ""
+        with self.path.open("rb") as fh:
+            fh.seek(max(0, size - _TAIL_BYTES))
+            return hashlib.sha1(fh.read(min(size, _TAIL_BYTES))).hexdigest()[:16]
+
+    def _index_line(self, item: Dict[str, Any], offset: int) -> None:
+        place_id, name = _item_keys(item)
+        self.by_name[name] = offset
+        if place_id:
+            self.by_id[place_id] = offset
+        self.lines += 1
+
+    def _save_index(self) -> None:
+        self._tail = self._tail_digest(self._size)
+        index = {
+            "version": INDEX_VERSION,
+            "size": self._size,
+            "tail": self._tail,
+            "lines": self.lines,
+            "byPlaceId": self.by_id,
+            "byName": self.by_name,
+        }
+        tmp_path = self.index_path.with_name(self.index_path.name + ".tmp")
+        tmp_path.write_text(json.dumps(index, ensure_ascii=False, separators=(",", ":")), encoding="utf-8")
+        os.replace(tmp_path, self.index_path)
+
+    def _live_offsets(self) -> set[int]:
+        return {*self.by_id.values(), *self.by_name.values()}
+
+    def __len__(self) -> int:
+        return len(self._live_offsets())
+
+    # -- reads -------------------------------------------------------------
+
+    def _open_synced(self) -> BinaryIO | None:
+        """Open the file as indexed; the handle keeps reading the same data if it is compacted meanwhile."""
+        with self._locked():
+            self._sync()
+            return self.path.open("rb") if self.path.exists() else None
+
+    def iter_items(self) -> Iterator[Dict[str, Any]]:
+        """Live items in file order, one line at a time."""
+        fh = self._open_synced()
+        if fh is None:
+            return
+        live = self._live_offsets()
+        offset = 0
+        with fh:
+            for line in fh:
+                if offset in live:
+                    item = _load_line(line)
+                    if item is not None:
+                        yield item
+                offset += len(line)
+                if offset >= self._size:
+                    break
+
+    __iter__ = iter_items
+
+    def get(self, place_id: str = "", name: str = "") -> Dict[str, Any] | None:
+        fh = self._open_synced()
+        if fh is None:
+            return None
+        offset = self.by_id.get(place_id.strip()) if place_id else None
+        if offset is None and name:
+            offset = self.by_name.get(name.strip())
+        with fh:
+            if offset is None:
+                return None
+            fh.seek(offset)
+            return _load_line(fh.readline())
+
+    # -- writes ------------------------------------------------------------
+
+    def append(self, items: Iterable[Dict[str, Any]]) -> int:
+        """Append items; each supersedes earlier lines with the same place_id / source_name."""
+        written = 0
+        with self._locked():
+            self._sync()
+            with self.path.open("ab") as fh:
+                offset = fh.tell()
+                for item in items:
+                    if not isinstance(item, dict):
+                        continue
+                    line = _dump_line(item)
+                    fh.write(line)
+                    self._index_line(item, offset)
+                    offset += len(line)
+                    written += 1
+            self._size = offset
+            self._save_index()
+            dead = self.lines - len(self)
+            if dead >= COMPACT_MIN_DEAD and dead > len(self):
+                self._compact()
+        return written
+
+    def rewrite(self, items: Iterable[Dict[str, Any]]) -> None:
+        """Replace the whole store with `items` (later duplicates still supersede earlier ones)."""
+        tmp_path = self.path.with_name(self.path.name + ".tmp")
+        with self._locked():
+            self.by_id, self.by_name, self.lines = {}, {}, 0
+            offset = 0
+            with tmp_path.open("wb") as fh:
+                for item in items:
+                    if not isinstance(item, dict):
+                        continue
+                    line = _dump_line(item)
+                    fh.write(line)
+                    self._index_line(item, offset)
+                    offset += len(line)
+            os.replace(tmp_path, self.path)
+            self._size = offset
+            self._save_index()
+
+    def compact(self) -> None:
+        """Drop superseded lines, streaming live lines into a new file."""
+        with self._locked():
+            self._sync()
+            self._compact()
+
+    def _compact(self) -> None:
+        tmp_path = self.path.with_name(self.path.name + ".compact")
+        live = self._live_offsets()
+        with self.path.open("rb") as src, tmp_path.open("wb") as dst:
+            offset = 0
+            for line in src:
+                if offset in live:
+                    dst.write(line)
+                offset += len(line)
+        os.replace(tmp_path, self.path)
+        self._scan_from(0)
+        self._save_index()
+
+
+def read_review_items(path: Path) -> Iterator[Dict[str, Any]]:
+    """Stream review items from a .jsonl store or a JSON array file."""
+    path = Path(path)
+    if path.suffix == ".jsonl":
+        yield from ReviewStore.open(path).iter_items()
+        return
+    if not path.exists():
+        return
+    items = json.loads(path.read_text(encoding="utf-8"))
+    if isinstance(items, list):
+        yield from (item for item in items if isinstance(item, dict))
+
+
+def write_review_items(path: Path, items: Iterable[Dict[str, Any]]) -> None:
+    path = Path(path)
+    if path.suffix == ".jsonl":
+        ReviewStore(path).rewrite(items)
+        return
+    path.write_text(json.dumps(list(items), ensure_ascii=False, indent=2), encoding="utf-8")
@@ -6,7 +6,8 @@ import os
 import sys
 import time
 import urllib.error
-import urllib.request
+
+from http_transport import request
 
 
 DEFAULT_API_BASE = "https://smart-travel-backend-6ant.onrender.com"
@@ -40,34 +41,33 @@ def main() -> int:
             )
             time.sleep(delay)
 
-        request = urllib.request.Request(
-            url,
-            data=b"",
-            headers={
-                "x-reminder-token": token,
-                "User-Agent": "smart-travel-reminder-cron/1.0",
-            },
-            method="POST",
-        )
-
         try:
-            with urllib.request.urlopen(request, timeout=90) as response:
-                body = response.read().decode("utf-8")
-                print(f"[reminder-cron] HTTP {response.status}", flush=True)
-                try:
-                    payload = json.loads(body)
-                    result = payload.get("data", payload)
-                    print(
-                        "[reminder-cron] result "
-                        + json.dumps(
-                            result,
-                            ensure_ascii=False,
-                            separators=(",", ":"),
-                        ),
-                        flush=True,
-                    )
-                except json.JSONDecodeError:
-                    print(f"[reminder-cron] response {body}", flush=True)
+            response = request(
+                "POST",
+                url,
+                data=b"",
+                headers={
+                    "x-reminder-token": token,
+                    "User-Agent": "smart-travel-reminder-cron/1.0",
+                },
+                timeout=90,
+            )
+            body = response.text()
+            print(f"[reminder-cron] HTTP {response.status}", flush=True)
+            try:
+                payload = json.loads(body)
+                result = payload.get("data", payload)
+                print(
+                    "[reminder-cron] result "
+                    + json.dumps(
+                        result,
+                        ensure_ascii=False,
+                        separators=(",", ":"),
+                    ),
+                    flush=True,
+                )
+            except json.JSONDecodeError:
+                print(f"[reminder-cron] response {body}", flush=True)
             return 0
         except urllib.error.HTTPError as error:
             body = error.read().decode("utf-8", errors="replace")
@@ -0,0 +1,279 @@
+"""
+Geographic tiles for `GOOGLE_CRAWL_PROFILE=tiles` in fetch_places_from_google.py.
+
+Each county's bounding box is cut into tiles no wider than TILE_START_RADIUS_M
+and every tile is covered by one Nearby Search circle. A tile whose first page
+comes back full (20 results) is split into four children instead of paging,
+so dense areas are searched at finer resolution while empty mountains or sea
+cost one request. Results are deduplicated before any Details call by
+place_id and by a spatial hash (same normalized name within ~TILE_DEDUPE_METERS).
+
+County boxes are approximate (they include coastal water and some overlap
+with neighbours); city assignment still comes from the Details address.
+
+Optional env:
+  TILE_START_RADIUS_M=20000  # 起始網格的搜尋半徑（公尺）
+  TILE_MIN_RADIUS_M=250      # 細分下限；到此仍滿頁就改為翻頁
+  TILE_MAX_DEPTH=6
+  TILE_DEDUPE_METERS=40
+  TILE_PLACE_TYPE=tourist_attraction   # Nearby Search 的 type；空字串 = 不限
+"""
+from __future__ import annotations
+
+import math
+import os
+from dataclasses import dataclass
+from typing import Any, Dict, Iterable, List, Tuple
+
+TILE_START_RADIUS_M = float(os.environ.get("TILE_START_RADIUS_M", "20000"))
+TILE_MIN_RADIUS_M = float(os.environ.get("TILE_MIN_RADIUS_M", "250"))
+TILE_MAX_DEPTH = int(os.environ.get("TILE_MAX_DEPTH", "6"))
+TILE_DEDUPE_METERS = float(os.environ.get("TILE_DEDUPE_METERS", "40"))
+TILE_PLACE_TYPE = os.environ.get("TILE_PLACE_TYPE", "tourist_attraction").strip()
+
+# Nearby Search returns at most 20 results per page and rejects radii above 50 km.
+NEARBY_PAGE_SIZE = 20
+NEARBY_MAX_RADIUS_M = 50000
+
+_METERS_PER_DEG_LAT = 110_574.0
+_METERS_PER_DEG_LNG_EQUATOR = 111_320.0
+
+# (south, west, north, east), approximate.
+COUNTY_BOUNDS: Dict[str, Tuple[float, float, float, float]] = {
+    "臺北市": (24.96, 121.45, 25.21, 121.67),
+    "新北市": (24.67, 121.28, 25.30, 122.01),
+    "基隆市": (25.05, 121.62, 25.20, 121.80),
+    "桃園市": (24.59, 120.98, 25.13, 121.47),
+    "新竹市": (24.73, 120.88, 24.86, 121.03),
+    "新竹縣": (24.43, 120.93, 24.95, 121.42),
+    "苗栗縣": (24.27, 120.62, 24.75, 121.26),
+    "臺中市": (23.99, 120.46, 24.45, 121.45),
+    "彰化縣": (23.79, 120.23, 24.20, 120.69),
+    "南投縣": (23.44, 120.62, 24.25, 121.35),
+    "雲林縣": (23.50, 120.13, 23.83, 120.73),
+    "嘉義市": (23.44, 120.39, 23.52, 120.49),
+    "嘉義縣": (23.22, 120.09, 23.64, 120.93),
+    "臺南市": (22.89, 120.03, 23.42, 120.66),
+    "高雄市": (22.47, 120.17, 23.47, 121.05),
+    "屏東縣": (21.90, 120.42, 22.88, 120.91),
+    "宜蘭縣": (24.31, 121.31, 24.99, 121.96),
+    "花蓮縣": (23.10, 120.98, 24.38, 121.65),
+    "臺東縣": (22.00, 120.73, 23.45, 121.56),
+    "澎湖縣": (23.18, 119.31, 23.80, 119.73),
+    "金門縣": (24.38, 118.21, 24.53, 118.48),
+    "連江縣": (25.93, 119.90, 26.39, 120.52),
+}
+
+
+def _meters_per_deg_lng(lat: float) -> float:
+    return _METERS_PER_DEG_LNG_EQUATOR * math.cos(math.radians(lat))
+
+
+@dataclass(frozen=True)
+class Tile:
+    county: str
+    south: float
+    west: float
+    north: float
+    east: float
+    depth: int = 0
+
+    @property
+    def center(self) -> Tuple[float, float]:
+        return (self.south + self.north) / 2, (self.west + self.east) / 2
+
+    @property
+    def radius_m(self) -> float:
+        """Radius of the circle that covers the whole tile (half its diagonal)."""
+        lat, _ = self.center
+        height = (self.north - self.south) * _METERS_PER_DEG_LAT
+        width = (self.east - self.west) * _meters_per_deg_lng(lat)
+        return math.hypot(height, width) / 2
+
+    @property
+    def label(self) -> str:
+        lat, lng = self.center
+        return f"{self.county} ({lat:.4f},{lng:.4f}) r={self.radius_m:.0f}m"
+
+    def can_split(self) -> bool:
+        return self.depth < TILE_MAX_DEPTH and self.radius_m / 2 >= TILE_MIN_RADIUS_M
+
+    def split(self) -> List["Tile"]:
+        mid_lat, mid_lng = self.center
+        depth = self.depth + 1
+        return [
+            Tile(self.county, self.south, self.west, mid_lat, mid_lng, depth),
+            Tile(self.county, self.south, mid_lng, mid_lat, self.east, depth),
+            Tile(self.county, mid_lat, self.west, self.north, mid_lng, depth),
+            Tile(self.county, mid_lat, mid_lng, self.north, self.east, depth),
+        ]
+
+    def nearby_params(self) -> Dict[str, Any]:
+        lat, lng = self.center
+        params: Dict[str, Any] = {
+            "location": f"{lat:.6f},{lng:.6f}",
+            "radius": int(math.ceil(min(self.radius_m, NEARBY_MAX_RADIUS_M))),
+            "language": "zh-TW",
+        }
+        if TILE_PLACE_TYPE:
+            params["type"] = TILE_PLACE_TYPE
+        return params
+
+    def to_list(self) -> list:
+        return [self.county, self.south, self.west, self.north, self.east, self.depth]
+
+    @classmethod
+    def from_list(cls, raw: Iterable[Any]) -> "Tile":
+        county, south, west, north, east, depth = raw
+        return cls(str(county), float(south), float(west), float(north), float(east), int(depth))
+
+
+def county_tiles(county: str, start_radius_m: float = TILE_START_RADIUS_M) -> List[Tile]:
+    """Cover a county's bounding box with a grid of tiles whose radius is at most `start_radius_m`."""
+    bounds = COUNTY_BOUNDS.get(county)
+    if bounds is None:
+        return []
+    south, west, north, east = bounds
+    mid_lat = (south + north) / 2
+    # A square tile of side s has radius s / sqrt(2).
+    side_m = max(1.0, start_radius_m * math.sqrt(2))
+    rows = max(1, math.ceil((north - south) * _METERS_PER_DEG_LAT / side_m))
+    cols = max(1, math.ceil((east - west) * _meters_per_deg_lng(mid_lat) / side_m))
+    d_lat = (north - south) / rows
+    d_lng = (east - west) / cols
+    return [
+        Tile(county, south + r * d_lat, west + c * d_lng, south + (r + 1) * d_lat, west + (c + 1) * d_lng)
+        for r in range(rows)
+        for c in range(cols)
+    ]
+
+
+class TileSet:
+    """Every tile of a crawl by sequence number; children of a split tile get the next numbers.
+
+    Sequence order is also the order results are merged in, so output stays stable
+    however the concurrent Nearby requests complete.
+    """
+
+    def __init__(self) -> None:
+        self.tiles: Dict[int, Tile] = {}
+        self.next_seq = 0
+        self.split_count = 0
+
+    @classmethod
+    def for_counties(cls, counties: Iterable[str]) -> "TileSet":
+        tile_set = cls()
+        per_county = [county_tiles(county) for county in counties]
+        # Interleave counties so a limited budget still touches every county.
+        for row in range(max((len(tiles) for tiles in per_county), default=0)):
+            for tiles in per_county:
+                if row < len(tiles):
+                    tile_set.add(tiles[row])
+        return tile_set
+
+    def add(self, tile: Tile) -> int:
+        seq = self.next_seq
+        self.next_seq += 1
+        self.tiles[seq] = tile
+        return seq
+
+    def split(self, seq: int) -> List[int]:
+        self.split_count += 1
+        return [self.add(child) for child in self.tiles[seq].split()]
+
+    def __getitem__(self, seq: int) -> Tile:
+        return self.tiles[seq]
+
+    def __len__(self) -> int:
+        return len(self.tiles)
+
+    def to_state(self) -> Dict[str, Any]:
+        return {
+            "nextSeq": self.next_seq,
+            "splits": self.split_count,
+            "tiles": {str(seq): tile.to_list() for seq, tile in self.tiles.items()},
+        }
+
+    @classmethod
+    def from_state(cls, state: Dict[str, Any]) -> "TileSet":
+        tile_set = cls()
+        tile_set.next_seq = int(state.get("nextSeq") or 0)
+        tile_set.split_count = int(state.get("splits") or 0)
+        for seq, raw in (state.get("tiles") or {}).items():
+            tile_set.tiles[int(seq)] = Tile.from_list(raw)
+        return tile_set
+
+
+def _normalize_name(value: str) -> str:
+    return "".join((value or "").split()).lower()
+
+
+class SpatialDedupe:
+    """Drops results already seen by place_id, or by the same name at (almost) the same spot."""
+
+    def __init__(self, cell_m: float = TILE_DEDUPE_METERS) -> None:
+        self.cell_m = max(1.0, cell_m)
+        self.place_ids: set[str] = set()
+        self._cells: Dict[Tuple[int, int], set[str]] = {}
+        self.points: List[list] = []
+        self.dropped = 0
+
+    def _cell(self, lat: float, lng: float) -> Tuple[int, int]:
+        return (
+            int(math.floor(lat * _METERS_PER_DEG_LAT / self.cell_m)),
+            int(math.floor(lng * _meters_per_deg_lng(lat) / self.cell_m)),
+        )
+
+    def add(self, place_id: str, name: str, lat: float | None, lng: float | None) -> bool:
+        """Record a result; returns False if it duplicates one already seen."""
+        if place_id and place_id in self.place_ids:
+            self.dropped += 1
+            return False
+        key = _normalize_name(name)
+        cell = self._cell(lat, lng) if lat is not None and lng is not None else None
+        if cell is not None and key:
+            row, col = cell
+            for d_row in (-1, 0, 1):
+                for d_col in (-1, 0, 1):
+                    if key in self._cells.get((row + d_row, col + d_col), ()):
+                        self.dropped += 1
+                        if place_id:
+                            self.place_ids.add(place_id)
+                        return False
+            self._cells.setdefault(cell, set()).add(key)
+        if place_id:
+            self.place_ids.add(place_id)
+        self.points.append([place_id, name, lat, lng])
+        return True
+
+    def to_state(self) -> List[list]:
+        return self.points
+
+    def summary(self) -> str:
+        return f"空間去重：保留 {len(self.points)} 筆，略過重複 {self.dropped} 筆"
+
+    @classmethod
+    def from_state(cls, points: Iterable[list]) -> "SpatialDedupe":
+        dedupe = cls()
+        for place_id, name, lat, lng in points:
+            dedupe.add(place_id, name, lat, lng)
+        return dedupe
+
+
+def tile_plan(counties: Iterable[str]) -> Dict[str, Any]:
+    """Settings that shape the tile grid; part of the checkpoint config so a resume uses the same grid."""
+    return {
+        "counties": list(counties),
+        "startRadius": TILE_START_RADIUS_M,
+        "minRadius": TILE_MIN_RADIUS_M,
+        "maxDepth": TILE_MAX_DEPTH,
+        "type": TILE_PLACE_TYPE,
+    }
+
+
+def item_location(item: Dict[str, Any]) -> Tuple[float | None, float | None]:
+    location = (item.get("geometry") or {}).get("location") or {}
+    lat, lng = location.get("lat"), location.get("lng")
+    if lat is None or lng is None:
+        return None, None
+    return float(lat), float(lng)
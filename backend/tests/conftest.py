@@ -0,0 +1,11 @@
+"""Tests for backend/scripts; the scripts import each other as top-level modules."""
+from __future__ import annotations
+
+import sys
+from pathlib import Path
+
+SCRIPTS_DIR = Path(__file__).resolve().parents[1] / "scripts"
+FIXTURES_DIR = Path(__file__).resolve().parent / "fixtures"
+
+if str(SCRIPTS_DIR) not in sys.path:
+    sys.path.insert(0, str(SCRIPTS_DIR))
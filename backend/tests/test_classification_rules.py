@@ -0,0 +1,48 @@
+"""
+Compiled classification rules against the classifier they replaced.
+
+fixtures/classification_baseline.json holds the output of the hard-coded
+keyword classifier from before the rules moved to classification_rules.json
+(`_classify_place` in `git show 12b70df:backend/scripts/reclassify_places.py`)
+for 20000 synthetic places: a digest of all outputs plus every 400th output
+verbatim. It only applies to the rule file it was taken with; a rule edit
+changes the expected output on purpose.
+"""
+from __future__ import annotations
+
+import hashlib
+import json
+
+import pytest
+
+from conftest import FIXTURES_DIR
+
+import reclassify_places as reclassify
+from classification_rules import _reference_classifier, synthetic_places
+
+BASELINE = json.loads((FIXTURES_DIR / "classification_baseline.json").read_text(encoding="utf-8"))
+
+
+@pytest.fixture(scope="module")
+def places():
+    if reclassify.RULES.digest != BASELINE["rulesDigest"]:
+        pytest.skip("classification_rules.json changed since the baseline outputs were recorded")
+    return synthetic_places(reclassify.RULES, BASELINE["places"], BASELINE["seed"])
+
+
+def test_samples_match_baseline(places):
+    by_id = {place["id"]: place for place in places}
+    for place_id, expected in BASELINE["samples"].items():
+        assert [list(part) for part in reclassify._classify_place(by_id[place_id])] == expected, place_id
+
+
+def test_all_outputs_match_baseline(places):
+    outputs = [[list(part) for part in reclassify._classify_place(place)] for place in places]
+    payload = json.dumps(outputs, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+    assert hashlib.sha1(payload).hexdigest() == BASELINE["digest"]
+
+
+def test_reference_classifier_matches_compiled_rules(places):
+    reference = _reference_classifier(reclassify.RULES, reclassify._normalize_text)
+    for place in places[:2000]:
+        assert reference(place) == reclassify._classify_place(place)
@@ -0,0 +1,78 @@
+"""DetailsArchive: layered reads, digest dedupe and recovery from runs killed mid-write."""
+from __future__ import annotations
+
+import gzip
+import json
+
+from details_archive import DetailsArchive, iter_records, load_latest
+
+
+def _result(number: int, **extra) -> dict:
+    return {"place_id": f"g{number}", "name": f"景點{number}", "rating": 4.0, **extra}
+
+
+def _write_run(path, numbers) -> None:
+    archive = DetailsArchive(path)
+    for number in numbers:
+        archive.append(f"g{number}", _result(number))
+    archive.close()
+
+
+def test_newer_records_layer_over_older_ones(tmp_path):
+    path = tmp_path / "archive.jsonl.gz"
+    archive = DetailsArchive(path)
+    assert archive.append("g1", {"name": "七星潭", "rating": 4.5}, ref="db-1")
+    assert not archive.append("g1", {"name": "七星潭", "rating": 4.5}, ref="db-1")
+    archive.close()
+    # A later run with a trimmed field mask only refreshes the rating.
+    archive = DetailsArchive(path)
+    assert not archive.append("g1", {"rating": 4.5, "name": "七星潭"}, ref="db-1")
+    assert archive.append("g1", {"rating": 4.6}, ref="db-1")
+    archive.close()
+    latest = load_latest(path)
+    assert latest["g1"]["result"] == {"name": "七星潭", "rating": 4.6}
+    assert latest["db-1"] is latest["g1"]
+    assert len(list(iter_records(path))) == 2
+
+
+def test_records_after_a_killed_run_stay_readable(tmp_path, capsys):
+    path = tmp_path / "archive.jsonl.gz"
+    _write_run(path, range(200))
+    intact = path.stat().st_size
+    _write_run(path, range(200, 260))
+    # The second run was killed before its member was finished.
+    with path.open("r+b") as fh:
+        fh.truncate(intact + (path.stat().st_size - intact) // 2)
+    partial = {record["place_id"] for record in iter_records(path)}
+    assert set(f"g{number}" for number in range(200)) <= partial
+
+    _write_run(path, [260, 5])
+    assert "gzip" in capsys.readouterr().out
+    latest = load_latest(path)
+    assert "g260" in latest and "g259" not in latest
+    records = list(iter_records(path))
+    assert len(records) == 201
+
+    # A third run knows every stored payload and appends nothing.
+    archive = DetailsArchive(path)
+    assert not archive.append("g260", _result(260))
+    assert not archive.append("g7", _result(7))
+    archive.close()
+    assert len(list(iter_records(path))) == 201
+
+
+def test_reader_resumes_after_unfinished_member_in_the_middle(tmp_path):
+    """Archives damaged before writers cut unfinished members off still read past the damage."""
+    path = tmp_path / "archive.jsonl.gz"
+    _write_run(path, range(50))
+    intact = path.stat().st_size
+    _write_run(path, range(50, 100))
+    with path.open("r+b") as fh:
+        fh.truncate(intact + (path.stat().st_size - intact) // 2)
+    with path.open("ab") as fh:
+        line = json.dumps({"place_id": "g100", "digest": "x", "result": _result(100)}, ensure_ascii=False)
+        fh.write(gzip.compress((line + "\n").encode("utf-8")))
+    ids = [record["place_id"] for record in iter_records(path)]
+    assert ids[:50] == [f"g{number}" for number in range(50)]
+    assert ids[-1] == "g100"
+    assert len(ids) == len(set(ids))
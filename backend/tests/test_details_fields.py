@@ -0,0 +1,66 @@
+"""Details field-mask planning and the savings report's full-mask baseline."""
+from __future__ import annotations
+
+import json
+
+import details_fields
+from details_fields import FULL_FIELDS, FieldMaskStats, plan_fields, request_cost
+
+TRIMMED = plan_fields(["rating"])
+
+
+def test_plan_fields_keeps_full_order_and_falls_back_to_full():
+    assert TRIMMED == ("place_id", "name", "rating", "user_ratings_total", "types")
+    assert plan_fields([]) == FULL_FIELDS
+    assert plan_fields(["rating", "unknown_gap"]) == FULL_FIELDS
+    assert request_cost(plan_fields(["address"])) < request_cost(TRIMMED) < request_cost(FULL_FIELDS)
+
+
+def test_trimmed_only_run_uses_stored_full_mask_baseline(tmp_path):
+    path = tmp_path / "baseline.json"
+    first = FieldMaskStats(path)
+    for _ in range(4):
+        first.record(FULL_FIELDS, 0.4, 8192)
+    assert first.save()
+    assert json.loads(path.read_text(encoding="utf-8")) == {"count": 4, "seconds": 1.6, "bytes": 32768}
+
+    backfill = FieldMaskStats(path)
+    for _ in range(10):
+        backfill.record(TRIMMED, 0.1, 1024)
+    head = backfill.summary()[0]
+    assert "約省 3.0 秒請求時間、70 KB 回應" in head
+    assert "全欄位基準 400 ms / 8.0 KB" in head
+    # Nothing new to fold in: the stored baseline stays as it was.
+    assert not backfill.save()
+
+
+def test_baseline_merges_runs_and_weights_recent_requests(tmp_path, monkeypatch):
+    monkeypatch.setattr(details_fields, "_BASELINE_MAX_SAMPLES", 10)
+    path = tmp_path / "baseline.json"
+    path.write_text(json.dumps({"count": 10, "seconds": 10.0, "bytes": 10240}), encoding="utf-8")
+    stats = FieldMaskStats(path)
+    for _ in range(10):
+        stats.record(FULL_FIELDS, 0.5, 2048)
+    assert stats.full_baseline() == (0.75, 1536.0)
+    stats.save()
+    stored = json.loads(path.read_text(encoding="utf-8"))
+    assert stored["count"] == 10 and stored["seconds"] == 7.5
+
+
+def test_configured_baseline_wins(tmp_path, monkeypatch):
+    monkeypatch.setattr(details_fields, "FULL_LATENCY_MS", 300.0)
+    monkeypatch.setattr(details_fields, "FULL_KB", 4.0)
+    stats = FieldMaskStats(tmp_path / "absent.json")
+    stats.record(TRIMMED, 0.1, 1024)
+    assert stats.full_baseline() == (0.3, 4096.0)
+    assert "約省 0.2 秒請求時間、3 KB 回應" in stats.summary()[0]
+
+
+def test_without_any_baseline_savings_are_not_guessed(tmp_path):
+    path = tmp_path / "baseline.json"
+    path.write_text("{broken", encoding="utf-8")
+    stats = FieldMaskStats(path)
+    stats.record(TRIMMED, 0.1, 1024)
+    head = stats.summary()[0]
+    assert "約省" not in head and "尚無全欄位請求" in head
+    assert FieldMaskStats(None).summary() == []
@@ -0,0 +1,176 @@
+"""Request budget, token buckets and the PlacesClient's budget accounting."""
+from __future__ import annotations
+
+import multiprocessing
+import threading
+import time
+
+import pytest
+
+import google_places_client
+from google_places_client import (
+    BudgetExhausted,
+    PlacesClient,
+    RequestBudget,
+    SharedRequestBudget,
+    SharedTokenBucket,
+    TokenBucket,
+)
+
+
+class _FakeClock:
+    """Stands in for time.monotonic / time.sleep so bucket waits are exact and instant."""
+
+    def __init__(self) -> None:
+        self.now = 1000.0
+        self.slept = []
+
+    def monotonic(self) -> float:
+        return self.now
+
+    def sleep(self, seconds: float) -> None:
+        self.slept.append(seconds)
+        self.now += seconds
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    fake = _FakeClock()
+    monkeypatch.setattr(google_places_client.time, "monotonic", fake.monotonic)
+    monkeypatch.setattr(google_places_client.time, "sleep", fake.sleep)
+    return fake
+
+
+def test_budget_is_exact_under_contention():
+    budget = RequestBudget(500, used=20)
+    granted = []
+
+    def worker():
+        count = 0
+        while budget.try_acquire():
+            count += 1
+        granted.append(count)
+
+    threads = [threading.Thread(target=worker) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert sum(granted) == 480
+    assert budget.used == 500
+    assert budget.remaining() == 0
+
+
+def test_budget_ceiling_and_release():
+    budget = RequestBudget(10)
+    for _ in range(4):
+        budget.acquire(ceiling=4)
+    with pytest.raises(BudgetExhausted):
+        budget.acquire(ceiling=4)
+    assert budget.remaining(ceiling=4) == 0
+    assert budget.remaining() == 6
+    budget.release()
+    assert budget.used == 3
+    assert budget.try_acquire(ceiling=4)
+    # A ceiling above the limit does not lift it.
+    assert budget.remaining(ceiling=50) == 6
+
+
+def _drain(budget: SharedRequestBudget, results) -> None:
+    count = 0
+    while budget.try_acquire():
+        count += 1
+    results.put(count)
+
+
+def test_shared_budget_is_exact_across_processes():
+    ctx = multiprocessing.get_context()
+    budget = SharedRequestBudget(300, used=5, ctx=ctx)
+    results = ctx.Queue()
+    workers = [ctx.Process(target=_drain, args=(budget, results)) for _ in range(3)]
+    for worker in workers:
+        worker.start()
+    counts = [results.get(timeout=30) for _ in workers]
+    for worker in workers:
+        worker.join()
+    assert sum(counts) == 295
+    assert budget.used == 300
+    assert budget.local_used == 0
+    assert not budget.try_acquire()
+
+
+@pytest.mark.parametrize("bucket_type", [TokenBucket, SharedTokenBucket])
+def test_token_bucket_spends_burst_then_refills_at_rate(clock, bucket_type):
+    bucket = bucket_type(4.0, burst=2)
+    bucket.acquire()
+    bucket.acquire()
+    assert clock.slept == []
+    for _ in range(4):
+        bucket.acquire()
+    assert clock.slept == [pytest.approx(0.25)] * 4
+    # Idle time refills up to the burst size only.
+    clock.now += 10
+    clock.slept.clear()
+    for _ in range(3):
+        bucket.acquire()
+    assert clock.slept == [pytest.approx(0.25)]
+
+
+def test_token_bucket_without_rate_never_waits(clock):
+    bucket = TokenBucket(0)
+    for _ in range(100):
+        bucket.acquire()
+    assert clock.slept == []
+
+
+class _Cache:
+    enabled = True
+    offline = False
+
+    def __init__(self, hits):
+        self.hits = hits
+        self.stored = []
+
+    def get(self, url, params):
+        return self.hits.get(params["q"])
+
+    def put(self, url, params, data):
+        self.stored.append(params["q"])
+
+
+def test_client_counts_only_paid_requests():
+    calls = []
+
+    def fetcher(url, params):
+        calls.append(params["q"])
+        return {"status": "OK", "q": params["q"]}
+
+    cache = _Cache({"hit": {"status": "OK", "cached": True}})
+    budget = RequestBudget(2)
+    with PlacesClient(fetcher, budget, qps=0, cache=cache) as client:
+        assert client.fetch("textsearch", {"q": "hit"})["cached"] is True
+        assert client.submit("textsearch", {"q": "a"}).result()["q"] == "a"
+        assert client.fetch("textsearch", {"q": "b"})["q"] == "b"
+        # Cache hits still resolve once the budget is spent; misses are refused up front.
+        assert client.submit("textsearch", {"q": "hit"}).result()["cached"] is True
+        with pytest.raises(BudgetExhausted):
+            client.submit("textsearch", {"q": "c"})
+    assert sorted(calls) == ["a", "b"]
+    assert sorted(cache.stored) == ["a", "b"]
+    assert budget.used == 2
+
+
+def test_map_ordered_keeps_input_order_and_stops_at_budget():
+    budget = RequestBudget(5)
+
+    def task(item):
+        budget.acquire()
+        time.sleep(0.01 * (5 - item % 5))
+        return item * 10
+
+    with PlacesClient(lambda url, params: {}, budget, qps=0, concurrency=4) as client:
+        results = [(item, future) for item, future in client.map_ordered(task, range(20), window=3)]
+    done = [future.result() for _, future in results if future.exception() is None]
+    assert [item for item, _ in results] == list(range(len(results)))
+    assert done == [item * 10 for item in range(5)]
+    assert budget.used == 5
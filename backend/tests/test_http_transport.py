@@ -0,0 +1,167 @@
+"""http_transport: keep-alive reuse, stale-connection retries, decoding and redirects."""
+from __future__ import annotations
+
+import gzip
+import socket
+import threading
+import zlib
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+import http_transport
+from http_transport import ConnectionPool, HttpError
+
+
+@pytest.fixture(autouse=True)
+def no_proxy(monkeypatch):
+    monkeypatch.setattr(http_transport, "_proxy_for", lambda scheme, host: None)
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, *args) -> None:
+        pass
+
+    def _reply(self, status: int, body: bytes, **headers: str) -> None:
+        self.send_response(status)
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in headers.items():
+            self.send_header(name.replace("_", "-"), value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self) -> None:
+        payload = b'{"path": "%s"}' % self.path.encode()
+        if self.path == "/gzip":
+            self._reply(200, gzip.compress(payload), Content_Encoding="gzip")
+        elif self.path == "/deflate":
+            self._reply(200, zlib.compress(payload), Content_Encoding="deflate")
+        elif self.path == "/raw-deflate":
+            packer = zlib.compressobj(wbits=-zlib.MAX_WBITS)
+            self._reply(200, packer.compress(payload) + packer.flush(), Content_Encoding="deflate")
+        elif self.path == "/moved":
+            self._reply(302, b"", Location="/target")
+        elif self.path == "/missing":
+            self._reply(404, b"not here")
+        else:
+            self._reply(200, payload)
+
+    def do_POST(self) -> None:
+        body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        if self.path == "/form":
+            self._reply(303, b"", Location="/done")
+        else:
+            self._reply(200, b'{"echo": "%s"}' % body)
+
+
+@pytest.fixture
+def server():
+    httpd = ThreadingHTTPServer(("127.0.0.1", 0), _Handler)
+    threading.Thread(target=httpd.serve_forever, args=(0.05,), daemon=True).start()
+    yield f"http://127.0.0.1:{httpd.server_address[1]}"
+    httpd.shutdown()
+    httpd.server_close()
+
+
+@pytest.fixture
+def dropping_server():
+    """Answers the first request on each connection, then reads the next one and hangs up."""
+    received = []
+    listener = socket.socket()
+    listener.bind(("127.0.0.1", 0))
+    listener.listen(8)
+
+    def handle(conn: socket.socket) -> None:
+        with conn:
+            answered = False
+            while True:
+                data = conn.recv(65536)
+                if not data:
+                    return
+                received.append(data.split(b" ", 1)[0].decode())
+                if answered:
+                    return
+                conn.sendall(b"HTTP/1.1 200 OK\r\nContent-Length: 2\r\n\r\nok")
+                answered = True
+
+    def serve() -> None:
+        while True:
+            try:
+                conn, _ = listener.accept()
+            except OSError:
+                return
+            threading.Thread(target=handle, args=(conn,), daemon=True).start()
+
+    threading.Thread(target=serve, daemon=True).start()
+    yield f"http://127.0.0.1:{listener.getsockname()[1]}/", received
+    listener.close()
+
+
+def test_keep_alive_connection_is_reused(server):
+    pool = ConnectionPool()
+    for path in ("/a", "/b", "/c"):
+        assert pool.request("GET", server + path).json() == {"path": path}
+    assert (pool.stats.requests, pool.stats.connections, pool.stats.reused) == (3, 1, 2)
+    pool.close()
+
+
+@pytest.mark.parametrize("path", ["/gzip", "/deflate", "/raw-deflate"])
+def test_compressed_bodies_are_decoded(server, path):
+    pool = ConnectionPool()
+    assert pool.request("GET", server + path).json() == {"path": path}
+    pool.close()
+
+
+def test_redirects_and_errors(server):
+    pool = ConnectionPool()
+    resp = pool.request("GET", server + "/moved")
+    assert resp.url.endswith("/target") and resp.json() == {"path": "/target"}
+    # 303 after a POST turns into a GET without the body.
+    assert pool.request("POST", server + "/form", data=b"x=1").json() == {"path": "/done"}
+    assert pool.request("POST", server + "/echo", data=b"hi").json() == {"echo": "hi"}
+    with pytest.raises(HttpError) as excinfo:
+        pool.request("GET", server + "/missing")
+    assert excinfo.value.code == 404 and excinfo.value.read() == b"not here"
+    pool.close()
+
+
+def test_stale_get_is_retried_once_on_a_fresh_connection(dropping_server):
+    url, received = dropping_server
+    pool = ConnectionPool()
+    assert pool.request("GET", url).text() == "ok"
+    assert pool.request("GET", url).text() == "ok"
+    assert received == ["GET", "GET", "GET"]
+    assert (pool.stats.retried_stale, pool.stats.connections) == (1, 2)
+    pool.close()
+
+
+def test_stale_post_is_not_resent(dropping_server):
+    url, received = dropping_server
+    pool = ConnectionPool()
+    pool.request("POST", url, data=b"")
+    with pytest.raises(OSError):
+        pool.request("POST", url, data=b"")
+    # The server saw the second POST before dropping the connection; it must not arrive twice.
+    assert received == ["POST", "POST"]
+    assert pool.stats.retried_stale == 0
+    pool.close()
+
+
+def test_fresh_connection_failure_is_not_retried():
+    listener = socket.socket()
+    listener.bind(("127.0.0.1", 0))
+    listener.listen(1)
+
+    def hang_up() -> None:
+        conn, _ = listener.accept()
+        conn.recv(65536)
+        conn.close()
+
+    threading.Thread(target=hang_up, daemon=True).start()
+    pool = ConnectionPool()
+    with pytest.raises(OSError):
+        pool.request("GET", f"http://127.0.0.1:{listener.getsockname()[1]}/")
+    assert pool.stats.retried_stale == 0
+    listener.close()
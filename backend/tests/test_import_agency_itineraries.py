@@ -0,0 +1,102 @@
+"""CandidateIndex against the linear stop-name scan it replaced, and CityPartitions scoping."""
+from __future__ import annotations
+
+import random
+from difflib import SequenceMatcher
+
+import pytest
+
+from import_agency_itineraries import CandidateIndex, CityPartitions, PlaceCandidate, _normalize_name
+
+CHARS = "臺北新竹花蓮宜蘭老街夜市公園步道湖山海灣寺廟博物館森林遊樂區溫泉觀光工廠"
+CITIES = ["臺北市", "新北市", "宜蘭縣", "花蓮縣", "臺南市", ""]
+
+
+def _linear_choose(name, candidates):
+    """The pre-index matcher: score every candidate, stable-sort by score."""
+    normalized = _normalize_name(name)
+    if not normalized:
+        return None, []
+    exact = [candidate for candidate in candidates if candidate.normalized == normalized]
+    if exact:
+        return exact[0], [{"placeId": item.place_id, "name": item.name, "score": 1.0} for item in exact[:3]]
+    scored = []
+    for candidate in candidates:
+        if normalized in candidate.normalized or candidate.normalized in normalized:
+            score = 0.96
+        else:
+            score = SequenceMatcher(None, normalized, candidate.normalized).ratio()
+        if score >= 0.60:
+            scored.append((score, candidate))
+    scored.sort(key=lambda item: item[0], reverse=True)
+    top = [{"placeId": c.place_id, "name": c.name, "score": round(s, 4)} for s, c in scored[:5]]
+    if not scored or scored[0][0] < 0.84:
+        return None, top
+    return scored[0][1], top
+
+
+def _candidate(place_id, name, city=""):
+    return PlaceCandidate(place_id=place_id, name=name, normalized=_normalize_name(name), city=city)
+
+
+def _candidates(rng, count):
+    names = ["".join(rng.choice(CHARS) for _ in range(rng.randint(2, 8))) for _ in range(count)]
+    names += ["台北101", "Gloria Outlet Mall", "七星潭（花蓮）", "宏亞觀光工廠"]
+    return [_candidate(f"p{index}", name, rng.choice(CITIES)) for index, name in enumerate(names)]
+
+
+def _stop_names(rng, candidates):
+    for candidate in rng.sample(candidates, 60):
+        name = candidate.name
+        yield name
+        yield name + rng.choice(["一日遊", "check in", "（自由活動）", "站"])
+        yield name[1:] or name
+        cut = rng.randrange(len(name))
+        yield name[:cut] + rng.choice(CHARS) + name[cut + 1 :]
+    for _ in range(60):
+        yield "".join(rng.choice(CHARS) for _ in range(rng.randint(1, 10)))
+    yield from ["臺北101", "gloria outlet", "", "!!!", "x"]
+
+
+@pytest.mark.parametrize("seed", [11, 12])
+def test_index_matches_linear_scan(seed):
+    rng = random.Random(seed)
+    candidates = _candidates(rng, 800)
+    index = CandidateIndex(candidates)
+    names = list(_stop_names(rng, candidates))
+    for name in names:
+        assert index.choose(name) == _linear_choose(name, candidates), name
+    # The bound prunes most SequenceMatcher calls a linear scan would make.
+    assert index.scored < len(names) * len(candidates) / 10
+
+
+def test_choose_returns_copies_of_cached_results():
+    index = CandidateIndex([_candidate("p1", "七星潭"), _candidate("p2", "七星潭風景區")])
+    matched, top = index.choose("七星潭")
+    top[0]["score"] = 0
+    assert index.choose("七星潭") == (matched, [{"placeId": "p1", "name": "七星潭", "score": 1.0}])
+
+
+def test_partitions_prefer_own_county_and_reject_far_fuzzy_matches():
+    partitions = CityPartitions(
+        [
+            _candidate("taipei", "林家花園", "臺北市"),
+            _candidate("newtaipei", "板橋林家花園", "新北市"),
+            _candidate("hualien", "七星潭風景區", "花蓮縣"),
+            _candidate("tainan", "赤崁樓", "臺南市"),
+        ]
+    )
+    matched, _, scope = partitions.choose("板橋林家花園", ["新北市"])
+    assert (matched.place_id, scope) == ("newtaipei", "city")
+    matched, _, scope = partitions.choose("林家花園", ["新北市"])
+    assert (matched.place_id, scope) == ("newtaipei", "city")
+    matched, _, scope = partitions.choose("林家花園", ["基隆市"])
+    assert (matched.place_id, scope) == ("newtaipei", "neighbour")
+    matched, _, scope = partitions.choose("赤崁樓", ["臺北市"])
+    assert (matched.place_id, scope) == ("tainan", "island")
+    # A fuzzy hit only found island-wide stays unmatched, but its candidates are reported.
+    matched, top, scope = partitions.choose("七星潭", ["臺北市"])
+    assert matched is None and scope == "unmatched" and top[0]["placeId"] == "hualien"
+    matched, _, scope = partitions.choose("七星潭", [])
+    assert (matched.place_id, scope) == ("hualien", "island")
+    assert partitions.scopes == {"city": 2, "neighbour": 1, "island": 2, "unmatched": 1}
@@ -0,0 +1,123 @@
+"""SQLite place/review store: JSON round-trips, partial city loads and dirty-row saves."""
+from __future__ import annotations
+
+import json
+
+import pytest
+
+from place_sqlite import (
+    SqlitePlaceStore,
+    connect,
+    export_json,
+    import_json,
+    load_review_items,
+    save_review_items,
+)
+from review_store import ReviewStore
+
+PLACES = [
+    {"id": "a", "name": "鹿港 老街", "city": "彰化縣", "lat": 24.05, "lng": 120.43, "tags": ["old_street", "street_food"]},
+    {"id": "b", "name": "七星潭", "city": "花蓮縣", "tags": ["beach"], "subtags": ["beach"], "attributes": ["outdoor"]},
+    {"id": "", "name": "無編號景點", "city": "花蓮縣", "rating": None, "openingHours": {"mon": "09:00-17:00"}},
+    {"id": "c", "name": "日月潭", "city": "南投縣", "lat": "23.86", "description": "湖光山色\n步道"},
+]
+REVIEWS = [
+    {"place_id": "a", "source_name": "鹿港 老街", "reviews": ["小吃很多，假日人潮擁擠"]},
+    {"place_id": "b", "source_name": "七星潭", "reviews": ["海很漂亮"], "tags": ["beach"]},
+]
+
+
+def _merge_key(place):
+    return (" ".join(str(place.get("name") or "").split()).lower(), place.get("city") or "")
+
+
+@pytest.fixture
+def imported(tmp_path):
+    db_path = tmp_path / "db.json"
+    db_path.write_text(json.dumps({"users": [{"id": "u1"}], "places": PLACES}, ensure_ascii=False), encoding="utf-8")
+    reviews_path = tmp_path / "places_with_reviews.jsonl"
+    ReviewStore(reviews_path).rewrite(REVIEWS)
+    sqlite_path = tmp_path / "places.sqlite3"
+    import_json(sqlite_path, db_path, reviews_path)
+    return tmp_path, sqlite_path
+
+
+def test_import_export_round_trip(imported):
+    tmp_path, sqlite_path = imported
+    out = tmp_path / "db.json"
+    export_json(sqlite_path, "db", out)
+    data = json.loads(out.read_text(encoding="utf-8"))
+    assert data["places"] == PLACES
+    assert data["users"] == [{"id": "u1"}]
+
+    training = tmp_path / "training.json"
+    export_json(sqlite_path, "training", training)
+    assert json.loads(training.read_text(encoding="utf-8")) == {"places": PLACES}
+
+    reviews_out = tmp_path / "reviews_out.jsonl"
+    export_json(sqlite_path, "reviews", reviews_out)
+    assert list(ReviewStore(reviews_out).iter_items()) == REVIEWS
+
+
+def test_label_tables_follow_payload(imported):
+    _, sqlite_path = imported
+    conn = connect(sqlite_path)
+    try:
+        tags = conn.execute("SELECT tag FROM place_tags ORDER BY tag").fetchall()
+        assert [row[0] for row in tags] == ["beach", "old_street", "street_food"]
+        lat = conn.execute("SELECT lat FROM places WHERE id = 'c'").fetchone()[0]
+        assert lat == pytest.approx(23.86)
+    finally:
+        conn.close()
+
+
+def test_save_writes_only_dirty_rows(imported):
+    _, sqlite_path = imported
+    store = SqlitePlaceStore.open(sqlite_path, merge_key=_merge_key)
+    place = store.get_by_id("b")
+    place["tags"] = ["beach", "photo_spot"]
+    store.mark_dirty(place)
+    store.add({"id": "d", "name": "太魯閣", "city": "花蓮縣"})
+    assert store.save() is True
+    assert store.save() is False
+    store.conn.close()
+
+    reopened = SqlitePlaceStore.open(sqlite_path, merge_key=_merge_key)
+    assert [p["id"] for p in reopened.places] == ["a", "b", "", "c", "d"]
+    assert reopened.get_by_id("b")["tags"] == ["beach", "photo_spot"]
+    photo = reopened.conn.execute("SELECT COUNT(*) FROM place_tags WHERE tag = 'photo_spot'").fetchone()[0]
+    assert photo == 1
+    reopened.conn.close()
+
+
+def test_partial_city_load_falls_back_to_indexed_lookups(imported):
+    _, sqlite_path = imported
+    store = SqlitePlaceStore.open(sqlite_path, merge_key=_merge_key, city="花蓮縣")
+    assert sorted(p["name"] for p in store.places) == ["七星潭", "無編號景點"]
+    # Places outside the loaded city are found by id or merge key and join the store.
+    other = store.get_by_id("a")
+    assert other is not None and other["city"] == "彰化縣"
+    lake = store.get_by_merge_key(("日月潭", "南投縣"))
+    assert lake is not None and lake["id"] == "c"
+    assert store.get_by_merge_key(("日月潭", "花蓮縣")) is None
+
+    lake["rating"] = 4.7
+    store.mark_dirty(lake)
+    store.save()
+    store.conn.close()
+    full = SqlitePlaceStore.open(sqlite_path)
+    assert len(full.places) == len(PLACES)
+    assert full.get_by_id("c")["rating"] == 4.7
+    full.conn.close()
+
+
+def test_save_review_items_replaces_list(imported):
+    _, sqlite_path = imported
+    conn = connect(sqlite_path)
+    try:
+        updated = [REVIEWS[0], {"place_id": "c", "source_name": "日月潭", "reviews": []}]
+        assert save_review_items(conn, updated) == 1
+        assert load_review_items(conn) == updated
+        assert save_review_items(conn, updated) == 0
+    finally:
+        conn.close()
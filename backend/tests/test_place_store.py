@@ -0,0 +1,145 @@
+"""PlaceStore: span-preserving saves, indexes and dirty tracking."""
+from __future__ import annotations
+
+import json
+
+import pytest
+
+from place_diff import place_fingerprint
+from place_store import PlaceStore
+
+
+def _merge_key(place):
+    return (place.get("name") or "", place.get("city") or "")
+
+
+# Hand-written (not json.dumps) layout: untouched records must come back byte for byte.
+DOCUMENT = """{
+  "users": [{"id": "u1"}],
+  "places": [
+    {"id": "a", "name": "宏亞觀光工廠", "city": "桃園市", "rating": 4.1},
+    {
+      "id": "b",   "name": "鹿港老街",
+      "city": "彰化縣"
+    },
+    {"id": "c", "name": "七星潭", "city": "花蓮縣"}
+  ],
+  "meta": {"version": 3}
+}
+"""
+
+
+@pytest.fixture
+def db_path(tmp_path):
+    path = tmp_path / "db.json"
+    path.write_text(DOCUMENT, encoding="utf-8")
+    return path
+
+
+def test_save_without_changes_does_not_write(db_path):
+    store = PlaceStore.load(db_path)
+    assert store.save() is False
+    assert db_path.read_text(encoding="utf-8") == DOCUMENT
+
+
+def test_save_keeps_untouched_records_verbatim(db_path):
+    store = PlaceStore.load(db_path)
+    place = store.get_by_id("a")
+    place["rating"] = 4.5
+    store.mark_dirty(place)
+    assert store.dirty_count == 1
+    assert store.save() is True
+
+    text = db_path.read_text(encoding="utf-8")
+    assert '{\n      "id": "b",   "name": "鹿港老街",\n      "city": "彰化縣"\n    }' in text
+    assert '{"id": "c", "name": "七星潭", "city": "花蓮縣"}' in text
+    data = json.loads(text)
+    assert data["users"] == [{"id": "u1"}]
+    assert data["meta"] == {"version": 3}
+    assert [p["id"] for p in data["places"]] == ["a", "b", "c"]
+    assert data["places"][0]["rating"] == 4.5
+    assert not store.is_dirty
+
+
+def test_second_save_reuses_rendered_records(db_path):
+    store = PlaceStore.load(db_path)
+    place = store.get_by_id("b")
+    place["rating"] = 3.9
+    store.mark_dirty(place)
+    store.save()
+    first = db_path.read_text(encoding="utf-8")
+    other = store.get_by_id("c")
+    other["rating"] = 4.8
+    store.mark_dirty(other)
+    store.save()
+    second = db_path.read_text(encoding="utf-8")
+    assert json.loads(second)["places"][1] == json.loads(first)["places"][1]
+    assert second.count('"rating": 3.9') == 1
+
+
+def test_save_to_other_path_leaves_store_dirty(db_path, tmp_path):
+    store = PlaceStore.load(db_path)
+    place = store.get_by_id("a")
+    place["name"] = "巧克力工廠"
+    store.mark_dirty(place)
+    copy_path = tmp_path / "copy.json"
+    assert store.save(copy_path) is True
+    assert json.loads(copy_path.read_text(encoding="utf-8"))["places"][0]["name"] == "巧克力工廠"
+    assert db_path.read_text(encoding="utf-8") == DOCUMENT
+    assert store.is_dirty
+
+
+def test_mark_dirty_reindexes_changed_keys(db_path):
+    store = PlaceStore.load(db_path, merge_key=_merge_key)
+    place = store.get_by_id("c")
+    place["id"] = "c2"
+    place["city"] = "宜蘭縣"
+    store.mark_dirty(place)
+    assert store.get_by_id("c") is None
+    assert store.get_by_id("c2") is place
+    assert store.in_city("花蓮縣") == []
+    assert store.in_city("宜蘭縣") == [place]
+    assert store.get_by_merge_key(("七星潭", "宜蘭縣")) is place
+    assert store.get_by_merge_key(("七星潭", "花蓮縣")) is None
+
+
+def test_mark_dirty_rejects_foreign_place(db_path):
+    store = PlaceStore.load(db_path)
+    with pytest.raises(KeyError):
+        store.mark_dirty({"id": "a"})
+
+
+def test_add_and_replace_all(db_path):
+    store = PlaceStore.load(db_path)
+    store.add({"id": "d", "name": "日月潭", "city": "南投縣"})
+    store.save()
+    assert [p["id"] for p in json.loads(db_path.read_text(encoding="utf-8"))["places"]] == ["a", "b", "c", "d"]
+
+    store.replace_all([{"id": "z", "name": "太魯閣", "city": "花蓮縣"}])
+    assert store.get_by_id("a") is None
+    store.save()
+    reloaded = PlaceStore.load(db_path)
+    assert [p["id"] for p in reloaded.places] == ["z"]
+    assert reloaded.in_city("花蓮縣")[0]["name"] == "太魯閣"
+
+
+def test_save_restamps_fingerprint_of_changed_places(db_path):
+    store = PlaceStore.load(db_path)
+    place = store.get_by_id("b")
+    place["fingerprint"] = "stale"
+    place["rating"] = 4.0
+    store.mark_dirty(place)
+    store.save()
+    saved = {p["id"]: p for p in json.loads(db_path.read_text(encoding="utf-8"))["places"]}
+    assert saved["b"]["fingerprint"] == place_fingerprint(saved["b"])
+    assert "fingerprint" not in saved["a"]
+
+
+def test_empty_places_array(tmp_path):
+    path = tmp_path / "empty.json"
+    path.write_text('{"places": []}', encoding="utf-8")
+    store = PlaceStore.load(path)
+    assert len(store) == 0
+    store.add({"id": "x", "name": "新景點"})
+    store.save()
+    assert json.loads(path.read_text(encoding="utf-8"))["places"] == [{"id": "x", "name": "新景點"}]
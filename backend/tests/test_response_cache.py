@@ -0,0 +1,148 @@
+"""ResponseCache: keys, TTL expiry, LRU eviction and what is never cached."""
+from __future__ import annotations
+
+import os
+
+import pytest
+
+import response_cache
+from response_cache import CACHE_MISS_STATUS, ResponseCache, cache_key
+
+DETAILS = "https://maps.googleapis.com/maps/api/place/details/json"
+SEARCH = "https://maps.googleapis.com/maps/api/place/textsearch/json"
+
+
+class _Clock:
+    def __init__(self) -> None:
+        self.now = 1_700_000_000.0
+
+    def time(self) -> float:
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    fake = _Clock()
+    monkeypatch.setattr(response_cache.time, "time", fake.time)
+    return fake
+
+
+@pytest.fixture
+def cache(tmp_path, clock):
+    cache = ResponseCache(tmp_path / "cache.sqlite3", mode="on", ttl_days={"details": 30, "textsearch": 7})
+    yield cache
+    cache.close()
+
+
+def _details(place_id: str, **extra) -> dict:
+    return {"status": "OK", "result": {"place_id": place_id, **extra}}
+
+
+def test_cache_key_ignores_api_key_and_field_order():
+    base = cache_key(DETAILS, {"place_id": "p1", "fields": "name,rating,geometry", "key": "A"})
+    assert cache_key(DETAILS, {"fields": "geometry, rating,name", "place_id": "p1", "key": "B"}) == base
+    assert cache_key(DETAILS, {"place_id": "p1", "fields": "name,rating,geometry", "language": None}) == base
+    assert cache_key(DETAILS, {"place_id": "p1", "fields": "name,rating"}) != base
+    assert cache_key(SEARCH, {"place_id": "p1", "fields": "name,rating,geometry"}) != base
+
+
+def test_entries_expire_per_endpoint_ttl(cache, clock):
+    cache.put(DETAILS, {"place_id": "p1"}, _details("p1"))
+    cache.put(SEARCH, {"query": "花蓮 景點"}, {"status": "OK", "results": []})
+    clock.now += 8 * 86400
+    assert cache.get(DETAILS, {"place_id": "p1"}) == _details("p1")
+    assert cache.get(SEARCH, {"query": "花蓮 景點"}) is None
+    assert cache.prune_expired() == 1
+    clock.now += 23 * 86400
+    assert cache.get(DETAILS, {"place_id": "p1"}) is None
+    assert (cache.hits, cache.misses) == (1, 2)
+
+
+def test_offline_mode_serves_stale_entries_and_reports_misses(tmp_path, clock):
+    path = tmp_path / "cache.sqlite3"
+    online = ResponseCache(path, mode="on", ttl_days={"details": 1})
+    online.put(DETAILS, {"place_id": "p1"}, _details("p1"))
+    online.close()
+    clock.now += 5 * 86400
+
+    offline = ResponseCache(path, mode="offline")
+    assert offline.get(DETAILS, {"place_id": "p1"}) == _details("p1")
+    calls = []
+    result = offline.fetch(lambda url, params: calls.append(params) or _details("p2"), DETAILS, {"place_id": "p2"})
+    assert result == {"status": CACHE_MISS_STATUS}
+    assert calls == []
+    offline.close()
+
+    missing = ResponseCache(tmp_path / "absent.sqlite3", mode="offline")
+    assert missing.enabled
+    assert not (tmp_path / "absent.sqlite3").exists()
+    missing.close()
+
+
+def test_lru_eviction_trims_least_recently_used(tmp_path, clock):
+    cache = ResponseCache(tmp_path / "cache.sqlite3", mode="on", max_bytes=10**9)
+    # Random bodies of one length compress to about the same size.
+    for index in range(4):
+        cache.put(DETAILS, {"place_id": f"p{index}"}, _details(f"p{index}", blob=os.urandom(600).hex()))
+        clock.now += 1
+    sizes = [row[0] for row in cache._conn.execute("SELECT size FROM responses ORDER BY accessed_at")]
+    assert cache.get(DETAILS, {"place_id": "p0"}) is not None  # p0 becomes most recently used
+    clock.now += 1
+
+    # A fifth entry overflows the limit; trimming to 90% drops the two least recently used.
+    cache.max_bytes = sum(sizes)
+    cache.put(DETAILS, {"place_id": "p4"}, _details("p4", blob=os.urandom(600).hex()))
+    kept = {pid for pid in (f"p{index}" for index in range(5)) if cache.get(DETAILS, {"place_id": pid})}
+    assert kept == {"p0", "p3", "p4"}
+    assert cache._total_bytes <= cache.max_bytes * 0.9
+    cache.close()
+
+    reopened = ResponseCache(tmp_path / "cache.sqlite3", mode="on")
+    assert reopened._total_bytes == cache._total_bytes
+    reopened.close()
+
+
+def test_transient_statuses_and_paged_searches_are_not_cached(cache):
+    cache.put(DETAILS, {"place_id": "p1"}, {"status": "OVER_QUERY_LIMIT"})
+    cache.put(SEARCH, {"query": "台南 小吃"}, {"status": "OK", "results": [], "next_page_token": "t1"})
+    cache.put(SEARCH, {"pagetoken": "t1"}, {"status": "OK", "results": []})
+    assert cache.stores == 0
+    assert cache.get(DETAILS, {"place_id": "p1"}) is None
+    assert cache.get(SEARCH, {"query": "台南 小吃"}) is None
+
+    cache.put(SEARCH, {"query": "台南 古蹟"}, {"status": "ZERO_RESULTS", "results": []})
+    assert cache.get(SEARCH, {"query": "台南 古蹟"}) == {"status": "ZERO_RESULTS", "results": []}
+
+
+def test_entries_with_page_tokens_from_older_runs_are_misses(cache):
+    data = {"status": "OK", "results": [], "next_page_token": "expired"}
+    body = response_cache.zlib.compress(response_cache.json.dumps(data).encode("utf-8"))
+    key = cache_key(SEARCH, {"query": "宜蘭"})
+    cache._conn.execute(
+        "INSERT INTO responses VALUES (?, 'textsearch', ?, ?, ?, ?)",
+        (key, response_cache.time.time(), response_cache.time.time(), len(body), body),
+    )
+    assert cache.get(SEARCH, {"query": "宜蘭"}) is None
+
+
+def test_refresh_mode_rewrites_without_reading(tmp_path, clock):
+    path = tmp_path / "cache.sqlite3"
+    refresh = ResponseCache(path, mode="refresh")
+    refresh.put(DETAILS, {"place_id": "p1"}, _details("p1", rating=4.0))
+    calls = []
+    data = refresh.fetch(lambda url, params: calls.append(1) or _details("p1", rating=4.5), DETAILS, {"place_id": "p1"})
+    assert data["result"]["rating"] == 4.5 and calls == [1]
+    refresh.close()
+    reader = ResponseCache(path, mode="on")
+    assert reader.get(DETAILS, {"place_id": "p1"})["result"]["rating"] == 4.5
+    reader.close()
+
+
+def test_fetch_keys_by_params_before_fetcher_adds_api_key(cache):
+    def fetcher(url, params):
+        params["key"] = "secret"
+        return _details(params["place_id"])
+
+    cache.fetch(fetcher, DETAILS, {"place_id": "p9"})
+    assert cache.fetch(lambda url, params: pytest.fail("cache miss"), DETAILS, {"place_id": "p9"}) == _details("p9")
+    assert "secret" not in str(cache._conn.execute("SELECT body FROM responses").fetchall())
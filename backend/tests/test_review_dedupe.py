@@ -0,0 +1,124 @@
+"""ReviewDeduper: MinHash/LSH candidates against a brute-force Jaccard scan, and owner semantics."""
+from __future__ import annotations
+
+import copy
+import random
+
+import pytest
+
+from review_dedupe import ReviewDeduper, dedupe_review_items, jaccard, normalize_review, shingles
+from review_store import ReviewStore
+
+TEMPLATES = [
+    "這裡的風景非常漂亮值得一來再來",
+    "服務人員態度親切環境乾淨整潔",
+    "停車方便但是假日人潮很多要早點來",
+    "食物好吃價格合理推薦給大家",
+    "夜景很美適合情侶約會散步",
+    "The view from the top is amazing, worth the hike",
+]
+
+
+def _review(rng: random.Random) -> str:
+    text = rng.choice(TEMPLATES)
+    roll = rng.random()
+    if roll < 0.3:
+        return text + rng.choice("！。～!") + str(rng.randint(0, 3))
+    if roll < 0.6:
+        return text[: rng.randint(6, len(text))] + "不錯喔" + str(rng.randint(0, 99))
+    # An unrelated review: random characters, far below any threshold.
+    return "".join(rng.choice("山海湖河林園寺廟街市橋塔館島") for _ in range(rng.randint(5, 25)))
+
+
+def _item(rng: random.Random, number: int) -> dict:
+    return {"place_id": f"p{number}", "source_name": f"景點{number}", "reviews": [_review(rng) for _ in range(4)]}
+
+
+def _brute_force(texts, earlier, threshold):
+    """Texts kept by comparing each one with every earlier kept review."""
+    kept, seen = [], list(earlier)
+    for text in texts:
+        shingle_set = shingles(text)
+        if any(jaccard(shingle_set, other) >= threshold for other in seen):
+            continue
+        kept.append(text)
+        seen.append(shingle_set)
+    return kept, seen
+
+
+def test_normalization_ignores_case_width_and_punctuation():
+    assert normalize_review("ＧＯＯＤ View!! 很棒～") == normalize_review("good view 很棒")
+    deduper = ReviewDeduper()
+    assert deduper.add("Great view!!")
+    assert not deduper.add("great   VIEW")
+    assert deduper.add("")
+    assert not deduper.add("。。。")
+    assert (deduper.kept, deduper.dropped) == (2, 2)
+
+
+@pytest.mark.parametrize("seed", [1, 2, 3])
+def test_lsh_matches_brute_force_scan(seed):
+    rng = random.Random(seed)
+    texts = [_review(rng) for _ in range(600)]
+    deduper = ReviewDeduper(threshold=0.8)
+    kept = [text for text in texts if deduper.add(text)]
+    expected, _ = _brute_force(texts, [], 0.8)
+    assert kept == expected
+    # Candidates from shared bands are a small fraction of a full pairwise scan.
+    assert deduper.comparisons < len(texts) * len(expected) / 4
+
+
+def test_refetched_place_keeps_its_own_reviews():
+    deduper = ReviewDeduper()
+    deduper.seed({"place_id": "p1", "source_name": "七星潭", "reviews": ["海很漂亮，石頭很多"]})
+    deduper.seed({"place_id": "p2", "source_name": "太魯閣", "reviews": ["峽谷壯觀，步道好走"]})
+    fresh = [
+        {"place_id": "p1", "source_name": "七星潭", "reviews": ["海很漂亮，石頭很多！"]},
+        {"place_id": "p3", "source_name": "清水斷崖", "reviews": ["峽谷壯觀、步道好走", "海很漂亮石頭很多"]},
+    ]
+    dedupe_review_items(fresh, deduper)
+    assert fresh[0]["reviews"] == ["海很漂亮，石頭很多！"]
+    # p3 copies both the untouched p2 and the re-fetched p1.
+    assert fresh[1]["reviews"] == []
+    assert deduper.seeded == 2
+    assert "既有評論 2 則" in deduper.summary()
+
+
+def test_place_matched_by_source_name_is_replaced_too():
+    deduper = ReviewDeduper()
+    deduper.seed({"source_name": "鹿港老街", "reviews": ["小吃很多假日人潮擁擠"]})
+    fresh = [{"place_id": "p9", "source_name": "鹿港老街", "reviews": ["小吃很多，假日人潮擁擠"]}]
+    dedupe_review_items(fresh, deduper)
+    assert fresh[0]["reviews"] == ["小吃很多，假日人潮擁擠"]
+
+
+@pytest.mark.parametrize("seed", [4, 5])
+def test_seeded_deduper_matches_per_batch_rescan(tmp_path, seed):
+    """One deduper seeded once gives what re-scanning the live store before every batch gives."""
+    rng = random.Random(seed)
+    path = tmp_path / "places_with_reviews.jsonl"
+    ReviewStore(path).rewrite(_item(rng, number) for number in range(60))
+    batches = [[_item(rng, rng.randint(40, 120)) for _ in range(15)] for _ in range(4)]
+
+    deduper = ReviewDeduper()
+    for item in ReviewStore(path).iter_items():
+        deduper.seed(item)
+    for batch in batches:
+        raw = copy.deepcopy(batch)
+        replaced = {key for item in raw for key in (item["place_id"], item["source_name"])}
+        earlier = [
+            shingles(text)
+            for stored in ReviewStore(path).iter_items()
+            if replaced.isdisjoint((stored["place_id"], stored["source_name"]))
+            for text in stored["reviews"]
+        ]
+        expected = []
+        for position, item in enumerate(raw):
+            kept, seen = _brute_force(item["reviews"], earlier, deduper.threshold)
+            expected.append(kept)
+            # A place listed again later in the batch is replaced by that later entry.
+            if all(other["place_id"] != item["place_id"] for other in raw[position + 1 :]):
+                earlier = seen
+        dedupe_review_items(batch, deduper)
+        assert [item["reviews"] for item in batch] == expected
+        ReviewStore(path).append(batch)
@@ -0,0 +1,178 @@
+"""ReviewStore: supersede rule, sidecar index recovery, compaction and concurrent appends."""
+from __future__ import annotations
+
+import json
+import multiprocessing
+
+import review_store
+from review_store import ReviewStore, merge_review_items, read_review_items, write_review_items
+
+
+def _item(place_id: str, name: str, *reviews: str) -> dict:
+    return {"place_id": place_id, "source_name": name, "reviews": list(reviews)}
+
+
+def _rebuilt(path):
+    """A store for `path` indexed from scratch."""
+    path.with_suffix(".idx.json").unlink(missing_ok=True)
+    return ReviewStore(path)
+
+
+def _raw_lines(path):
+    with path.open(encoding="utf-8") as fh:
+        return [json.loads(line) for line in fh]
+
+
+def _line_bytes(item: dict) -> bytes:
+    return (json.dumps(item, ensure_ascii=False) + "\n").encode("utf-8")
+
+
+def _by_place(items):
+    return sorted(items, key=lambda item: (item["place_id"], item["source_name"]))
+
+
+def test_later_lines_supersede_by_place_id_or_name(tmp_path):
+    store = ReviewStore(tmp_path / "r.jsonl")
+    store.append([_item("p1", "七星潭", "舊"), _item("p2", "太魯閣", "壯觀"), _item("", "鹿港老街", "好吃")])
+    store.append([_item("p1", "七星潭", "新"), _item("p3", "鹿港老街", "人多")])
+    items = list(store.iter_items())
+    assert items == [_item("p2", "太魯閣", "壯觀"), _item("p1", "七星潭", "新"), _item("p3", "鹿港老街", "人多")]
+    assert len(store) == 3 and store.lines == 5
+    # The same live set as the in-memory merge the crawler used to do.
+    assert _by_place(items) == _by_place(merge_review_items([], _raw_lines(store.path)))
+    assert store.get(place_id="p1")["reviews"] == ["新"]
+    assert store.get(name="鹿港老街")["place_id"] == "p3"
+    assert store.get(place_id="missing", name="太魯閣")["place_id"] == "p2"
+    assert store.get(place_id="missing") is None
+
+
+def test_reopen_uses_saved_index(tmp_path):
+    path = tmp_path / "r.jsonl"
+    ReviewStore(path).append([_item("p1", "a", "x"), _item("p1", "a", "y")])
+    index = json.loads(path.with_suffix(".idx.json").read_text(encoding="utf-8"))
+    assert index["size"] == path.stat().st_size and index["lines"] == 2
+    reopened = ReviewStore(path)
+    assert (reopened.by_id, reopened.by_name, reopened.lines) == (index["byPlaceId"], index["byName"], 2)
+
+
+def test_unindexed_tail_is_indexed_on_open(tmp_path):
+    path = tmp_path / "r.jsonl"
+    ReviewStore(path).append([_item("p1", "a", "x")])
+    # A run killed after writing lines but before saving the index.
+    with path.open("a", encoding="utf-8") as fh:
+        fh.write(json.dumps(_item("p1", "a", "y"), ensure_ascii=False) + "\n")
+        fh.write(json.dumps(_item("p2", "b", "z"), ensure_ascii=False) + "\n")
+    store = ReviewStore(path)
+    assert [item["reviews"] for item in store.iter_items()] == [["y"], ["z"]]
+    assert json.loads(path.with_suffix(".idx.json").read_text(encoding="utf-8"))["size"] == path.stat().st_size
+
+
+def test_replaced_file_triggers_rebuild(tmp_path):
+    path = tmp_path / "r.jsonl"
+    ReviewStore(path).append([_item("p1", "aaaa", "x"), _item("p2", "b", "y")])
+    # Same-or-larger file with different bytes before the indexed size: the tail digest no longer matches.
+    lines = [_item("p9", "c", "q"), _item("p8", "dddd", "x"), _item("p7", "e", "long review text")]
+    path.write_text("".join(json.dumps(item) + "\n" for item in lines), encoding="utf-8")
+    store = ReviewStore(path)
+    assert list(store.iter_items()) == lines
+    assert store.get(place_id="p1") is None
+
+
+def test_live_store_picks_up_other_writers(tmp_path):
+    path = tmp_path / "r.jsonl"
+    reader = ReviewStore(path)
+    writer = ReviewStore(path)
+    writer.append([_item("p1", "a", "x")])
+    assert reader.get(place_id="p1")["reviews"] == ["x"]
+    writer.rewrite([_item("p2", "b", "y")])
+    assert list(reader.iter_items()) == [_item("p2", "b", "y")]
+    reader.append([_item("p3", "c", "z")])
+    assert [item["place_id"] for item in writer.iter_items()] == ["p2", "p3"]
+
+
+def test_compaction_drops_superseded_lines(tmp_path, monkeypatch):
+    monkeypatch.setattr(review_store, "COMPACT_MIN_DEAD", 4)
+    path = tmp_path / "r.jsonl"
+    store = ReviewStore(path)
+    store.append([_item("p1", "a", "v0"), _item("p2", "b", "w0")])
+    for version in range(1, 4):
+        store.append([_item("p1", "a", f"v{version}")])
+    assert store.lines == 5  # 3 dead lines: below the threshold
+    store.append([_item("p1", "a", "v4")])
+    assert store.lines == 2 and len(store) == 2
+    assert path.read_text(encoding="utf-8").count("\n") == 2
+    assert list(store.iter_items()) == [_item("p2", "b", "w0"), _item("p1", "a", "v4")]
+    assert _rebuilt(path).by_id == store.by_id
+
+
+def test_legacy_json_array_is_imported_on_open(tmp_path, capsys):
+    legacy = tmp_path / "places_with_reviews.json"
+    items = [_item("p1", "a", "x"), "junk", _item("p1", "a", "y"), _item("p2", "b", "z")]
+    legacy.write_text(json.dumps(items, ensure_ascii=False), encoding="utf-8")
+    store = ReviewStore.open(tmp_path / "places_with_reviews.jsonl")
+    assert len(store) == 2 and store.get(place_id="p1")["reviews"] == ["y"]
+    assert "轉為" in capsys.readouterr().out
+    assert list(read_review_items(legacy)) == [items[0], items[2], items[3]]
+
+
+def test_read_and_write_accept_both_formats(tmp_path):
+    items = [_item("p1", "a", "x"), _item("p2", "b", "y")]
+    for name in ("out.json", "out.jsonl"):
+        write_review_items(tmp_path / name, items)
+        assert list(read_review_items(tmp_path / name)) == items
+    assert list(read_review_items(tmp_path / "none.json")) == []
+
+
+def _append_many(path, worker: int) -> None:
+    store = ReviewStore(path)
+    for batch in range(20):
+        store.append([_item(f"p{(worker * 7 + batch + n) % 25}", f"w{worker}b{batch}n{n}", "r") for n in range(3)])
+
+
+def test_concurrent_appends_keep_index_consistent(tmp_path):
+    path = tmp_path / "r.jsonl"
+    ctx = multiprocessing.get_context()
+    workers = [ctx.Process(target=_append_many, args=(path, worker)) for worker in range(4)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+        assert worker.exitcode == 0
+    store = ReviewStore(path)
+    assert store.lines == 4 * 20 * 3
+    rebuilt = _rebuilt(path)
+    assert (store.by_id, store.by_name) == (rebuilt.by_id, rebuilt.by_name)
+    assert _by_place(store.iter_items()) == _by_place(merge_review_items([], _raw_lines(path)))
+
+
+def test_line_cut_short_by_killed_writer_is_dropped(tmp_path, capsys):
+    path = tmp_path / "r.jsonl"
+    ReviewStore(path).append([_item("p1", "a", "x"), _item("p2", "b", "y")])
+    whole = path.read_bytes()
+    # Killed after writing part of a third line, before saving the index.
+    path.write_bytes(whole + _line_bytes(_item("p3", "c", "z"))[:12])
+    store = ReviewStore.open(path)
+    assert path.read_bytes() == whole
+    assert "寫到一半" in capsys.readouterr().out
+    store.append([_item("p4", "d", "w")])
+    assert [item["place_id"] for item in ReviewStore(path).iter_items()] == ["p1", "p2", "p4"]
+    assert [item["place_id"] for item in _raw_lines(path)] == ["p1", "p2", "p4"]
+
+
+def test_other_store_drops_partial_line_before_appending(tmp_path):
+    path = tmp_path / "r.jsonl"
+    writer = ReviewStore(path)
+    writer.append([_item("p1", "a", "x")])
+    with path.open("ab") as fh:
+        fh.write(_line_bytes(_item("p2", "b", "y"))[:-5])
+    writer.append([_item("p3", "c", "z")])
+    assert [item["place_id"] for item in _raw_lines(path)] == ["p1", "p3"]
+
+
+def test_undecodable_lines_are_skipped(tmp_path):
+    path = tmp_path / "r.jsonl"
+    path.write_bytes(_line_bytes(_item("p1", "a", "x")) + b'{"place_id": "p2", "sou\n[1, 2]\n' + _line_bytes(_item("p3", "c", "z")))
+    store = ReviewStore(path)
+    assert [item["place_id"] for item in store.iter_items()] == ["p1", "p3"]
+    assert store.lines == 2 and store.get(place_id="p3")["reviews"] == ["z"]
+